@@ -0,0 +1,62 @@
+"""Memory footprint of the stocks across repeated filters.
+
+Run with `python -m benchmarks.bench_memory`. The pattern functions must not
+modify the stock data, so the footprint per ticker should stay flat after the
+first round (which fills the derived-feature caches). The number of live
+feature caches should stay flat too: a growing count means that the frames
+checked by the patterns, e.g. the slices of `--prefilter-bars`, are kept alive.
+The traced memory grows by steps until pandas prunes the dead references to the
+views of each index, every 500 views.
+With `--compact`, the stocks hold compact float32 data, see
+`stockaxion.compact`.
+"""
+
+import argparse
+import gc
+import tracemalloc
+from benchmarks.synthetic import synthetic_stocks
+from stockaxion.indicators import features
+from stockaxion.stock_filter import StockFilter
+
+
+def data_footprint(stocks) -> int:
+    """Total memory used by the DataFrames of the stocks, in bytes."""
+    return sum(int(stock.data.memory_usage(deep=True).sum()) for stock in stocks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=260)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--prefilter-bars", type=int, default=None)
+    args = parser.parse_args()
+
+    stocks = synthetic_stocks(args.tickers, args.bars)
+    stock_filter = StockFilter(
+        stocks=stocks,
+        patterns=["check_rise_then_fall", "check_weekly_rsi_low"],
+        extra_params={
+            "use_cache": False,
+            "use_panel": False,
+            "compact": args.compact,
+            "prefilter_bars": args.prefilter_bars,
+        },
+    )
+    tracemalloc.start()
+    print("round  data/ticker (B)  feature caches  traced/ticker (B)")
+    for i in range(args.rounds):
+        stock_filter.filter()
+        gc.collect()
+        traced, _ = tracemalloc.get_traced_memory()
+        print(
+            f"{i:5d}  {data_footprint(stocks) / args.tickers:15.0f}"
+            f"  {len(features._feature_caches):14d}"
+            f"  {traced / args.tickers:17.0f}"
+        )
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
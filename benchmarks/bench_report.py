@@ -0,0 +1,49 @@
+"""Time to build a PDF report of synthetic stocks, without network or LLM calls.
+
+Run with `python -m benchmarks.bench_report --tickers 500`.
+"""
+
+import argparse
+import time
+from io import BytesIO
+from benchmarks.synthetic import synthetic_stocks
+from stockaxion.reporting import Report
+
+REASON_TO_BUY = "**Strong growth.**\n\n- Rising revenue\n- Expanding margins\n"
+
+
+class OfflineReport(Report):
+    """Report with a canned reason to buy instead of LLM calls."""
+
+    def _get_reason_to_buy(self, stock):
+        return REASON_TO_BUY
+
+    def _get_reasons_to_buy(self):
+        return {stock.ticker_symbol: REASON_TO_BUY for stock in self.stocks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=260)
+    parser.add_argument("--render-workers", type=int, default=None)
+    parser.add_argument("--output", help="Write the report to this path")
+    args = parser.parse_args()
+
+    stocks = synthetic_stocks(args.tickers, args.bars)
+    report = OfflineReport(
+        stocks=stocks,
+        extra_params={"use_cache": False, "render_workers": args.render_workers},
+    )
+    output = args.output or BytesIO()
+    start = time.perf_counter()
+    report.save_pdf_report(output)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.tickers} stocks in {elapsed:.2f}s "
+        f"({args.tickers / elapsed:.1f} stocks/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
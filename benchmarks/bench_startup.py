@@ -0,0 +1,63 @@
+"""Time and memory to import `stockaxion.api` in a fresh interpreter.
+
+Run with `python -m benchmarks.bench_startup --runs 10`. Also lists the heavy
+dependencies loaded by the import, which should only be loaded on first use.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "matplotlib",
+    "fpdf",
+    "markdown2",
+    "yfinance",
+    "openai",
+    "dotenv",
+    "pyarrow",
+    "bs4",
+]
+
+SCRIPT = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import stockaxion.api
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_import() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    measure_import()  # Warm up the file system cache and the bytecode
+    results = [measure_import() for _ in range(args.runs)]
+    seconds = [result["seconds"] for result in results]
+    rss_mb = [result["max_rss_kb"] / 1024 for result in results]
+    print(
+        f"import stockaxion.api: median {statistics.median(seconds) * 1000:.0f} ms, "
+        f"min {min(seconds) * 1000:.0f} ms, "
+        f"median max RSS {statistics.median(rss_mb):.0f} MB"
+    )
+    loaded = results[-1]["loaded"]
+    print(f"Heavy modules loaded at import: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
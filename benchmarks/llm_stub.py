@@ -0,0 +1,86 @@
+"""Local OpenAI-compatible chat completions endpoint, for offline runs.
+
+Run with `python -m benchmarks.llm_stub --port 8765` and point stockaxion to it
+with `XAI_BASE_URL=http://127.0.0.1:8765/v1 XAI_API_KEY=stub`. Every request is
+answered after `--delay` seconds with a canned JSON list of tickers, and the
+number of requests received is logged, e.g. to check that identical concurrent
+prompts are coalesced.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TICKERS = ["AAPL", "MSFT", "NVDA", "AMD", "TSLA"]
+
+
+def make_handler(tickers: list, delay: float):
+    lock = threading.Lock()
+    requests = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                requests[0] += 1
+                n_requests = requests[0]
+            time.sleep(delay)
+            content = json.dumps({"tickers": tickers})
+            response = json.dumps(
+                {
+                    "id": f"stub-{n_requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 0,
+                        "completion_tokens": 0,
+                        "total_tokens": 0,
+                    },
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            print(f"request {requests[0]}: {format % args}", flush=True)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tickers", default=",".join(DEFAULT_TICKERS))
+    parser.add_argument("--delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    handler = make_handler(args.tickers.split(","), args.delay)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving on http://{args.host}:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Offline benchmark suite of the indicators, patterns, filter and report.
+
+Run with `python -m benchmarks.suite --tickers 100,500,1000`. Each case is run
+on synthetic OHLCV data for each number of tickers, which gives its scaling
+curve. Downloads, ticker resolution and LLM calls are replaced by local fakes.
+
+Save the results as a baseline with `--save-baseline benchmarks/baseline.json`
+and compare a later run with `--baseline benchmarks/baseline.json`: the suite
+exits with status 1 when the throughput of a case dropped by more than
+`--tolerance`.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+from benchmarks.bench_report import OfflineReport
+from benchmarks.fakes import FakeDownloader, install_offline_resolver
+from benchmarks.synthetic import synthetic_ohlcv, synthetic_stocks
+from stockaxion.backtest import Backtest
+from stockaxion.indicators.features import invalidate_features
+from stockaxion.indicators.pattern import check_rise_then_fall, check_weekly_rsi_low
+from stockaxion.indicators.price import calculate_rsi
+from stockaxion.stock_filter import StockFilter
+from stockaxion.sweep import Sweep
+
+PATTERNS = ["check_rise_then_fall", "check_weekly_rsi_low"]
+SWEEP_GRIDS = {
+    "check_rise_then_fall": {
+        "window_size": [10, 20, 30, 40],
+        "rise_threshold": list(range(25, 225, 25)),
+    },
+    "check_weekly_rsi_low": {
+        "window_size": [7, 14, 21],
+        "rsi_threshold": [20, 25, 30, 35, 40],
+    },
+}
+DEFAULT_TOLERANCE = 0.2
+
+# Setup of each case by name: given the number of tickers, the number of bars
+# and the interval, return the function to time.
+CASES: Dict[str, Callable[[int, int, str], Callable[[], None]]] = {}
+
+
+def case(name: str):
+    """Register a benchmark case."""
+
+    def decorator(setup):
+        CASES[name] = setup
+        return setup
+
+    return decorator
+
+
+def _frames(n_tickers: int, n_bars: int, interval: str):
+    return [synthetic_ohlcv(n_bars, interval, seed=i) for i in range(n_tickers)]
+
+
+def _per_frame(function, n_tickers: int, n_bars: int, interval: str):
+    frames = _frames(n_tickers, n_bars, interval)
+
+    def run():
+        for df in frames:
+            # Time the computation, not the derived-feature cache
+            invalidate_features(df)
+            function(df)
+
+    return run
+
+
+@case("calculate_rsi")
+def rsi_case(n_tickers: int, n_bars: int, interval: str):
+    return _per_frame(calculate_rsi, n_tickers, n_bars, interval)
+
+
+@case("check_rise_then_fall")
+def rise_then_fall_case(n_tickers: int, n_bars: int, interval: str):
+    return _per_frame(check_rise_then_fall, n_tickers, n_bars, interval)
+
+
+@case("check_weekly_rsi_low")
+def weekly_rsi_low_case(n_tickers: int, n_bars: int, interval: str):
+    return _per_frame(check_weekly_rsi_low, n_tickers, n_bars, interval)
+
+
+def _filter_case(n_tickers: int, n_bars: int, interval: str, use_panel: bool):
+    stocks = synthetic_stocks(n_tickers, n_bars, interval)
+
+    def run():
+        for stock in stocks:
+            invalidate_features(stock.data)
+        StockFilter(
+            stocks=stocks,
+            patterns=PATTERNS,
+            extra_params={"use_cache": False, "use_panel": use_panel},
+        ).filter()
+
+    return run
+
+
+@case("filter_panel")
+def filter_panel_case(n_tickers: int, n_bars: int, interval: str):
+    return _filter_case(n_tickers, n_bars, interval, use_panel=True)
+
+
+@case("filter_sequential")
+def filter_sequential_case(n_tickers: int, n_bars: int, interval: str):
+    return _filter_case(n_tickers, n_bars, interval, use_panel=False)
+
+
+@case("filter_download")
+def filter_download_case(n_tickers: int, n_bars: int, interval: str):
+    """Filter tickers from their symbols, through the bulk loader."""
+    install_offline_resolver()
+    tickers = [f"SYN{i:05d}" for i in range(n_tickers)]
+    extra_params = {
+        "use_cache": False,
+        "interval": interval,
+        "downloader": FakeDownloader(n_bars),
+    }
+
+    def run():
+        StockFilter(
+            stocks=tickers, patterns=PATTERNS, extra_params=extra_params
+        ).filter()
+
+    return run
+
+
+@case("backtest")
+def backtest_case(n_tickers: int, n_bars: int, interval: str):
+    stocks = synthetic_stocks(n_tickers, n_bars, interval)
+    backtest = Backtest(stocks, PATTERNS, extra_params={"use_cache": False})
+
+    def run():
+        for stock in stocks:
+            invalidate_features(stock.data)
+        backtest.run()
+
+    return run
+
+
+@case("sweep")
+def sweep_case(n_tickers: int, n_bars: int, interval: str):
+    stocks = synthetic_stocks(n_tickers, n_bars, interval)
+    sweep = Sweep(stocks, SWEEP_GRIDS, extra_params={"use_cache": False})
+    return sweep.run
+
+
+@case("save_pdf_report")
+def report_case(n_tickers: int, n_bars: int, interval: str):
+    stocks = synthetic_stocks(n_tickers, n_bars, interval)
+    extra_params = {"use_cache": False, "interval": interval, "render_workers": 1}
+
+    def run():
+        OfflineReport(stocks=stocks, extra_params=extra_params).save_pdf_report(
+            BytesIO()
+        )
+
+    return run
+
+
+def measure(run: Callable[[], None], repeats: int) -> Tuple[float, float]:
+    """Time the best of `repeats` runs, then trace the peak memory of one run.
+
+    Returns:
+        Tuple[float, float]: The time in seconds and the peak memory in MB.
+    """
+    run()  # Warm up, e.g. imports and compiled regular expressions
+    seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        seconds = min(seconds, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / 1024**2
+
+
+def run_suite(
+    cases: List[str],
+    tickers: List[int],
+    n_bars: int,
+    interval: str,
+    repeats: int,
+    report_tickers: int,
+) -> List[dict]:
+    results = []
+    for name in cases:
+        sizes = tickers
+        if name == "save_pdf_report":
+            sizes = sorted({min(n, report_tickers) for n in tickers})
+        for n_tickers in sizes:
+            run = CASES[name](n_tickers, n_bars, interval)
+            seconds, peak_mb = measure(run, repeats)
+            result = {
+                "case": name,
+                "tickers": n_tickers,
+                "bars": n_bars,
+                "interval": interval,
+                "seconds": seconds,
+                "throughput": n_tickers / seconds,
+                "peak_mb": peak_mb,
+            }
+            print(
+                f"{name:<22} {n_tickers:>7} {seconds:>9.4f} "
+                f"{result['throughput']:>12.1f} {peak_mb:>9.1f}",
+                flush=True,
+            )
+            results.append(result)
+    return results
+
+
+def _key(result: dict) -> tuple:
+    return result["case"], result["tickers"], result["bars"], result["interval"]
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Compare the throughputs with a baseline.
+
+    Returns:
+        List[str]: The descriptions of the regressions.
+    """
+    baseline = {_key(result): result for result in baseline}
+    regressions = []
+    print(
+        f"\n{'case':<22} {'tickers':>7} {'baseline/s':>12} {'now/s':>12} {'ratio':>7}"
+    )
+    for result in results:
+        reference = baseline.get(_key(result))
+        if reference is None:
+            continue
+        ratio = result["throughput"] / reference["throughput"]
+        print(
+            f"{result['case']:<22} {result['tickers']:>7} "
+            f"{reference['throughput']:>12.1f} {result['throughput']:>12.1f} "
+            f"{ratio:>7.2f}"
+        )
+        if ratio < 1 - tolerance:
+            regressions.append(
+                f"{result['case']} with {result['tickers']} tickers is "
+                f"{1 / ratio:.2f}x slower than the baseline"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--tickers", default="100,500,1000")
+    parser.add_argument("--bars", type=int, default=260)
+    parser.add_argument("--interval", default="1wk", choices=["1d", "1wk", "1mo"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--report-tickers",
+        type=int,
+        default=50,
+        help="The maximum number of tickers of the report case",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with the results of this file")
+    parser.add_argument("--save-baseline", help="Write the results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    print(
+        f"{'case':<22} {'tickers':>7} {'seconds':>9} {'tickers/s':>12} {'peak MB':>9}"
+    )
+    results = run_suite(
+        args.cases.split(","),
+        [int(n) for n in args.tickers.split(",")],
+        args.bars,
+        args.interval,
+        args.repeats,
+        args.report_tickers,
+    )
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump({"results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Synthetic OHLCV data for offline benchmarks."""
+
+from typing import List
+import numpy as np
+import pandas as pd
+from stockaxion.stock import Stock
+
+INTERVAL_FREQUENCIES = {"1d": "B", "1wk": "W-MON", "1mo": "MS"}
+
+
+def synthetic_ohlcv(
+    n_bars: int = 260, interval: str = "1wk", seed: int = 0, end: str = None
+) -> pd.DataFrame:
+    """Generate a random walk of OHLCV bars.
+
+    Args:
+        n_bars (int): The number of bars.
+        interval (str): The interval of the bars (1d, 1wk or 1mo).
+        seed (int): The seed of the random generator.
+        end (str): The date of the last bar, today by default.
+
+    Returns:
+        pd.DataFrame: The bars, with the columns of a Yahoo Finance download.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(
+        end=end or pd.Timestamp.now().normalize(),
+        periods=n_bars,
+        freq=INTERVAL_FREQUENCIES[interval],
+        name="Date",
+    )
+    returns = rng.normal(0.002, 0.05, n_bars)
+    close = 100 * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.02, n_bars)) * close
+    return pd.DataFrame(
+        {
+            "Open": open_,
+            "High": np.maximum(open_, close) + spread,
+            "Low": np.minimum(open_, close) - spread,
+            "Close": close,
+            "Volume": rng.integers(10**5, 10**7, n_bars).astype(float),
+        },
+        index=index,
+    )
+
+
+def synthetic_stocks(
+    n_tickers: int = 100, n_bars: int = 260, interval: str = "1wk", seed: int = 0
+) -> List[Stock]:
+    """Generate stocks with their data already loaded."""
+    stocks = []
+    for i in range(n_tickers):
+        stock = Stock(f"SYN{i:05d}", interval=interval)
+        stock._data = synthetic_ohlcv(n_bars, interval, seed=seed + i)
+        stocks.append(stock)
+    return stocks
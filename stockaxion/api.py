@@ -1,10 +1,33 @@
+import asyncio
 from typing import List
 from stockaxion.stock_search import StockSearch
-from stockaxion.stock_filter import StockFilter
+from stockaxion.stock_filter import StockFilter, match_patterns
 from stockaxion.reporting import Report
 from stockaxion.indicators.pattern import get_all_pattern_functions
+import stockaxion.profiling as profiling
+from stockaxion.profiling import format_summary, timed
 from stockaxion.logger import logger
 
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_FILTER_WORKERS = 4
+
+# Marks the end of a pipeline queue
+_DONE = object()
+
+
+async def _gather_or_cancel(*coroutines):
+    """Run coroutines concurrently. If one of them raises, cancel the others,
+    which may be blocked on a queue, and raise its exception."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
 
 class Investor:
     def __init__(
@@ -17,13 +40,32 @@ class Investor:
         self.patterns = patterns or get_all_pattern_functions()
         self.extra_params = extra_params
 
-    def run(self, use_filters: bool = True):
+    def run(self, use_filters: bool = True, profile: bool = False):
         """First get stocks from the stock search, then filter the stocks
-        based on the given patterns and finally generate a report."""
+        based on the given patterns and finally generate a report.
+
+        With `profile`, the time spent in each phase (fetch, resolve, pattern
+        checks, LLM calls, rendering...) is logged with its p50/p95 at the end
+        and kept in `self.profile`. The measurements are also sent to the sinks
+        of `extra_params["profile_sinks"]`, see `stockaxion.profiling`.
+        """
+        if not profile:
+            return self._run(use_filters)
+        with profiling.profile(*self.extra_params.get("profile_sinks", [])) as sink:
+            try:
+                return self._run(use_filters)
+            finally:
+                self.profile = sink.summary()
+                logger.info(f"Profile:\n{format_summary(self.profile)}")
+
+    def _run(self, use_filters: bool):
         if not self.stocks:
             logger.info("No stocks provided. Searching for stocks...")
             search_criteria = self.extra_params.get("search_criteria")
-            self.stocks = StockSearch().search(search_criteria)
+            with timed("search"):
+                self.stocks = StockSearch().search(
+                    search_criteria, self.extra_params.get("search_params")
+                )
             logger.info(f"Found {len(self.stocks)} stocks: {self.stocks}")
 
         if not use_filters:
@@ -31,11 +73,12 @@ class Investor:
             filtered_stocks = self.stocks
         else:
             logger.info(f"Filtering stocks based on patterns: {self.patterns}")
-            filtered_stocks = StockFilter(
-                stocks=self.stocks,
-                patterns=self.patterns,
-                extra_params=self.extra_params,
-            ).filter()
+            with timed("filter"):
+                filtered_stocks = StockFilter(
+                    stocks=self.stocks,
+                    patterns=self.patterns,
+                    extra_params=self.extra_params,
+                ).filter()
             logger.info(
                 f"Found {len(filtered_stocks)} stocks after filtering: {filtered_stocks}"
             )
@@ -44,6 +87,99 @@ class Investor:
             return
         logger.info("Generating report...")
         report = Report(stocks=filtered_stocks, extra_params=self.extra_params)
-        report.save_pdf_report()
+        with timed("report"):
+            report.save_pdf_report()
         logger.info("Report generated successfully. Report available at: report.pdf")
         return report
+
+    async def arun(self, use_filters: bool = True):
+        """Run the search, the filtering and the reporting as overlapping stages.
+
+        Tickers flow from the search to the fetchers, fetched stocks to the
+        pattern checks and matching stocks to the report through bounded
+        queues of `queue_size` items, so a report page is generated as soon as
+        a stock matches. The stages run `fetch_workers` and `filter_workers`
+        concurrent tasks; the report is written by a single task, with the
+        data already fetched. If a stage fails, the other ones are cancelled.
+        """
+        queue_size = self.extra_params.get("queue_size", DEFAULT_QUEUE_SIZE)
+        fetch_workers = self.extra_params.get("fetch_workers", DEFAULT_FETCH_WORKERS)
+        filter_workers = self.extra_params.get(
+            "filter_workers", DEFAULT_FILTER_WORKERS
+        )
+        tickers = asyncio.Queue(maxsize=queue_size)
+        fetched = asyncio.Queue(maxsize=queue_size)
+        matched = asyncio.Queue(maxsize=queue_size)
+        stock_filter = StockFilter(
+            stocks=[], patterns=self.patterns, extra_params=self.extra_params
+        )
+        report = Report(stocks=[], extra_params=self.extra_params)
+
+        async def search():
+            if self.stocks:
+                for ticker_symbol in self.stocks:
+                    await tickers.put(ticker_symbol)
+            else:
+                search_criteria = self.extra_params.get("search_criteria") or [
+                    "rise_and_fall"
+                ]
+                for criterion in search_criteria:
+                    logger.info(f"Searching for stocks matching {criterion}...")
+                    found = await asyncio.to_thread(
+                        StockSearch().search,
+                        [criterion],
+                        self.extra_params.get("search_params"),
+                    )
+                    logger.info(f"Found {len(found)} stocks: {found}")
+                    for ticker_symbol in found:
+                        await tickers.put(ticker_symbol)
+            for _ in range(fetch_workers):
+                await tickers.put(_DONE)
+
+        async def fetch():
+            while (ticker_symbol := await tickers.get()) is not _DONE:
+                stock = stock_filter._get_stocks([ticker_symbol])[0]
+                await asyncio.to_thread(lambda: stock.data)
+                await fetched.put(stock)
+
+        async def fetch_stage():
+            await _gather_or_cancel(*(fetch() for _ in range(fetch_workers)))
+            for _ in range(filter_workers):
+                await fetched.put(_DONE)
+
+        async def check():
+            while (stock := await fetched.get()) is not _DONE:
+                if not use_filters or await asyncio.to_thread(
+                    match_patterns,
+                    stock_filter.patterns,
+                    stock.ticker_symbol,
+                    stock.data,
+                ):
+                    await matched.put(stock)
+
+        async def check_stage():
+            await _gather_or_cancel(*(check() for _ in range(filter_workers)))
+            await matched.put(_DONE)
+
+        async def write_report():
+            pdf = None
+            while (stock := await matched.get()) is not _DONE:
+                report.stocks.append(stock)
+                report._update_stock(stock)
+                if pdf is None:
+                    pdf = await asyncio.to_thread(report._new_pdf)
+                logger.info(f"Adding {stock.ticker_symbol} to the report")
+                await asyncio.to_thread(report._add_stock_pages, pdf, stock)
+            if pdf is not None:
+                await asyncio.to_thread(report._write_pdf, pdf)
+
+        await _gather_or_cancel(
+            search(), fetch_stage(), check_stage(), write_report()
+        )
+        if not report.stocks:
+            logger.info("No stocks found")
+            return
+        logger.info(
+            f"Report generated successfully. Report available at: {report.output_file}"
+        )
+        return report
@@ -0,0 +1,327 @@
+"""Walk-forward backtest of the patterns.
+
+The signal of a pattern at a bar is its verdict on the data up to that bar,
+i.e. what `StockFilter` would have answered on that day. Instead of checking
+every prefix of the data, which is quadratic in the number of bars, the
+expanding patterns compute the signals at every bar in one vectorized pass:
+running maxima and their positions for `check_rise_then_fall`, the last low RSI
+before each bar for `check_weekly_rsi_low`, and the cup kernel over sliding
+windows for `check_cup_and_handle`. Patterns without an expanding version are
+checked on every prefix.
+
+The signals are then compared with the forward returns of the stock over
+several horizons, giving per ticker, pattern and horizon the number of
+signals, their hit rate (positive forward return) and mean return, next to
+those of all the bars.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from stockaxion.data_loader import BulkLoader
+from stockaxion.indicators.panel import (
+    cup_and_handle_mask,
+    cup_and_handle_stats,
+    pct_change,
+    rolling_sum,
+)
+from stockaxion.indicators.pattern import Pattern
+from stockaxion.indicators.price import calculate_rsi, get_close
+from stockaxion.stock import Stock
+from stockaxion.stock_filter import StockFilter
+from stockaxion.logger import logger
+
+DEFAULT_HORIZONS = (4, 13, 26)
+DEFAULT_MIN_BARS = 20
+
+EXPANDING_PATTERNS: Dict[str, Callable] = {}
+
+
+def register_expanding_pattern(name: str):
+    """Register the expanding implementation of the pattern function `name`.
+
+    It takes the close prices and the pattern parameters and returns, for each
+    bar, the verdict of the pattern on the prices up to that bar.
+    """
+
+    def decorator(func: Callable):
+        EXPANDING_PATTERNS[name] = func
+        return func
+
+    return decorator
+
+
+def _running_extremum(values: np.ndarray, maximum: bool) -> Tuple[np.ndarray, ...]:
+    """The running max (or min) of values with NaN, and the position of its
+    first occurrence, as `idxmax` (or `idxmin`) on each prefix."""
+    sign = 1 if maximum else -1
+    filled = np.where(np.isnan(values), -np.inf, sign * values)
+    running = np.maximum.accumulate(filled)
+    previous = np.concatenate([[-np.inf], running[:-1]])
+    positions = np.where(filled > previous, np.arange(len(values)), 0)
+    return sign * running, np.maximum.accumulate(positions)
+
+
+@register_expanding_pattern("check_rise_then_fall")
+def expanding_rise_then_fall(
+    close: pd.Series, window_size=20, rise_threshold=100
+) -> np.ndarray:
+    """Expanding version of `check_rise_then_fall`."""
+    values = close.to_numpy(dtype=float)
+    sums = rolling_sum(pct_change(values[:, None]), window_size)[:, 0]
+    rise_peak, rise_pos = _running_extremum(sums, maximum=True)
+    fall_peak, fall_pos = _running_extremum(sums, maximum=False)
+    lengths = np.arange(1, len(values) + 1)
+    valid = np.logical_or.accumulate(~np.isnan(sums))
+    with np.errstate(invalid="ignore"):
+        in_range = (np.abs(fall_peak) > 0.25 * np.abs(rise_peak)) & (
+            np.abs(fall_peak) < 0.5 * np.abs(rise_peak)
+        )
+        high_rise = rise_peak > rise_threshold
+    late_fall = fall_pos >= lengths - lengths // 4
+    return valid & (rise_pos <= fall_pos) & late_fall & high_rise & in_range
+
+
+@register_expanding_pattern("check_weekly_rsi_low")
+def expanding_weekly_rsi_low(
+    close: pd.Series, window_size=14, rsi_threshold=30
+) -> np.ndarray:
+    """Expanding version of `check_weekly_rsi_low`: the RSI is causal, so the
+    signal is whether the last low RSI is in the month before the bar."""
+    rsi = calculate_rsi(close.to_frame("Close"), window=window_size).to_numpy()
+    positions = np.arange(len(rsi))
+    with np.errstate(invalid="ignore"):
+        low = rsi < rsi_threshold
+    last_low = np.maximum.accumulate(np.where(low, positions, -1))
+    index = pd.DatetimeIndex(close.index)
+    month_start = index.searchsorted(index - pd.DateOffset(months=1), side="left")
+    return last_low >= month_start
+
+
+@register_expanding_pattern("check_cup_and_handle")
+def expanding_cup_and_handle(
+    close: pd.Series,
+    min_cup_bars=7,
+    max_cup_bars=65,
+    max_handle_bars=8,
+    min_depth=12,
+    max_depth=50,
+    max_retracement=50,
+    rim_tolerance=10,
+    peak_order=2,
+) -> np.ndarray:
+    """Expanding version of `check_cup_and_handle`.
+
+    The cup ending on a bar only depends on the `max_cup_bars` +
+    `max_handle_bars` + 1 bars before it, plus the bars around the left rim, so
+    the kernel runs once on the sliding windows of all the bars.
+    """
+    values = close.to_numpy(dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    width = max_cup_bars + max_handle_bars + 1 + peak_order
+    padded = np.concatenate([np.full(width - 1, np.nan), values])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, width).T
+    lengths = np.minimum(np.arange(1, n + 1), width)
+    stats = cup_and_handle_stats(
+        windows,
+        lengths,
+        min_cup_bars,
+        max_cup_bars,
+        max_handle_bars,
+        rim_tolerance,
+        peak_order,
+    )
+    return cup_and_handle_mask(
+        stats, min_depth, max_depth, max_retracement, rim_tolerance
+    )
+
+
+def prefix_signals(pattern: Pattern, df: pd.DataFrame, min_bars: int) -> np.ndarray:
+    """The signals of a pattern without expanding version, checked on every
+    prefix of the data from `min_bars` bars. Quadratic in the number of bars."""
+    signals = np.zeros(len(df), dtype=bool)
+    for end in range(min_bars, len(df) + 1):
+        signals[end - 1] = bool(pattern.check(df.iloc[:end]))
+    return signals
+
+
+def pattern_signals(
+    patterns: List[Pattern], close: pd.Series, min_bars: int = DEFAULT_MIN_BARS
+) -> pd.DataFrame:
+    """The signal of each pattern at each bar.
+
+    Args:
+        patterns (List[Pattern]): The patterns.
+        close (pd.Series): The close prices of a stock, without missing values.
+        min_bars (int): No signal is given before this number of bars.
+
+    Returns:
+        pd.DataFrame: The boolean signals, with the patterns as columns.
+    """
+    signals = {}
+    for pattern in patterns:
+        expanding = EXPANDING_PATTERNS.get(pattern.name)
+        if expanding is not None:
+            signal = expanding(close, **pattern.params)
+        else:
+            signal = prefix_signals(pattern, close.to_frame("Close"), min_bars)
+        signal = np.asarray(signal, dtype=bool).copy()
+        signal[: min_bars - 1] = False
+        signals[pattern.name] = signal
+    return pd.DataFrame(signals, index=close.index)
+
+
+def forward_returns(close: pd.Series, horizons: List[int]) -> pd.DataFrame:
+    """The return in % from each bar to `horizon` bars later, NaN at the end."""
+    values = close.to_numpy(dtype=float)
+    returns = {}
+    for horizon in horizons:
+        future = np.full(len(values), np.nan)
+        if horizon < len(values):
+            future[: len(values) - horizon] = values[horizon:]
+        returns[horizon] = (future / values - 1) * 100
+    return pd.DataFrame(returns, index=close.index)
+
+
+def backtest_series(
+    ticker: str,
+    close: pd.Series,
+    patterns: List[Pattern],
+    horizons: List[int] = DEFAULT_HORIZONS,
+    min_bars: int = DEFAULT_MIN_BARS,
+    onsets: bool = False,
+) -> List[dict]:
+    """Backtest the patterns on the close prices of one stock.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        close (pd.Series): The close prices.
+        patterns (List[Pattern]): The patterns.
+        horizons (List[int]): The horizons of the forward returns, in bars.
+        min_bars (int): No signal is given before this number of bars.
+        onsets (bool): Only count the first bar of consecutive signals.
+
+    Returns:
+        List[dict]: One row per pattern and horizon.
+    """
+    close = close.dropna()
+    signals = pattern_signals(patterns, close, min_bars).to_numpy()
+    if onsets:
+        signals = signals & ~np.vstack([np.zeros_like(signals[:1]), signals[:-1]])
+    returns = forward_returns(close, horizons)
+    rows = []
+    for h, horizon in enumerate(horizons):
+        future = returns[horizon].to_numpy()
+        known = ~np.isnan(future)
+        base = future[known]
+        for p, pattern in enumerate(patterns):
+            hits = future[signals[:, p] & known]
+            rows.append(
+                {
+                    "ticker": ticker,
+                    "pattern": pattern.name,
+                    "horizon": horizon,
+                    "signals": len(hits),
+                    "hit_rate": (hits > 0).mean() if len(hits) else np.nan,
+                    "mean_return": hits.mean() if len(hits) else np.nan,
+                    "base_hit_rate": (base > 0).mean() if len(base) else np.nan,
+                    "base_mean_return": base.mean() if len(base) else np.nan,
+                }
+            )
+    return rows
+
+
+def _backtest_task(args) -> List[dict]:
+    return backtest_series(*args)
+
+
+class Backtest:
+    """Backtest the patterns on the history of several stocks.
+
+    The stocks are loaded like in `StockFilter`, from the price cache when
+    available, and backtested on `process_workers` processes if set. The
+    parameters of the patterns are taken from `extra_params["pattern_params"]`.
+
+    Args:
+        stocks (List[str] | List[Stock]): The ticker symbols or the stocks.
+        patterns (List[str] | List[Pattern]): The patterns to backtest.
+        horizons (List[int]): The horizons of the forward returns, in bars.
+        extra_params (dict): The parameters of the run, see `StockFilter`,
+            plus `min_bars` (default 20) and `onsets` (default False).
+    """
+
+    def __init__(
+        self,
+        stocks: List[str] | List[Stock],
+        patterns: List[str] | List[Pattern],
+        horizons: List[int] = DEFAULT_HORIZONS,
+        extra_params: dict = {},
+    ):
+        self.extra_params = extra_params
+        stock_filter = StockFilter(stocks, patterns, extra_params)
+        self.cache = stock_filter.cache
+        self.stocks = stock_filter.stocks
+        self.patterns = stock_filter.patterns
+        self.horizons = list(horizons)
+
+    def run(self) -> pd.DataFrame:
+        """Run the backtest.
+
+        Returns:
+            pd.DataFrame: One row per ticker, pattern and horizon with the
+                number of signals, their hit rate and mean forward return, and
+                the hit rate and mean forward return of all the bars.
+        """
+        BulkLoader.from_params(self.extra_params, cache=self.cache).load(self.stocks)
+        tasks = []
+        for stock in self.stocks:
+            data = stock.data
+            if data is None or data.empty:
+                logger.info(f"No data available for stock {stock.ticker_symbol}")
+                continue
+            tasks.append(
+                (
+                    stock.ticker_symbol,
+                    get_close(data),
+                    self.patterns,
+                    self.horizons,
+                    self.extra_params.get("min_bars", DEFAULT_MIN_BARS),
+                    self.extra_params.get("onsets", False),
+                )
+            )
+        process_workers = self.extra_params.get("process_workers")
+        if process_workers:
+            with ProcessPoolExecutor(max_workers=process_workers) as executor:
+                results = list(
+                    executor.map(
+                        _backtest_task,
+                        tasks,
+                        chunksize=max(1, len(tasks) // (4 * process_workers)),
+                    )
+                )
+        else:
+            results = [_backtest_task(task) for task in tasks]
+        return pd.DataFrame([row for rows in results for row in rows])
+
+    @staticmethod
+    def summary(results: pd.DataFrame) -> pd.DataFrame:
+        """Aggregate the results of `run` over the tickers, weighting each
+        ticker by its number of signals."""
+        results = results.assign(
+            hits=results["hit_rate"].fillna(0) * results["signals"],
+            total_return=results["mean_return"].fillna(0) * results["signals"],
+        )
+        summary = results.groupby(["pattern", "horizon"]).agg(
+            tickers=("ticker", "nunique"),
+            signals=("signals", "sum"),
+            hits=("hits", "sum"),
+            total_return=("total_return", "sum"),
+            base_hit_rate=("base_hit_rate", "mean"),
+            base_mean_return=("base_mean_return", "mean"),
+        )
+        summary["hit_rate"] = summary["hits"] / summary["signals"]
+        summary["mean_return"] = summary["total_return"] / summary["signals"]
+        return summary.drop(columns=["hits", "total_return"])
@@ -0,0 +1,253 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Tuple
+import pandas as pd
+from stockaxion.utils.download import yf_download, split_download
+from stockaxion.utils.generic import get_cache_dir
+from stockaxion.logger import logger
+from stockaxion.profiling import count
+
+DEFAULT_STALENESS = timedelta(hours=12)
+DEFAULT_MAX_AGE = timedelta(days=30)
+DEFAULT_MAX_SIZE = 1024**3
+METADATA_KEY = b"stockaxion"
+
+FRESH = "fresh"
+STALE = "stale"
+MISSING = "missing"
+
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def period_start(period: str, now: pd.Timestamp = None) -> pd.Timestamp | None:
+    """Return the first date covered by a Yahoo Finance period (e.g., 5y).
+
+    Args:
+        period (str): The period, e.g. 1d, 5d, 1mo, 6mo, 1y, 5y, ytd or max.
+        now (pd.Timestamp): The end of the period, today by default.
+
+    Returns:
+        pd.Timestamp | None: The start of the period, or None for "max".
+    """
+    now = now if now is not None else pd.Timestamp.now().normalize()
+    if period is None or period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz=now.tz)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Invalid period: {period}")
+    return now - pd.DateOffset(**{_PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def slice_period(data: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Keep the rows of the data which fall in the given period."""
+    start = period_start(period, pd.Timestamp.now(tz=data.index.tz).normalize())
+    if start is None:
+        return data
+    return data[data.index >= start]
+
+
+class PriceCache:
+    """Local Parquet cache of OHLCV data keyed by ticker and interval.
+
+    Each (ticker, interval) pair is stored in its own Parquet file with the
+    start of the longest period requested so far in its metadata. Entries older
+    than `staleness` are topped up with the bars after their last timestamp
+    only. `evict` drops entries older than `max_age` and then the least
+    recently updated ones until the cache is smaller than `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        staleness: timedelta = DEFAULT_STALENESS,
+        max_age: timedelta = DEFAULT_MAX_AGE,
+        max_size: int = DEFAULT_MAX_SIZE,
+        downloader: Callable[..., pd.DataFrame] = None,
+    ):
+        self.cache_dir = cache_dir or get_cache_dir("prices")
+        self.staleness = staleness
+        self.max_age = max_age
+        self.max_size = max_size
+        self.downloader = downloader or yf_download
+        self._lock = threading.Lock()
+
+    def _path(self, ticker: str, interval: str) -> str:
+        return os.path.join(self.cache_dir, interval, f"{ticker}.parquet")
+
+    def entries(self, interval: str) -> Dict[str, float]:
+        """The cached tickers of an interval, with the time of their last update."""
+        directory = os.path.join(self.cache_dir, interval)
+        if not os.path.isdir(directory):
+            return {}
+        return {
+            entry.name[: -len(".parquet")]: entry.stat().st_mtime
+            for entry in os.scandir(directory)
+            if entry.name.endswith(".parquet")
+        }
+
+    def read(
+        self, ticker: str, interval: str
+    ) -> Tuple[pd.DataFrame | None, pd.Timestamp | None]:
+        """Read a cached entry.
+
+        Returns:
+            Tuple[pd.DataFrame | None, pd.Timestamp | None]: The cached data, or
+                None if not cached, and the first date it covers (None for "max").
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self._path(ticker, interval)
+        if not os.path.exists(path):
+            return None, None
+        try:
+            table = pq.read_table(path)
+        except (OSError, pa.ArrowException) as e:
+            logger.info(f"Ignoring unreadable cache entry {path}: {e}")
+            return None, None
+        metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+        start = metadata.get("start")
+        return table.to_pandas(), pd.Timestamp(start) if start else None
+
+    def write(
+        self, ticker: str, interval: str, data: pd.DataFrame, start: pd.Timestamp
+    ):
+        """Store the data of a ticker, covering the period from `start`."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self._path(ticker, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(data)
+        metadata = {
+            **(table.schema.metadata or {}),
+            METADATA_KEY: json.dumps(
+                {"start": start.isoformat() if start is not None else None}
+            ).encode(),
+        }
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, path)
+
+    def append(
+        self,
+        ticker: str,
+        interval: str,
+        cached: pd.DataFrame,
+        start: pd.Timestamp,
+        new_data: pd.DataFrame | None,
+    ) -> pd.DataFrame:
+        """Append newly downloaded bars to a cached entry and store it.
+
+        The last cached bar may have been incomplete, so bars present in both
+        frames are taken from `new_data`.
+        """
+        if new_data is None or new_data.empty:
+            os.utime(self._path(ticker, interval))
+            return cached
+        columns = cached.columns.intersection(new_data.columns)
+        data = pd.concat([cached, new_data[columns]])
+        data = data[~data.index.duplicated(keep="last")].sort_index()
+        self.write(ticker, interval, data, start)
+        return data
+
+    def status(
+        self, ticker: str, period: str, interval: str
+    ) -> Tuple[str, pd.DataFrame | None, pd.Timestamp | None]:
+        """Tell whether the requested period can be served from the cache.
+
+        Returns:
+            Tuple[str, pd.DataFrame | None, pd.Timestamp | None]: FRESH, STALE
+                or MISSING, with the cached data and the start it covers.
+        """
+        cached, start = self.read(ticker, interval)
+        if cached is None or cached.empty:
+            return MISSING, None, None
+        requested_start = period_start(period)
+        if start is not None and (requested_start is None or requested_start < start):
+            return MISSING, None, None
+        age = time.time() - os.path.getmtime(self._path(ticker, interval))
+        if age > self.staleness.total_seconds():
+            return STALE, cached, start
+        return FRESH, cached, start
+
+    def get(self, ticker: str, period: str, interval: str) -> pd.DataFrame | None:
+        """Get the data of a ticker, downloading only what is not cached.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str): The period for which to fetch the data (e.g., 1y).
+            interval (str): The interval at which to fetch the data (e.g., 1wk).
+
+        If topping up a stale entry fails, the cached data is returned with a
+        warning.
+
+        Returns:
+            pd.DataFrame | None: The stock data, or None if nothing is available.
+        """
+        state, cached, start = self.status(ticker, period, interval)
+        count(f"cache.{state}")
+        if state == STALE:
+            try:
+                frame = self.downloader(
+                    [ticker], interval=interval, start=cached.index[-1]
+                )
+            except Exception as e:
+                # The entry is left stale, so that the next access tops it up
+                logger.warning(f"Top-up of {ticker} failed, using stale data: {e}")
+            else:
+                new_data = split_download(frame, ticker)
+                cached = self.append(ticker, interval, cached, start, new_data)
+        elif state == MISSING:
+            try:
+                frame = self.downloader([ticker], period=period, interval=interval)
+            except Exception as e:
+                logger.warning(f"Download of {ticker} failed: {e}")
+                return None
+            data = split_download(frame, ticker)
+            if data is None:
+                return None
+            self.write(ticker, interval, data, period_start(period))
+            return data
+        return slice_period(cached, period)
+
+    def evict(self):
+        """Remove the entries older than `max_age`, then the least recently
+        updated ones until the cache fits in `max_size` bytes."""
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".parquet"):
+                        path = os.path.join(root, name)
+                        stat = os.stat(path)
+                        entries.append((stat.st_mtime, stat.st_size, path))
+            now = time.time()
+            entries.sort()
+            total_size = sum(size for _, size, _ in entries)
+            for mtime, size, path in entries:
+                too_old = now - mtime > self.max_age.total_seconds()
+                if not too_old and total_size <= self.max_size:
+                    break
+                os.remove(path)
+                total_size -= size
+
+
+def get_price_cache(extra_params: dict) -> PriceCache | None:
+    """Create the price cache configured by the `extra_params` of a filter or
+    report, or None if `use_cache` is False."""
+    if not extra_params.get("use_cache", True):
+        return None
+    return PriceCache(
+        cache_dir=extra_params.get("cache_dir"),
+        staleness=extra_params.get("cache_staleness", DEFAULT_STALENESS),
+        max_age=extra_params.get("cache_max_age", DEFAULT_MAX_AGE),
+        max_size=extra_params.get("cache_max_size", DEFAULT_MAX_SIZE),
+        downloader=extra_params.get("downloader"),
+    )
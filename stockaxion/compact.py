@@ -0,0 +1,173 @@
+"""Compact, array-backed representation of the price series of a stock.
+
+A Yahoo Finance download holds each column in float64, plus any derived
+columns. A `CompactSeries` keeps only the OHLCV values, in float32, in a
+single contiguous (5, n_bars) array and the timestamps as int64 epoch
+nanoseconds, i.e. 28 bytes per bar. The arrays can be backed by memory-mapped
+files, which several processes map without copying, and a memory-mapped series
+is pickled as its path only.
+
+`CompactSeries.to_frame` returns a pandas view of the arrays, without copy, for
+the existing pattern functions.
+"""
+
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+class CompactSeries:
+    """OHLCV bars of a stock in contiguous float32 arrays.
+
+    Attributes:
+        ticker (str): The stock ticker symbol.
+        timestamps (np.ndarray): The int64 epoch nanoseconds of the bars.
+        values (np.ndarray): The float32 (5, n_bars) array of the OHLCV fields.
+        tz (str): The time zone of the timestamps, or None if they are naive.
+        index_name (str): The name of the index of the pandas view.
+        path (str): The path of the backing files, or None if in memory.
+    """
+
+    __slots__ = (
+        "ticker",
+        "timestamps",
+        "values",
+        "tz",
+        "index_name",
+        "path",
+        "_frame",
+    )
+
+    def __init__(
+        self,
+        ticker: str,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        tz: str = None,
+        index_name: str = "Date",
+        path: str = None,
+    ):
+        if values.shape != (len(FIELDS), len(timestamps)):
+            raise ValueError(
+                f"Expected values of shape {(len(FIELDS), len(timestamps))}, "
+                f"got {values.shape}"
+            )
+        self.ticker = ticker
+        self.timestamps = timestamps
+        self.values = values
+        self.tz = tz
+        self.index_name = index_name
+        self.path = path
+        self._frame = None
+
+    @classmethod
+    def from_frame(
+        cls, ticker: str, df: pd.DataFrame, directory: str = None
+    ) -> "CompactSeries":
+        """Convert the data of a stock, keeping only the OHLCV columns.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            df (pd.DataFrame): The stock data, as downloaded.
+            directory (str): Save the series in this directory and map it
+                from there, instead of keeping it in memory.
+        """
+        index = pd.DatetimeIndex(df.index)
+        values = np.ascontiguousarray(df[list(FIELDS)].to_numpy(np.float32).T)
+        series = cls(
+            ticker,
+            index.as_unit("ns").asi8.copy(),
+            values,
+            tz=str(index.tz) if index.tz is not None else None,
+            index_name=index.name,
+        )
+        if directory is not None:
+            return series.save(os.path.join(directory, _file_name(ticker)))
+        return series
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.values.nbytes
+
+    def index(self) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(self.timestamps.view("M8[ns]"), name=self.index_name)
+        if self.tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        return index
+
+    def to_frame(self) -> pd.DataFrame:
+        """A pandas view of the series, sharing the memory of the arrays.
+
+        The view of a memory-mapped series is read-only.
+        """
+        if self._frame is None:
+            # The (n_bars, 5) transpose of the C-contiguous values has the
+            # layout of a pandas block, so no copy is made
+            self._frame = pd.DataFrame(
+                self.values.T, index=self.index(), columns=list(FIELDS), copy=False
+            )
+        return self._frame
+
+    def save(self, path: str) -> "CompactSeries":
+        """Write the series to `path`.npy, `path`.index.npy and `path`.json.
+
+        Returns:
+            CompactSeries: The series mapped from the written files.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        for suffix, array in ((".npy", self.values), (".index.npy", self.timestamps)):
+            mapped = np.lib.format.open_memmap(
+                path + suffix, mode="w+", dtype=array.dtype, shape=array.shape
+            )
+            mapped[...] = array
+            mapped.flush()
+            del mapped
+        with open(path + ".json", "w") as f:
+            json.dump(
+                {"ticker": self.ticker, "tz": self.tz, "index_name": self.index_name},
+                f,
+            )
+        return self.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactSeries":
+        """Map a series saved with `save`, read-only."""
+        with open(path + ".json") as f:
+            metadata = json.load(f)
+        return cls(
+            metadata["ticker"],
+            np.load(path + ".index.npy", mmap_mode="r"),
+            np.load(path + ".npy", mmap_mode="r"),
+            tz=metadata["tz"],
+            index_name=metadata["index_name"],
+            path=path,
+        )
+
+    def __reduce__(self):
+        if self.path is not None:
+            return CompactSeries.load, (self.path,)
+        return (
+            CompactSeries,
+            (
+                self.ticker,
+                self.timestamps,
+                self.values,
+                self.tz,
+                self.index_name,
+            ),
+        )
+
+    def __repr__(self) -> str:
+        backing = f"mapped from {self.path}" if self.path else "in memory"
+        return f"CompactSeries({self.ticker!r}, {len(self)} bars, {backing})"
+
+
+def _file_name(ticker: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
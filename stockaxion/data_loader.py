@@ -0,0 +1,199 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+import pandas as pd
+from stockaxion.stock import Stock
+from stockaxion.cache import (
+    PriceCache,
+    FRESH,
+    STALE,
+    get_price_cache,
+    period_start,
+    slice_period,
+)
+from stockaxion.resolver import get_default_resolver
+from stockaxion.utils.download import yf_download, split_download
+from stockaxion.logger import logger
+
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_MAX_WORKERS = 4
+
+
+def _loaded(stock: Stock, on_load: Callable[[Stock], None] = None):
+    if on_load is not None and stock._data is not None:
+        on_load(stock)
+
+
+class BulkLoader:
+    """Load the data of many stocks with chunked multi-ticker downloads.
+
+    Stocks are grouped by (period, interval) and each group is downloaded in
+    chunks of `chunk_size` tickers, `max_workers` chunks at a time. Tickers
+    missing from a bulk download (e.g. symbols which need an exchange suffix)
+    fall back to `Stock.fetch_data`. Stocks with a base interval are
+    downloaded at their base interval, see `Stock.fetch_interval`.
+
+    With a price cache, fresh entries are served without any download and
+    stale ones are topped up in chunks with the bars after their last cached
+    timestamp.
+
+    The `on_load` callback of `load` is called with each stock as soon as its
+    data is set, e.g. to convert it to a compact representation while the
+    other chunks are downloading.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        downloader: Callable[..., pd.DataFrame] = None,
+        cache: PriceCache = None,
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.downloader = downloader or yf_download
+        self.cache = cache
+
+    @classmethod
+    def from_params(
+        cls, extra_params: dict, cache: PriceCache = None
+    ) -> "BulkLoader":
+        """Create a loader from the `extra_params` of a filter or report."""
+        return cls(
+            chunk_size=extra_params.get("chunk_size", DEFAULT_CHUNK_SIZE),
+            max_workers=extra_params.get("max_workers", DEFAULT_MAX_WORKERS),
+            downloader=extra_params.get("downloader"),
+            cache=cache if cache is not None else get_price_cache(extra_params),
+        )
+
+    def _group(
+        self, stocks: List[Stock], on_load: Callable[[Stock], None] = None
+    ) -> Tuple[Dict[Tuple[str, str], List[Stock]], Dict[Tuple[str, str], list]]:
+        """Group the stocks to download by (period, interval).
+
+        Returns:
+            The groups of stocks to download fully, and the groups of
+            (stock, cached data, cached start) to top up.
+        """
+        groups, top_ups = {}, {}
+        for stock in stocks:
+            if stock._data is not None:
+                continue
+            key = (stock.period, stock.fetch_interval())
+            if self.cache is not None:
+                state, cached, start = self.cache.status(stock.ticker_symbol, *key)
+                if state == FRESH:
+                    stock._set_data(slice_period(cached, stock.period), stock.period)
+                    _loaded(stock, on_load)
+                    continue
+                if state == STALE:
+                    top_ups.setdefault(key, []).append((stock, cached, start))
+                    continue
+            groups.setdefault(key, []).append(stock)
+        return groups, top_ups
+
+    def _top_up_chunk(
+        self,
+        chunk: list,
+        period: str,
+        interval: str,
+        on_load: Callable[[Stock], None] = None,
+    ) -> List[Stock]:
+        """Download the bars missing from the cache for one chunk.
+
+        If the download fails, the stocks get their stale cached data, like
+        with `PriceCache.get`, and the entries are left stale.
+        """
+        tickers = [stock.ticker_symbol for stock, _, _ in chunk]
+        since = min(cached.index[-1] for _, cached, _ in chunk)
+        try:
+            frame = self.downloader(tickers, interval=interval, start=since)
+            failed = False
+        except Exception as e:
+            logger.warning(f"Bulk top-up of {tickers} failed, using stale data: {e}")
+            frame, failed = None, True
+        for stock, cached, start in chunk:
+            data = cached
+            if not failed:
+                new_data = split_download(frame, stock.ticker_symbol, len(chunk))
+                data = self.cache.append(
+                    stock.ticker_symbol, interval, cached, start, new_data
+                )
+            stock._set_data(slice_period(data, period), period)
+            _loaded(stock, on_load)
+        return []
+
+    def _download_chunk(
+        self,
+        chunk: List[Stock],
+        period: str,
+        interval: str,
+        on_load: Callable[[Stock], None] = None,
+    ) -> List[Stock]:
+        """Download one chunk and fill the stocks. Return the stocks left without data."""
+        tickers = [stock.ticker_symbol for stock in chunk]
+        try:
+            frame = self.downloader(tickers, period=period, interval=interval)
+        except Exception as e:
+            logger.info(f"Bulk download failed for {tickers}: {e}")
+            return chunk
+        missing = []
+        for stock in chunk:
+            data = split_download(frame, stock.ticker_symbol, len(chunk))
+            if data is None:
+                missing.append(stock)
+                continue
+            stock._set_data(data, period)
+            if self.cache is not None:
+                self.cache.write(
+                    stock.ticker_symbol, interval, data, period_start(period)
+                )
+            _loaded(stock, on_load)
+        return missing
+
+    def load(
+        self, stocks: List[Stock], on_load: Callable[[Stock], None] = None
+    ) -> List[Stock]:
+        """Fill the data of the stocks which have not been loaded yet.
+
+        Args:
+            stocks (List[Stock]): The stocks to load.
+            on_load (Callable[[Stock], None]): Called with each stock once its
+                data is set, possibly from a download thread.
+
+        Returns:
+            List[Stock]: The same stocks, with their data loaded when available.
+        """
+        groups, top_ups = self._group(stocks, on_load)
+        chunks = []
+        for tasks, method in (
+            (groups, self._download_chunk),
+            (top_ups, self._top_up_chunk),
+        ):
+            for (period, interval), group in tasks.items():
+                for start in range(0, len(group), self.chunk_size):
+                    chunk = group[start : start + self.chunk_size]
+                    chunks.append((method, chunk, period, interval, on_load))
+        if not chunks:
+            return stocks
+
+        logger.info(
+            f"Downloading {sum(len(c[1]) for c in chunks)} stocks in {len(chunks)} chunks"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda args: args[0](*args[1:]), chunks)
+            missing = [stock for result in results for stock in result]
+
+        # Resolve the exchange suffixes of the missing tickers concurrently so
+        # that the fallback fetches hit the resolver cache.
+        get_default_resolver().resolve_many([stock.ticker_symbol for stock in missing])
+        for stock in missing:
+            logger.info(f"{stock.ticker_symbol} not in bulk download, fetching alone")
+            stock.fetch_data(stock.period, stock.interval)
+            _loaded(stock, on_load)
+        if self.cache is not None:
+            self.cache.evict()
+        return stocks
@@ -0,0 +1,94 @@
+"""Registry and cache of the indicators derived from a stock DataFrame.
+
+Indicators such as the returns, the rolling sums or the RSI are computed from
+the stock data without modifying it, and memoized per DataFrame by indicator
+name, parameters and data version, so that the patterns and plots of a stock
+reuse them. A cache lives as long as its DataFrame: it is dropped when the
+DataFrame is garbage collected, e.g. when `Stock.fetch_data` replaces the data
+of a stock, and `invalidate_features` must be called if a DataFrame is modified
+in place.
+"""
+
+import functools
+import inspect
+import threading
+import weakref
+from typing import Callable, Dict
+
+INDICATORS: Dict[str, Callable] = {}
+
+
+class FeatureCache(dict):
+    """The indicators computed on one DataFrame, keyed by (name, params, version)."""
+
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+
+
+_feature_caches: Dict[int, FeatureCache] = {}
+_lock = threading.Lock()
+
+
+def get_feature_cache(df) -> FeatureCache:
+    """Return the cache of derived series of a DataFrame."""
+    key = id(df)
+    cache = _feature_caches.get(key)
+    if cache is None:
+        with _lock:
+            cache = _feature_caches.get(key)
+            if cache is None:
+                cache = _feature_caches[key] = FeatureCache()
+                weakref.finalize(df, _feature_caches.pop, key, None)
+    return cache
+
+
+def invalidate_features(df):
+    """Drop the indicators computed on a DataFrame and bump its data version."""
+    cache = _feature_caches.get(id(df))
+    if cache is not None:
+        cache.clear()
+        cache.version += 1
+
+
+def indicator(name: str):
+    """Register a function computing an indicator from a DataFrame and memoize it.
+
+    The function must take the DataFrame as first argument and hashable
+    parameters, and must not modify the DataFrame. The returned value is
+    shared between callers and must not be modified either.
+    """
+
+    def decorator(func: Callable):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(df, *args, **kwargs):
+            arguments = signature.bind(df, *args, **kwargs)
+            arguments.apply_defaults()
+            params = tuple(arguments.arguments.items())[1:]
+            cache = get_feature_cache(df)
+            key = (name, params, cache.version)
+            if key not in cache:
+                cache[key] = func(df, *args, **kwargs)
+            return cache[key]
+
+        INDICATORS[name] = wrapper
+        return wrapper
+
+    return decorator
+
+
+def compute_indicator(df, name: str, **params):
+    """Compute a registered indicator, or get it from the cache.
+
+    Args:
+        df (pd.DataFrame): The stock data as a pandas DataFrame.
+        name (str): The name of the indicator (e.g., rsi).
+        **params: The parameters of the indicator (e.g., window=14).
+    """
+    if name not in INDICATORS:
+        raise ValueError(
+            f"Invalid indicator. Valid indicators are: {list(INDICATORS.keys())}"
+        )
+    return INDICATORS[name](df, **params)
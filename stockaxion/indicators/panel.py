@@ -0,0 +1,355 @@
+"""Cross-sectional versions of the patterns, evaluated on a panel of all tickers.
+
+A panel is a DataFrame with dates as rows and tickers as columns (e.g. the
+close prices). The panel patterns compute the same verdicts as the pattern
+functions in `stockaxion.indicators.pattern`, for every ticker at once.
+"""
+
+from typing import Callable, Dict, List
+import numpy as np
+import pandas as pd
+from stockaxion.indicators.price import get_close
+
+PANEL_PATTERNS: Dict[str, Callable] = {}
+
+
+def register_panel_pattern(name: str):
+    """Register the panel implementation of the pattern function `name`."""
+
+    def decorator(func: Callable):
+        PANEL_PATTERNS[name] = func
+        return func
+
+    return decorator
+
+
+def build_panel(
+    frames: List[pd.DataFrame], names: List[str], field: str = "Close"
+) -> pd.DataFrame:
+    """Build a panel from the data of several stocks.
+
+    Args:
+        frames (List[pd.DataFrame]): The stock data as pandas DataFrames.
+        names (List[str]): The ticker symbols, used as panel columns.
+        field (str): The column to take from each DataFrame.
+
+    Returns:
+        pd.DataFrame: The panel with the union of the dates as rows.
+    """
+    if field == "Close":
+        series = [get_close(df) for df in frames]
+    else:
+        series = [df[field] for df in frames]
+    if not series:
+        return pd.DataFrame()
+    panel = pd.concat(series, axis=1).sort_index()
+    panel.columns = names
+    return panel
+
+
+def align_right(panel: pd.DataFrame):
+    """Move the valid values of each column to the bottom of the panel.
+
+    Tickers have histories of different lengths. Once right-aligned, row
+    `n - length + i` holds the i-th bar of a ticker, so that rolling windows
+    and positions are the same as on the ticker's own DataFrame. Missing bars
+    inside a history are skipped.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The values (n x k), their
+            dates (n x k) and the number of valid bars of each ticker (k).
+    """
+    values = panel.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    order = np.argsort(valid, axis=0, kind="stable")
+    index = panel.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    dates = index.values[order]
+    return np.take_along_axis(values, order, axis=0), dates, valid.sum(axis=0)
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling sum along the rows, NaN unless the whole window is valid."""
+    n = values.shape[0]
+    result = np.full(values.shape, np.nan)
+    if n < window:
+        return result
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+    result[window - 1 :] = windows.sum(axis=-1)
+    return result
+
+
+def pct_change(values: np.ndarray) -> np.ndarray:
+    """Percentage change along the rows, NaN on the first row."""
+    change = np.full(values.shape, np.nan)
+    change[1:] = (values[1:] / values[:-1] - 1) * 100
+    return change
+
+
+def rise_fall_stats(values: np.ndarray, lengths: np.ndarray, window_size: int):
+    """Compute the rolling rise and fall statistics of right-aligned prices.
+
+    Returns:
+        Dict[str, np.ndarray]: For each ticker, the highest and lowest rolling
+            sum of percentage changes (`rise_peak`, `fall_peak`), their rows
+            (`rise_pos`, `fall_pos`) and whether the rolling sum has any value
+            (`valid`).
+    """
+    sums = rolling_sum(pct_change(values), window_size)
+    has_sum = ~np.isnan(sums)
+    valid = has_sum.any(axis=0)
+    rise_pos = np.where(has_sum, sums, -np.inf).argmax(axis=0)
+    fall_pos = np.where(has_sum, sums, np.inf).argmin(axis=0)
+    columns = np.arange(values.shape[1])
+    return {
+        "rise_peak": np.where(valid, sums[rise_pos, columns], np.nan),
+        "fall_peak": np.where(valid, sums[fall_pos, columns], np.nan),
+        "rise_pos": rise_pos,
+        "fall_pos": fall_pos,
+        "valid": valid & (lengths > 0),
+    }
+
+
+def rise_then_fall_mask(
+    stats: dict, n_rows: int, lengths: np.ndarray, rise_threshold: float
+) -> np.ndarray:
+    """Apply the conditions of `check_rise_then_fall` to the rise/fall statistics."""
+    rise_peak = stats["rise_peak"]
+    fall_peak = stats["fall_peak"]
+    ordered = stats["rise_pos"] <= stats["fall_pos"]
+    late_fall = stats["fall_pos"] >= n_rows - lengths // 4
+    with np.errstate(invalid="ignore"):
+        in_range = (np.abs(fall_peak) > 0.25 * np.abs(rise_peak)) & (
+            np.abs(fall_peak) < 0.5 * np.abs(rise_peak)
+        )
+        high_rise = rise_peak > rise_threshold
+    return stats["valid"] & ordered & late_fall & high_rise & in_range
+
+
+def rsi(values: np.ndarray, lengths: np.ndarray, window: int = 14) -> np.ndarray:
+    """RSI of right-aligned prices, as computed by `calculate_rsi` on each ticker."""
+    n = values.shape[0]
+    delta = np.full(values.shape, np.nan)
+    delta[1:] = np.diff(values, axis=0)
+    with np.errstate(invalid="ignore"):
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+    padding = np.zeros((window - 1, values.shape[1]))
+    gain_sum = rolling_sum(np.vstack([padding, gain]), window)[window - 1 :]
+    loss_sum = rolling_sum(np.vstack([padding, loss]), window)[window - 1 :]
+    # Rolling mean with min_periods=1 over the bars of each ticker only
+    local_pos = np.arange(n)[:, None] - (n - lengths)[None, :]
+    count = np.clip(local_pos + 1, 1, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = (gain_sum / count) / (loss_sum / count)
+        result = 100 - (100 / (1 + rs))
+    return np.where(local_pos >= 0, result, np.nan)
+
+
+def last_month_mask(dates: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Mask of the bars in the last month of each ticker's history."""
+    n = dates.shape[0]
+    cutoff = pd.DatetimeIndex(dates[-1]) - pd.DateOffset(months=1)
+    local_pos = np.arange(n)[:, None] - (n - lengths)[None, :]
+    return (dates >= cutoff.values[None, :]) & (local_pos >= 0)
+
+
+def local_peaks(values: np.ndarray, order: int) -> np.ndarray:
+    """Mask of the local maxima along the rows: the values which are the highest
+    of the `order` values before and after them."""
+    n = values.shape[0]
+    filled = np.where(np.isnan(values), -np.inf, values)
+    padding = np.full((order, values.shape[1]), -np.inf)
+    padded = np.vstack([padding, filled, padding])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * order + 1, axis=0)
+    return (filled == windows.max(axis=-1)[:n]) & ~np.isnan(values)
+
+
+def cup_and_handle_stats(
+    values: np.ndarray,
+    lengths: np.ndarray,
+    min_cup_bars: int = 7,
+    max_cup_bars: int = 65,
+    max_handle_bars: int = 8,
+    rim_tolerance: float = 10,
+    peak_order: int = 2,
+):
+    """Find the most recent cup and handle ending on the last bar of
+    right-aligned prices.
+
+    The right rim is the highest close of the last `max_handle_bars` + 1 bars,
+    followed by the handle. The left rim is the most recent local peak between
+    `min_cup_bars` and `max_cup_bars` bars before the right rim, at the level of
+    the right rim within `rim_tolerance` %. The bottom is the lowest close
+    between the rims. All the steps are vectorized over the tickers and linear
+    in the number of bars.
+
+    Returns:
+        Dict[str, np.ndarray]: For each ticker, the rows of the left rim, the
+            bottom and the right rim (`left`, `bottom`, `right`), the depth of
+            the cup and the retracement of the handle in % of the cup
+            (`depth`, `retracement`), the highest close inside the cup above
+            the lower rim in % (`overshoot`), the number of bars of the handle
+            (`handle_bars`) and whether a cup was found (`valid`).
+    """
+    n, k = values.shape
+    rows = np.arange(n)[:, None]
+    columns = np.arange(k)
+    local_pos = rows - (n - lengths)[None, :]
+    values = np.where(local_pos >= 0, values, np.nan)
+    if n == 0:
+        empty = np.zeros(k, dtype=int)
+        return {
+            "left": empty,
+            "bottom": empty,
+            "right": empty,
+            "depth": np.full(k, np.nan),
+            "retracement": np.full(k, np.nan),
+            "overshoot": np.full(k, np.nan),
+            "handle_bars": empty,
+            "valid": np.zeros(k, dtype=bool),
+        }
+
+    # Right rim and handle
+    tail_start = max(n - max_handle_bars - 1, 0)
+    tail = values[tail_start:]
+    right = tail_start + np.where(np.isnan(tail), -np.inf, tail).argmax(axis=0)
+    right_close = values[right, columns]
+    after_right = rows > right[None, :]
+    handle_low = np.where(after_right, values, np.inf).min(axis=0)
+    handle_low = np.where(np.isinf(handle_low), right_close, handle_low)
+
+    # Left rim: the most recent peak at the level of the right rim
+    with np.errstate(invalid="ignore"):
+        level = np.abs(values / right_close[None, :] - 1) * 100 <= rim_tolerance
+    candidates = (
+        local_peaks(values, peak_order)
+        & level
+        & (rows <= (right - min_cup_bars)[None, :])
+        & (rows >= (right - max_cup_bars)[None, :])
+    )
+    left = np.where(candidates, rows, -1).max(axis=0)
+    has_left = left >= 0
+    left = np.maximum(left, 0)
+    left_close = values[left, columns]
+
+    # Bottom of the cup
+    inside = (rows > left[None, :]) & (rows < right[None, :])
+    bottom = np.where(inside & ~np.isnan(values), values, np.inf).argmin(axis=0)
+    bottom_close = values[bottom, columns]
+    cup_high = np.where(inside & ~np.isnan(values), values, -np.inf).max(axis=0)
+    rim_low = np.minimum(left_close, right_close)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        depth = (1 - bottom_close / left_close) * 100
+        retracement = (right_close - handle_low) / (right_close - bottom_close) * 100
+        overshoot = (cup_high / rim_low - 1) * 100
+    return {
+        "left": left,
+        "bottom": bottom,
+        "right": right,
+        "depth": np.where(has_left, depth, np.nan),
+        "retracement": np.where(has_left, retracement, np.nan),
+        "overshoot": np.where(has_left, overshoot, np.nan),
+        "handle_bars": n - 1 - right,
+        "valid": has_left & ~np.isnan(right_close) & (lengths > 0),
+    }
+
+
+def cup_and_handle_mask(
+    stats: dict,
+    min_depth: float = 12,
+    max_depth: float = 50,
+    max_retracement: float = 50,
+    rim_tolerance: float = 10,
+    min_side: float = 0.2,
+) -> np.ndarray:
+    """Apply the conditions of `check_cup_and_handle` to the cup statistics:
+    the depth of the cup, a U shape with the bottom away from the rims by at
+    least `min_side` of the cup width, no close inside the cup above the rims
+    and a handle retracing at most `max_retracement` % of the cup."""
+    width = stats["right"] - stats["left"]
+    u_shape = (stats["bottom"] - stats["left"] >= min_side * width) & (
+        stats["right"] - stats["bottom"] >= min_side * width
+    )
+    with np.errstate(invalid="ignore"):
+        deep_enough = (stats["depth"] >= min_depth) & (stats["depth"] <= max_depth)
+        below_rims = stats["overshoot"] <= rim_tolerance
+        handle = (stats["handle_bars"] >= 1) & (
+            stats["retracement"] <= max_retracement
+        )
+    return stats["valid"] & deep_enough & u_shape & below_rims & handle
+
+
+@register_panel_pattern("check_rise_then_fall")
+def panel_rise_then_fall(
+    panel: pd.DataFrame, window_size=20, rise_threshold=100
+) -> pd.Series:
+    """Panel version of `check_rise_then_fall`.
+
+    Args:
+        panel (pd.DataFrame): The close prices, dates as rows and tickers as columns.
+        window_size (int): The size of the rolling window.
+        rise_threshold (float): The minimum rise of the rolling sum, in percent.
+
+    Returns:
+        pd.Series: Whether each ticker matches the pattern.
+    """
+    values, _, lengths = align_right(panel)
+    stats = rise_fall_stats(values, lengths, window_size)
+    mask = rise_then_fall_mask(stats, values.shape[0], lengths, rise_threshold)
+    return pd.Series(mask, index=panel.columns)
+
+
+@register_panel_pattern("check_weekly_rsi_low")
+def panel_weekly_rsi_low(
+    panel: pd.DataFrame, window_size=14, rsi_threshold=30
+) -> pd.Series:
+    """Panel version of `check_weekly_rsi_low`.
+
+    Args:
+        panel (pd.DataFrame): The close prices, dates as rows and tickers as columns.
+        window_size (int): The size of the rolling window.
+        rsi_threshold (float): The RSI threshold.
+
+    Returns:
+        pd.Series: Whether each ticker matches the pattern.
+    """
+    values, dates, lengths = align_right(panel)
+    if values.shape[0] == 0:
+        return pd.Series(False, index=panel.columns)
+    with np.errstate(invalid="ignore"):
+        low = rsi(values, lengths, window_size) < rsi_threshold
+    mask = (low & last_month_mask(dates, lengths)).any(axis=0) & (lengths > 0)
+    return pd.Series(mask, index=panel.columns)
+
+
+@register_panel_pattern("check_cup_and_handle")
+def panel_cup_and_handle(
+    panel: pd.DataFrame,
+    min_cup_bars=7,
+    max_cup_bars=65,
+    max_handle_bars=8,
+    min_depth=12,
+    max_depth=50,
+    max_retracement=50,
+    rim_tolerance=10,
+) -> pd.Series:
+    """Panel version of `check_cup_and_handle`.
+
+    Args:
+        panel (pd.DataFrame): The close prices, dates as rows and tickers as columns.
+        The other arguments are those of `check_cup_and_handle`.
+
+    Returns:
+        pd.Series: Whether each ticker matches the pattern.
+    """
+    values, _, lengths = align_right(panel)
+    stats = cup_and_handle_stats(
+        values, lengths, min_cup_bars, max_cup_bars, max_handle_bars, rim_tolerance
+    )
+    mask = cup_and_handle_mask(
+        stats, min_depth, max_depth, max_retracement, rim_tolerance
+    )
+    return pd.Series(mask, index=panel.columns)
@@ -1,16 +1,47 @@
+import numpy as np
 import pandas as pd
 import inspect
 from stockaxion.logger import logger
-from stockaxion.indicators.price import calculate_rsi
+from stockaxion.indicators.price import (
+    calculate_rsi,
+    calculate_rolling_price_change,
+    drop_missing_closes,
+    get_close,
+)
+from stockaxion.indicators.panel import (
+    PANEL_PATTERNS,
+    cup_and_handle_mask,
+    cup_and_handle_stats,
+)
+from stockaxion.profiling import timed
 
 
 class Pattern:
-    def __init__(self, name: str, function):
+    def __init__(self, name: str, function, panel_function=None, params=None):
         self.name = name
         self.function = function
+        # Implementation over a panel of all tickers, see `indicators.panel`
+        self.panel_function = panel_function or PANEL_PATTERNS.get(name)
+        # Keyword arguments of the pattern function (e.g., window_size)
+        self.params = params or {}
 
     def check(self, df, **kwargs):
-        return self.function(df, **kwargs)
+        with timed(f"pattern.{self.name}"):
+            return self.function(df, **{**self.params, **kwargs})
+
+    def check_panel(self, panel, **kwargs):
+        with timed(f"panel.{self.name}"):
+            return self.panel_function(panel, **{**self.params, **kwargs})
+
+    def resolved_params(self) -> dict:
+        """The parameters of the pattern function, including the default ones."""
+        params = {
+            name: parameter.default
+            for name, parameter in inspect.signature(self.function).parameters.items()
+            if parameter.default is not inspect.Parameter.empty
+        }
+        params.update(self.params)
+        return params
 
 
 def check_rise_then_fall(df, window_size=20, rise_threshold=100):
@@ -22,21 +53,21 @@ def check_rise_then_fall(df, window_size=20, rise_threshold=100):
         window_size (int): The size of the rolling window.
 
     """
+    df = drop_missing_closes(df)
     if df.empty:
         logger.info("Empty DataFrame")
         return False
-    # Calculate the percentage change in the stock price
-    df["price_change"] = df["Close"].pct_change() * 100
-
-    # Calculate rolling maximum and minimum percentage change
-    # Calculate the rolling sum of percentage changes
-    df["rolling_sum"] = df["price_change"].rolling(window=window_size).sum()
-    rise_peak = df["rolling_sum"].max()
-    fall_peak = df["rolling_sum"].min()
+    # Calculate the rolling sum of percentage changes in the stock price
+    rolling_sum = calculate_rolling_price_change(df, window=window_size)
+    if rolling_sum.isna().all():
+        logger.info("Not enough data for the rolling window")
+        return False
+    rise_peak = rolling_sum.max()
+    fall_peak = rolling_sum.min()
 
     # Check that the rise occurs before the fall in the rolling sum
-    rise_index = df["rolling_sum"].idxmax()
-    fall_index = df["rolling_sum"].idxmin()
+    rise_index = rolling_sum.idxmax()
+    fall_index = rolling_sum.idxmin()
     if rise_index > fall_index:
         logger.info("Rise occurs after fall")
         return False
@@ -67,6 +98,10 @@ def check_weekly_rsi_low(df, window_size=14, rsi_threshold=30):
 
     """
     # Calculate the RSI of the stock
+    df = drop_missing_closes(df)
+    if df.empty:
+        logger.info("Empty DataFrame")
+        return False
     rsi = calculate_rsi(df, window=window_size)
 
     # Check if the RSI is below the threshold in the last month of the period
@@ -77,6 +112,57 @@ def check_weekly_rsi_low(df, window_size=14, rsi_threshold=30):
     return False
 
 
+def check_cup_and_handle(
+    df,
+    min_cup_bars=7,
+    max_cup_bars=65,
+    max_handle_bars=8,
+    min_depth=12,
+    max_depth=50,
+    max_retracement=50,
+    rim_tolerance=10,
+):
+    """
+    Check if the stock price forms a cup and handle ending on the last bar:
+    a U-shaped decline and recovery between two rims at the same level,
+    followed by a shallow pullback (the handle).
+
+    Args:
+        df (pd.DataFrame): The stock data as a pandas DataFrame.
+        min_cup_bars (int): The minimum number of bars between the rims.
+        max_cup_bars (int): The maximum number of bars between the rims.
+        max_handle_bars (int): The maximum number of bars of the handle.
+        min_depth (float): The minimum depth of the cup, in percent of the left rim.
+        max_depth (float): The maximum depth of the cup, in percent of the left rim.
+        max_retracement (float): The maximum fall of the handle, in percent of
+            the cup depth.
+        rim_tolerance (float): The maximum difference between the rims, in percent.
+
+    """
+    if df.empty:
+        logger.info("Empty DataFrame")
+        return False
+    close = get_close(df).dropna().to_numpy(dtype=float)
+    stats = cup_and_handle_stats(
+        close[:, None],
+        np.array([len(close)]),
+        min_cup_bars,
+        max_cup_bars,
+        max_handle_bars,
+        rim_tolerance,
+    )
+    if not stats["valid"][0]:
+        logger.info("No cup found")
+        return False
+    mask = cup_and_handle_mask(
+        stats, min_depth, max_depth, max_retracement, rim_tolerance
+    )
+    if not mask[0]:
+        logger.info("Cup depth, shape or handle not within thresholds")
+        return False
+    return True
+
+
 # def get_all_pattern_functions():
 #     """Returns a list of all functions defined in the pattern module."""
 #     current_module = inspect.getmodule(get_all_pattern_functions)
@@ -87,8 +173,14 @@ def check_weekly_rsi_low(df, window_size=14, rsi_threshold=30):
 #     return functions
 
 
+# The patterns only checked when requested, since a stock rarely matches them
+# together with the others
+OPT_IN_PATTERNS = ("check_cup_and_handle",)
+
+
 def get_all_pattern_functions():
-    """Returns a list of all functions defined in the pattern module, excluding itself."""
+    """Returns a list of all functions defined in the pattern module, excluding itself
+    and the opt-in patterns."""
     current_module = inspect.getmodule(get_all_pattern_functions)
     functions = []
     for name, obj in inspect.getmembers(current_module):
@@ -96,6 +188,7 @@ def get_all_pattern_functions():
             inspect.isfunction(obj)
             and obj.__module__ == current_module.__name__
             and name != "get_all_pattern_functions"
+            and name not in OPT_IN_PATTERNS
         ):
             functions.append(obj)
     return functions
@@ -1,16 +1,109 @@
-def calculate_rsi(data, window=14):
-    delta = data["Close"].diff()
+from stockaxion.indicators.features import indicator
+from stockaxion.profiling import profiled
+
+
+def get_close(df):
+    """Return the close prices of a stock as a Series."""
+    close = df["Close"]
+    if close.ndim == 2:
+        close = close.iloc[:, 0]
+    return close
+
+
+@indicator("valid_bars")
+def valid_closes(df):
+    """Tell which bars of a stock have a close price.
+
+    Args:
+        df (pd.DataFrame): The stock data as a pandas DataFrame.
+
+    Returns:
+        np.ndarray: The boolean mask of the bars with a close price.
+    """
+    return get_close(df).notna().to_numpy()
+
+
+def drop_missing_closes(df):
+    """Return the bars of a stock which have a close price.
+
+    The patterns skip the missing closes, like the panel patterns do. The
+    DataFrame itself is returned when no close is missing, so that the
+    indicators computed on it are shared. Only the mask is memoized: a memo
+    holding the DataFrame would keep it alive.
+
+    Args:
+        df (pd.DataFrame): The stock data as a pandas DataFrame.
+
+    Returns:
+        pd.DataFrame: The bars with a close price.
+    """
+    valid = valid_closes(df)
+    if valid.all():
+        return df
+    return df[valid]
+
+
+@indicator("price_change")
+def calculate_price_change(df):
+    """Percentage change of the close price from one bar to the next.
+
+    Args:
+        df (pd.DataFrame): The stock data as a pandas DataFrame.
+
+    Returns:
+        pd.Series: The price change in percent.
+    """
+    return get_close(df).pct_change() * 100
+
+
+@indicator("rolling_price_change")
+def calculate_rolling_price_change(df, window=20):
+    """Rolling sum of the percentage changes of the close price.
+
+    Args:
+        df (pd.DataFrame): The stock data as a pandas DataFrame.
+        window (int): The size of the rolling window.
+
+    Returns:
+        pd.Series: The rolling sum of the price changes in percent.
+    """
+    return calculate_price_change(df).rolling(window=window).sum()
+
+
+# The registered indicator is memoized and times each computation
+@indicator("rsi")
+@profiled("rsi")
+def calculate_rsi(data, window=14, smoothing="sma"):
+    """Relative strength index of the close price.
+
+    Args:
+        data (pd.DataFrame): The stock data as a pandas DataFrame.
+        window (int): The RSI window.
+        smoothing (str): "sma" to average the gains and losses over a rolling
+            window, or "wilder" for Wilder's exponential smoothing.
+
+    Returns:
+        pd.Series: The RSI, between 0 and 100.
+    """
+    delta = get_close(data).diff()
     gain = (delta.where(delta > 0, 0)).fillna(0)
     loss = (-delta.where(delta < 0, 0)).fillna(0)
 
-    avg_gain = gain.rolling(window=window, min_periods=1).mean()
-    avg_loss = loss.rolling(window=window, min_periods=1).mean()
+    if smoothing == "wilder":
+        avg_gain = gain.ewm(alpha=1 / window, adjust=False).mean()
+        avg_loss = loss.ewm(alpha=1 / window, adjust=False).mean()
+    elif smoothing == "sma":
+        avg_gain = gain.rolling(window=window, min_periods=1).mean()
+        avg_loss = loss.rolling(window=window, min_periods=1).mean()
+    else:
+        raise ValueError("smoothing must be 'sma' or 'wilder'")
 
     rs = avg_gain / avg_loss
     rsi = 100 - (100 / (1 + rs))
     return rsi
 
 
+@indicator("highest_rise")
 def estimate_rise(df):
     """This function estimates the highest rise
       in stock price during a window of at least 1 month.
@@ -22,10 +115,7 @@ def estimate_rise(df):
     Returns:
         float: The highest rise in stock price.
     """
-    # Calculate the percentage change in the stock price
-    df["price_change"] = df["Close"].pct_change() * 100
-
     # Find the highest rise in stock price
-    highest_rise = df["price_change"].max()
+    highest_rise = calculate_price_change(df).max()
 
     return highest_rise
@@ -0,0 +1,261 @@
+"""Incremental indicators and patterns, updated in O(1) per new bar.
+
+Each indicator can be seeded from history and then fed one value at a time.
+Their values match the batch versions of `stockaxion.indicators.price` up to
+floating point rounding.
+"""
+
+import math
+from collections import deque
+from typing import Callable, Dict, Iterable
+import pandas as pd
+from stockaxion.indicators.price import get_close
+
+STREAMING_PATTERNS: Dict[str, Callable] = {}
+
+
+def register_streaming_pattern(name: str):
+    """Register the streaming implementation of the pattern function `name`."""
+
+    def decorator(cls):
+        STREAMING_PATTERNS[name] = cls
+        return cls
+
+    return decorator
+
+
+class RollingSum:
+    """Rolling sum over the last `window` values, like `Series.rolling().sum()`.
+
+    The sum is NaN while fewer than `min_periods` non-NaN values are in the
+    window. It is maintained with Kahan compensation to avoid drift.
+    """
+
+    def __init__(self, window: int, min_periods: int = None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self._values = deque()
+        self._count = 0
+        self._sum = 0.0
+        self._compensation = 0.0
+
+    def _add(self, value: float):
+        y = value - self._compensation
+        t = self._sum + y
+        self._compensation = (t - self._sum) - y
+        self._sum = t
+
+    def update(self, value: float) -> float:
+        self._values.append(value)
+        if not math.isnan(value):
+            self._count += 1
+            self._add(value)
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            if not math.isnan(old):
+                self._count -= 1
+                self._add(-old)
+        if self._count == 0:
+            self._sum = self._compensation = 0.0
+        return self.value
+
+    @property
+    def count(self) -> int:
+        """The number of non-NaN values in the window."""
+        return self._count
+
+    @property
+    def value(self) -> float:
+        if self._count < max(self.min_periods, 1):
+            return math.nan
+        return self._sum
+
+    def seed(self, values: Iterable[float]) -> float:
+        for value in values:
+            self.update(value)
+        return self.value
+
+
+class _RollingExtremum:
+    """Rolling extremum with a monotonic deque of (position, value)."""
+
+    def __init__(self, window: int, better: Callable[[float, float], bool]):
+        self.window = window
+        self._better = better
+        self._deque = deque()
+        self._nans = deque()
+        self._position = -1
+
+    def update(self, value: float) -> float:
+        self._position += 1
+        start = self._position - self.window + 1
+        if math.isnan(value):
+            self._nans.append(self._position)
+        else:
+            while self._deque and not self._better(self._deque[-1][1], value):
+                self._deque.pop()
+            self._deque.append((self._position, value))
+        while self._deque and self._deque[0][0] < start:
+            self._deque.popleft()
+        while self._nans and self._nans[0] < start:
+            self._nans.popleft()
+        return self.value
+
+    @property
+    def value(self) -> float:
+        # Like pandas with min_periods=window: NaN unless the window is full
+        if self._position + 1 < self.window or self._nans or not self._deque:
+            return math.nan
+        return self._deque[0][1]
+
+    def seed(self, values: Iterable[float]) -> float:
+        for value in values:
+            self.update(value)
+        return self.value
+
+
+class RollingMax(_RollingExtremum):
+    """Rolling maximum over the last `window` values, like `Series.rolling().max()`."""
+
+    def __init__(self, window: int):
+        super().__init__(window, lambda kept, new: kept > new)
+
+
+class RollingMin(_RollingExtremum):
+    """Rolling minimum over the last `window` values, like `Series.rolling().min()`."""
+
+    def __init__(self, window: int):
+        super().__init__(window, lambda kept, new: kept < new)
+
+
+class StreamingRSI:
+    """Incremental RSI, matching `calculate_rsi` with the same smoothing.
+
+    Args:
+        window (int): The RSI window.
+        smoothing (str): "sma" for a simple moving average of the gains and
+            losses, or "wilder" for Wilder's smoothing.
+    """
+
+    def __init__(self, window: int = 14, smoothing: str = "sma"):
+        if smoothing not in ("sma", "wilder"):
+            raise ValueError("smoothing must be 'sma' or 'wilder'")
+        self.window = window
+        self.smoothing = smoothing
+        self._previous = math.nan
+        self._n_bars = 0
+        self._gains = RollingSum(window, min_periods=1)
+        self._losses = RollingSum(window, min_periods=1)
+        self._avg_gain = None
+        self._avg_loss = None
+        self.value = math.nan
+
+    def update(self, close: float) -> float:
+        delta = close - self._previous
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        self._previous = close
+        self._n_bars += 1
+        if self.smoothing == "sma":
+            self._gains.update(gain)
+            self._losses.update(loss)
+            count = min(self._n_bars, self.window)
+            avg_gain = self._gains.value / count
+            avg_loss = self._losses.value / count
+        else:
+            alpha = 1 / self.window
+            if self._avg_gain is None:
+                self._avg_gain, self._avg_loss = gain, loss
+            else:
+                self._avg_gain = (1 - alpha) * self._avg_gain + alpha * gain
+                self._avg_loss = (1 - alpha) * self._avg_loss + alpha * loss
+            avg_gain, avg_loss = self._avg_gain, self._avg_loss
+        if avg_loss == 0:
+            rs = math.inf if avg_gain > 0 else math.nan
+        else:
+            rs = avg_gain / avg_loss
+        self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+    def seed(self, closes: Iterable[float]) -> float:
+        for close in closes:
+            self.update(close)
+        return self.value
+
+
+@register_streaming_pattern("check_rise_then_fall")
+class StreamingRiseThenFall:
+    """Incremental `check_rise_then_fall` over the whole history seen so far."""
+
+    def __init__(self, window_size=20, rise_threshold=100):
+        self.rise_threshold = rise_threshold
+        self._rolling_sum = RollingSum(window_size)
+        self._previous = math.nan
+        self._n_bars = 0
+        self._rise = (-math.inf, -1)
+        self._fall = (math.inf, -1)
+
+    def update(self, timestamp: pd.Timestamp, close: float) -> bool:
+        price_change = (close / self._previous - 1) * 100
+        self._previous = close
+        position = self._n_bars
+        self._n_bars += 1
+        value = self._rolling_sum.update(price_change)
+        if not math.isnan(value):
+            # Keep the first occurrence, like idxmax and idxmin
+            if value > self._rise[0]:
+                self._rise = (value, position)
+            if value < self._fall[0]:
+                self._fall = (value, position)
+        return self.matches
+
+    @property
+    def matches(self) -> bool:
+        (rise_peak, rise_pos), (fall_peak, fall_pos) = self._rise, self._fall
+        if rise_pos < 0 or rise_pos > fall_pos:
+            return False
+        if fall_pos < self._n_bars - self._n_bars // 4:
+            return False
+        return (
+            rise_peak > self.rise_threshold
+            and 0.25 * abs(rise_peak) < abs(fall_peak) < 0.5 * abs(rise_peak)
+        )
+
+
+@register_streaming_pattern("check_weekly_rsi_low")
+class StreamingWeeklyRSILow:
+    """Incremental `check_weekly_rsi_low`, keeping the RSI of the last month."""
+
+    def __init__(self, window_size=14, rsi_threshold=30, smoothing="sma"):
+        self.rsi_threshold = rsi_threshold
+        self._rsi = StreamingRSI(window_size, smoothing)
+        self._last_month = deque()
+        self._n_low = 0
+
+    def update(self, timestamp: pd.Timestamp, close: float) -> bool:
+        low = self._rsi.update(close) < self.rsi_threshold
+        self._last_month.append((timestamp, low))
+        self._n_low += low
+        cutoff = timestamp - pd.DateOffset(months=1)
+        while self._last_month[0][0] < cutoff:
+            _, old_low = self._last_month.popleft()
+            self._n_low -= old_low
+        return self.matches
+
+    @property
+    def matches(self) -> bool:
+        return self._n_low > 0
+
+
+def seed_pattern(evaluator, df: pd.DataFrame) -> bool:
+    """Feed the whole history of a stock to a streaming pattern.
+
+    Returns:
+        bool: Whether the stock matches the pattern at its last bar.
+    """
+    # The patterns skip the missing closes
+    close = get_close(df).dropna()
+    matches = False
+    for timestamp, value in zip(close.index, close.to_numpy(dtype=float)):
+        matches = evaluator.update(timestamp, value)
+    return matches
@@ -0,0 +1,203 @@
+"""Cost and selectivity of the patterns, to order the checks of a filter.
+
+A stock matches when all the patterns match, so the checks stop at the first
+pattern which rejects it. The expected work is the smallest when the patterns
+are checked by increasing cost / rejection rate: cheap patterns which reject
+most stocks first. `PatternStats` records the time spent in each pattern and
+how many of the stocks it checked it rejected, across runs, and orders the
+patterns accordingly. The cost depends on how the patterns are executed (on a
+panel of all the stocks, on worker processes, stock by stock...), so the
+statistics are kept by execution mode.
+
+Some patterns only look at the end of the data, e.g. the RSI of the last month.
+Their verdict on the last bars is the same as on the whole history, so with a
+pre-filter of N bars they are checked first, on the last N bars only, when
+this is enough for them.
+"""
+
+import os
+import sqlite3
+from typing import Callable, Dict, List
+import numpy as np
+import pandas as pd
+from stockaxion.indicators.pattern import Pattern
+from stockaxion.indicators.price import get_close
+from stockaxion.results_store import params_key
+from stockaxion.utils.generic import get_cache_dir
+
+# The number of last bars each pattern needs, by pattern name
+TAIL_BARS: Dict[str, Callable] = {}
+
+
+def register_tail_bars(name: str):
+    """Register the function giving the number of last bars of a stock the
+    pattern `name` depends on. It takes the stock data and the parameters of
+    the pattern."""
+
+    def decorator(func: Callable):
+        TAIL_BARS[name] = func
+        return func
+
+    return decorator
+
+
+@register_tail_bars("check_weekly_rsi_low")
+def _weekly_rsi_low_bars(df: pd.DataFrame, window_size=14, rsi_threshold=30) -> int:
+    # The bars of the last month, and the RSI window before the first one,
+    # without the missing closes which the pattern skips
+    valid = np.flatnonzero(get_close(df).notna().to_numpy())
+    if len(valid) == 0:
+        return len(df)
+    last_month = df.index[valid[-1]] - pd.DateOffset(months=1)
+    width = int((df.index[valid] >= last_month).sum()) + window_size
+    if len(valid) <= width:
+        return len(df)
+    return len(df) - int(valid[-width])
+
+
+@register_tail_bars("check_cup_and_handle")
+def _cup_and_handle_bars(
+    df: pd.DataFrame,
+    min_cup_bars=7,
+    max_cup_bars=65,
+    max_handle_bars=8,
+    min_depth=12,
+    max_depth=50,
+    max_retracement=50,
+    rim_tolerance=10,
+    peak_order=2,
+) -> int:
+    # The handle and the cup, plus the bars around the left rim, without the
+    # missing closes which the pattern skips
+    width = max_cup_bars + max_handle_bars + 1 + peak_order
+    valid = np.flatnonzero(get_close(df).notna().to_numpy())
+    if len(valid) <= width:
+        return len(df)
+    return len(df) - int(valid[-width])
+
+
+def tail_bars(pattern: Pattern, df: pd.DataFrame) -> int | None:
+    """The number of last bars of the data the verdict of the pattern depends
+    on, or None if it depends on the whole history."""
+    function = TAIL_BARS.get(pattern.name)
+    if function is None or df is None or df.empty:
+        return None
+    return function(df, **pattern.params)
+
+
+def stats_key(pattern: Pattern, mode: str) -> tuple:
+    """The key of the statistics of a pattern: its name, parameters and
+    execution mode."""
+    return pattern.name, params_key(pattern.resolved_params()), mode
+
+
+def order_patterns(
+    patterns: List[Pattern],
+    recorded: Dict[tuple, tuple] = None,
+    prefilter_bars=None,
+    mode: str = None,
+) -> List[Pattern]:
+    """Order the patterns by increasing cost per stock / rejection rate.
+
+    The patterns never recorded come first, in the given order, so that they
+    get measured. With `prefilter_bars`, the patterns which only depend on the
+    last bars come before the others.
+
+    Args:
+        patterns (List[Pattern]): The patterns to check.
+        recorded (Dict[tuple, tuple]): The (checked, rejected, seconds) of the
+            patterns by `stats_key`, see `PatternStats.get_many`.
+        prefilter_bars (int): The number of bars of the pre-filter, if any.
+        mode (str): The execution mode of the patterns.
+    """
+    recorded = recorded or {}
+
+    def rank(pattern: Pattern) -> tuple:
+        full_history = bool(prefilter_bars) and pattern.name not in TAIL_BARS
+        stats = recorded.get(stats_key(pattern, mode))
+        if stats is None:
+            return full_history, 0.0
+        checked, rejected, seconds = stats
+        # Smoothed, so that a pattern which never rejected a stock yet still
+        # has a finite rank
+        rejection_rate = (rejected + 1) / (checked + 2)
+        return full_history, seconds / checked / rejection_rate
+
+    return sorted(patterns, key=rank)
+
+
+class PatternStats:
+    """SQLite store of the number of stocks checked and rejected by each
+    pattern, and of the time spent checking them.
+
+    The statistics are kept by pattern and parameters, since both the cost and
+    the selectivity depend on the parameters, and by execution mode, since the
+    cost depends on it.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(get_cache_dir(), "pattern_stats.sqlite")
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pattern_stats ("
+                "pattern TEXT, params TEXT, mode TEXT, checked INTEGER, "
+                "rejected INTEGER, seconds REAL, PRIMARY KEY (pattern, params, mode))"
+            )
+
+    def get_many(self, patterns: List[Pattern], mode: str) -> Dict[tuple, tuple]:
+        """The (checked, rejected, seconds) of the patterns recorded in the
+        execution `mode`, by `stats_key`."""
+        with sqlite3.connect(self.path) as conn:
+            rows = conn.execute(
+                "SELECT * FROM pattern_stats WHERE mode = ?", (mode,)
+            ).fetchall()
+        keys = {stats_key(pattern, mode) for pattern in patterns}
+        return {
+            (name, params, mode): (checked, rejected, seconds)
+            for name, params, mode, checked, rejected, seconds in rows
+            if (name, params, mode) in keys
+        }
+
+    def record(self, stats: Dict[Pattern, tuple], mode: str):
+        """Add the (checked, rejected, seconds) of a run of each pattern in the
+        execution `mode`."""
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT INTO pattern_stats VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (pattern, params, mode) DO UPDATE SET "
+                "checked = checked + excluded.checked, "
+                "rejected = rejected + excluded.rejected, "
+                "seconds = seconds + excluded.seconds",
+                [
+                    (*stats_key(pattern, mode), checked, rejected, seconds)
+                    for pattern, (checked, rejected, seconds) in stats.items()
+                    if checked
+                ],
+            )
+
+    def order(
+        self, patterns: List[Pattern], mode: str, prefilter_bars: int = None
+    ) -> List[Pattern]:
+        """Order the patterns with their statistics recorded in the execution
+        `mode`, see `order_patterns`."""
+        recorded = self.get_many(patterns, mode)
+        return order_patterns(patterns, recorded, prefilter_bars, mode)
+
+    def to_frame(self) -> pd.DataFrame:
+        """All the recorded statistics, with the cost per stock and the
+        rejection rate."""
+        with sqlite3.connect(self.path) as conn:
+            stats = pd.read_sql("SELECT * FROM pattern_stats", conn)
+        stats["seconds_per_stock"] = stats["seconds"] / stats["checked"]
+        stats["rejection_rate"] = stats["rejected"] / stats["checked"]
+        return stats
+
+
+def get_pattern_stats(extra_params: dict) -> PatternStats | None:
+    """Create the pattern statistics configured by the `extra_params` of a
+    filter: a PatternStats, the path of its database, True for the default
+    path, or None."""
+    stats = extra_params.get("pattern_stats")
+    if stats is None or stats is False or isinstance(stats, PatternStats):
+        return stats or None
+    return PatternStats(None if stats is True else stats)
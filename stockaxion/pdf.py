@@ -0,0 +1,25 @@
+"""The PDF document of the reports, on top of fpdf2."""
+
+from io import BytesIO
+from fpdf import FPDF
+
+
+def to_latin1(text: str) -> str:
+    """Replace the characters the core PDF fonts cannot encode."""
+    if text.isascii():
+        return text
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+class PDF(FPDF):
+    def add_chapter(self, title, content):
+        self.add_page()
+        self.set_font("Arial", style="B", size=16)
+        self.cell(0, 10, to_latin1(title), ln=True, align="C")
+        self.ln(10)
+        self.set_font("Arial", size=12)
+        self.multi_cell(0, 10, to_latin1(content))
+
+    def add_png(self, png: bytes, **kwargs):
+        """Add a PNG image from memory. fpdf2 embeds identical images once."""
+        self.image(BytesIO(png), **kwargs)
@@ -0,0 +1,240 @@
+"""Timers and counters on the hot paths of the package.
+
+Instrumented phases (e.g. "fetch", "resolve", "pattern.check_rise_then_fall",
+"rsi", "llm" or "plot.close") are timed with `timed` or the `profiled`
+decorator and events are counted with `count`. Measurements are only taken
+while the profiler is enabled, and are sent to its sinks:
+
+- `MemorySink` keeps the durations to summarize them with p50/p95 per phase,
+- `JsonLinesSink` appends one JSON object per measurement to a file,
+- `PrometheusSink` aggregates them in the Prometheus text exposition format.
+
+For example, `with profile() as sink: Investor(...).run()` followed by
+`print(format_summary(sink.summary()))`, or simply `Investor.run(profile=True)`.
+"""
+
+import asyncio
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+class MemorySink:
+    """Keep the measurements in memory."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, duration: float):
+        with self._lock:
+            self.durations[phase].append(duration)
+
+    def increment(self, name: str, value: int):
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self) -> Dict[str, dict]:
+        """The number of calls, total, p50 and p95 durations in seconds of each
+        phase, and the counters."""
+        with self._lock:
+            durations = {phase: sorted(d) for phase, d in self.durations.items()}
+            counters = dict(self.counters)
+        summary = {
+            phase: {
+                "count": len(d),
+                "total": sum(d),
+                "p50": percentile(d, 50),
+                "p95": percentile(d, 95),
+            }
+            for phase, d in durations.items()
+        }
+        for name, value in counters.items():
+            summary.setdefault(name, {})["events"] = value
+        return summary
+
+
+class JsonLinesSink:
+    """Append each measurement as a JSON line to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, event: dict):
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(event) + "\n")
+
+    def record(self, phase: str, duration: float):
+        self._write({"time": time.time(), "phase": phase, "duration": duration})
+
+    def increment(self, name: str, value: int):
+        self._write({"time": time.time(), "counter": name, "value": value})
+
+
+class PrometheusSink:
+    """Aggregate the measurements as Prometheus summaries and counters."""
+
+    def __init__(self, prefix: str = "stockaxion"):
+        self.prefix = prefix
+        self.sums = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, duration: float):
+        with self._lock:
+            self.sums[phase] += duration
+            self.counts[phase] += 1
+
+    def increment(self, name: str, value: int):
+        with self._lock:
+            self.counters[name] += value
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        name = f"{self.prefix}_phase_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each phase.",
+            f"# TYPE {name} summary",
+        ]
+        with self._lock:
+            for phase in sorted(self.counts):
+                lines.append(f'{name}_sum{{phase="{phase}"}} {self.sums[phase]}')
+                lines.append(f'{name}_count{{phase="{phase}"}} {self.counts[phase]}')
+            name = f"{self.prefix}_events_total"
+            lines += [
+                f"# HELP {name} Number of events.",
+                f"# TYPE {name} counter",
+            ]
+            for counter in sorted(self.counters):
+                lines.append(f'{name}{{event="{counter}"}} {self.counters[counter]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write the metrics to a file, e.g. for the node exporter textfile
+        collector."""
+        with open(path, "w") as f:
+            f.write(self.render())
+
+
+def percentile(values: List[float], q: float) -> float:
+    """The q-th percentile of sorted values, by linear interpolation."""
+    if not values:
+        return float("nan")
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class Profiler:
+    """Send the timings and counts of the instrumented phases to sinks."""
+
+    def __init__(self):
+        self.sinks = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def record(self, phase: str, duration: float):
+        for sink in self.sinks:
+            sink.record(phase, duration)
+
+    def increment(self, name: str, value: int = 1):
+        for sink in self.sinks:
+            sink.increment(name, value)
+
+
+profiler = Profiler()
+
+
+@contextmanager
+def timed(phase: str):
+    """Time the block as the given phase."""
+    if not profiler.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record(phase, time.perf_counter() - start)
+
+
+def count(name: str, value: int = 1):
+    """Count events, e.g. cache hits."""
+    if profiler.enabled:
+        profiler.increment(name, value)
+
+
+def profiled(phase: str):
+    """Decorator timing each call of a function, or coroutine function, as
+    the given phase."""
+
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timed(phase):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with timed(phase):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def profile(*sinks):
+    """Enable the profiler in the block, sending the measurements to the
+    given sinks and to the `MemorySink` it yields."""
+    memory_sink = MemorySink()
+    sinks = (memory_sink, *sinks)
+    for sink in sinks:
+        profiler.add_sink(sink)
+    try:
+        yield memory_sink
+    finally:
+        for sink in sinks:
+            profiler.remove_sink(sink)
+
+
+def format_summary(summary: Dict[str, dict]) -> str:
+    """Format a `MemorySink` summary as a table, slowest phases first."""
+    lines = [f"{'phase':<40} {'calls':>7} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9}"]
+    phases = sorted(
+        (phase for phase, stats in summary.items() if "count" in stats),
+        key=lambda phase: -summary[phase]["total"],
+    )
+    for phase in phases:
+        stats = summary[phase]
+        lines.append(
+            f"{phase:<40} {stats['count']:>7} {stats['total']:>9.3f} "
+            f"{stats['p50'] * 1000:>9.2f} {stats['p95'] * 1000:>9.2f}"
+        )
+    for name, stats in summary.items():
+        if "events" in stats:
+            lines.append(f"{name:<40} {stats['events']:>7} events")
+    return "\n".join(lines)
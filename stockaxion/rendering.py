@@ -0,0 +1,167 @@
+"""Chart rendering on reusable, object-oriented Agg figures.
+
+Charts are rendered to PNG bytes in memory without going through the pyplot
+state machine. Each process keeps one `ChartRenderer`, whose figures and axes
+are reused from one stock to the next. The charts of many stocks are rendered
+on a process pool kept across reports, with the RSI computed once in the
+parent process.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, List
+import pandas as pd
+from stockaxion.indicators.price import calculate_rsi, get_close
+from stockaxion.profiling import timed
+
+CHARTS = ("close", "rsi", "volume")
+DEFAULT_FIGSIZE = (6.4, 4.8)
+DEFAULT_PANEL_FIGSIZE = (6.4, 9.6)
+DEFAULT_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def draw_close(ax, data: pd.DataFrame):
+    close = get_close(data)
+    ax.plot(close.index, close.to_numpy())
+
+
+def draw_rsi(ax, data: pd.DataFrame, rsi: pd.Series = None):
+    if rsi is None:
+        rsi = calculate_rsi(data)
+    ax.plot(rsi.index, rsi.to_numpy())
+    ax.axhline(30, color="red", linestyle="--", label="30%")
+    ax.axhline(70, color="green", linestyle="--", label="70%")
+
+
+def draw_volume(ax, data: pd.DataFrame):
+    volume = data["Volume"]
+    if volume.ndim == 2:
+        volume = volume.iloc[:, 0]
+    ax.plot(volume.index, volume.to_numpy())
+
+
+DRAW_FUNCTIONS = {"close": draw_close, "rsi": draw_rsi, "volume": draw_volume}
+
+
+def _draw(ax, data: pd.DataFrame, chart: str, rsi: pd.Series = None):
+    if chart == "rsi" and rsi is not None:
+        draw_rsi(ax, data, rsi)
+    else:
+        DRAW_FUNCTIONS[chart](ax, data)
+
+
+class ChartRenderer:
+    """Render the charts of stocks on one reusable figure per layout."""
+
+    def __init__(self, figsize=DEFAULT_FIGSIZE, panel_figsize=DEFAULT_PANEL_FIGSIZE):
+        # matplotlib is only loaded when charts are rendered
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self._figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self._figure)
+        self._ax = self._figure.add_subplot()
+        self._panel_figure = Figure(figsize=panel_figsize)
+        FigureCanvasAgg(self._panel_figure)
+        self._panel_axes = self._panel_figure.subplots(len(CHARTS), 1, sharex=True)
+
+    @staticmethod
+    def _to_png(figure) -> bytes:
+        buffer = BytesIO()
+        figure.savefig(buffer, format="png")
+        return buffer.getvalue()
+
+    def render(self, data: pd.DataFrame, chart: str, rsi: pd.Series = None) -> bytes:
+        """Render one chart (close, rsi or volume) of the stock data as PNG,
+        with the RSI of the data if already computed."""
+        with timed(f"render.{chart}"):
+            self._ax.clear()
+            _draw(self._ax, data, chart, rsi)
+            return self._to_png(self._figure)
+
+    def render_all(self, data: pd.DataFrame, rsi: pd.Series = None) -> Dict[str, bytes]:
+        """Render each chart of the stock data as a separate PNG."""
+        return {chart: self.render(data, chart, rsi) for chart in CHARTS}
+
+    def render_panel(self, data: pd.DataFrame, rsi: pd.Series = None) -> bytes:
+        """Render the price, the RSI and the volume in a single PNG."""
+        with timed("render.panel"):
+            for ax, chart in zip(self._panel_axes, CHARTS):
+                ax.clear()
+                _draw(ax, data, chart, rsi)
+                ax.set_ylabel(chart)
+            return self._to_png(self._panel_figure)
+
+
+_renderer = None
+
+
+def get_renderer() -> ChartRenderer:
+    """Return the renderer of the current process."""
+    global _renderer
+    if _renderer is None:
+        _renderer = ChartRenderer()
+    return _renderer
+
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    """Return the process pool rendering the charts, created on first use and
+    kept for the next reports.
+
+    Args:
+        max_workers (int): The number of worker processes,
+            `DEFAULT_RENDER_WORKERS` by default. The pool is recreated if it
+            changes.
+    """
+    global _pool, _pool_workers
+    max_workers = max_workers or DEFAULT_RENDER_WORKERS
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+            _pool_workers = max_workers
+        return _pool
+
+
+def _render_stock(
+    data: pd.DataFrame, combined: bool, rsi: pd.Series = None
+) -> Dict[str, bytes]:
+    if combined:
+        return {"panel": get_renderer().render_panel(data, rsi)}
+    return get_renderer().render_all(data, rsi)
+
+
+def render_charts(
+    frames: List[pd.DataFrame], combined: bool = False, max_workers: int = None
+) -> List[Dict[str, bytes]]:
+    """Render the charts of many stocks, in a process pool if `max_workers` > 1.
+
+    The RSI of each stock is computed in this process, where it is usually
+    memoized already by the patterns, and sent to the workers with the data.
+
+    Args:
+        frames (List[pd.DataFrame]): The data of the stocks.
+        combined (bool): Render the three charts in a single "panel" image.
+        max_workers (int): The number of worker processes,
+            `DEFAULT_RENDER_WORKERS` by default.
+
+    Returns:
+        List[Dict[str, bytes]]: For each stock, the PNG bytes of each chart
+            (close, rsi and volume, or panel).
+    """
+    if max_workers is not None and max_workers <= 1 or len(frames) <= 1:
+        return [_render_stock(data, combined) for data in frames]
+    rsis = [calculate_rsi(data) for data in frames]
+    return list(
+        get_render_pool(max_workers).map(
+            _render_stock, frames, [combined] * len(frames), rsis, chunksize=4
+        )
+    )
@@ -1,31 +1,39 @@
-from typing import List
+from typing import TYPE_CHECKING, BinaryIO, Dict, List
 from stockaxion.stock import Stock
-from stockaxion.utils.llm import llm_client
-from fpdf import FPDF
-import markdown2
-import tempfile
+from stockaxion.rendering import render_charts
+from stockaxion.data_loader import BulkLoader
+from stockaxion.cache import get_price_cache
+from stockaxion.utils.llm import chat, chat_many, DEFAULT_MAX_CONCURRENCY
 from tempfile import TemporaryDirectory
 from stockaxion.utils.generic import get_date
+from stockaxion.profiling import timed
+
+if TYPE_CHECKING:
+    from stockaxion.pdf import PDF
 
-TEMP_DIR = TemporaryDirectory()
 DEFAULT_INTERVAL = "1wk"
 DEFAULT_PERIOD = "5y"
+CHART_TITLES = {
+    "close": "Stock Prices (close)",
+    "rsi": "RSI",
+    "volume": "Volume",
+    "panel": "Stock Prices (close), RSI and Volume",
+}
+_temp_dir = None
 
 
-class PDF(FPDF):
-    def add_chapter(self, title, content):
-        self.add_page()
-        self.set_font("Arial", style="B", size=16)
-        self.cell(
-            0,
-            10,
-            title.encode("latin-1", "replace").decode("latin-1"),
-            ln=True,
-            align="C",
-        )
-        self.ln(10)
-        self.set_font("Arial", size=12)
-        self.multi_cell(0, 10, content.encode("latin-1", "replace").decode("latin-1"))
+def __getattr__(name: str):
+    # fpdf and the temporary directory are only loaded when used
+    global _temp_dir
+    if name == "TEMP_DIR":
+        if _temp_dir is None:
+            _temp_dir = TemporaryDirectory()
+        return _temp_dir
+    if name in ("PDF", "to_latin1"):
+        import stockaxion.pdf
+
+        return getattr(stockaxion.pdf, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Report:
@@ -37,107 +45,151 @@ class Report:
         output_file: str = f"{get_date()}-report.pdf",
         extra_params: dict = {},
     ):
-        if isinstance(stocks[0], str):
-            stocks = [Stock(ticker_symbol) for ticker_symbol in stocks]
+        self.extra_params = extra_params
+        self.cache = get_price_cache(extra_params)
+        if stocks and isinstance(stocks[0], str):
+            stocks = [
+                Stock(
+                    ticker_symbol,
+                    cache=self.cache,
+                    base_interval=extra_params.get("base_interval"),
+                )
+                for ticker_symbol in stocks
+            ]
         self.stocks = stocks
         self.output_file = output_file
-        self.extra_params = extra_params
         self._update_stocks()
 
     def _update_stocks(self):
         for stock in self.stocks:
-            stock.interval = self.extra_params.get("interval", DEFAULT_INTERVAL)
-            stock.period = self.extra_params.get("period", DEFAULT_PERIOD)
+            self._update_stock(stock)
+
+    def _update_stock(self, stock: Stock):
+        """Set the period and interval of the report on a stock, keeping its
+        data when it already has them."""
+        stock.set_resolution(
+            self.extra_params.get("period", DEFAULT_PERIOD),
+            self.extra_params.get("interval", DEFAULT_INTERVAL),
+        )
+
+    def _load_stocks(self):
+        """Download the data of the stocks not loaded yet in bulk."""
+        BulkLoader.from_params(self.extra_params, cache=self.cache).load(self.stocks)
 
     def _display_plots(self):
+        self._load_stocks()
         for stock in self.stocks:
-            stock.fetch_data(
-                period=self.extra_params.get("period", DEFAULT_PERIOD),
-                interval=self.extra_params.get("interval", DEFAULT_INTERVAL),
-            )
             stock.plot_close_price()
 
+    def _reason_to_buy_messages(self, stock):
+        prompt = f"Find the reasons to buy {stock.ticker_symbol}."
+        return [
+            {
+                "role": "system",
+                "content": "You are an expert in stock markets.",
+            },
+            {"role": "user", "content": prompt},
+        ]
+
     def _get_reason_to_buy(self, stock):
         """Get the reason to buy the stock."""
-        prompt = f"Find the reasons to buy {stock.ticker_symbol}."
-        completion = llm_client.chat.completions.create(
+        return chat(self._reason_to_buy_messages(stock), model="grok-beta")
+
+    def _get_reasons_to_buy(self):
+        """Get the reasons to buy all the stocks with concurrent LLM calls.
+
+        Returns:
+            Dict[str, str]: The reason to buy each stock by ticker symbol.
+        """
+        reasons = chat_many(
+            [self._reason_to_buy_messages(stock) for stock in self.stocks],
             model="grok-beta",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert in stock markets.",
-                },
-                {"role": "user", "content": prompt},
-            ],
+            max_concurrency=self.extra_params.get(
+                "llm_max_concurrency", DEFAULT_MAX_CONCURRENCY
+            ),
         )
-        return completion.choices[0].message.content
+        return {
+            stock.ticker_symbol: reason for stock, reason in zip(self.stocks, reasons)
+        }
 
     def _get_reason_to_buy_all_stocks(self):
         """Get the reason to buy the stock."""
+        reasons = self._get_reasons_to_buy()
         for stock in self.stocks:
-            reason = self._get_reason_to_buy(stock)
+            reason = reasons[stock.ticker_symbol]
             print(f"The reason to buy {stock.ticker_symbol} is: {reason}")
 
-    def save_pdf_report(self):
-        """Save the report to a PDF file."""
-
-        with tempfile.TemporaryDirectory() as temp_dir:
-            pdf = PDF()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.add_page()
-            pdf.set_font("Arial", style="B", size=16)
-            pdf.cell(
-                200,
-                10,
-                "Stock Portfolio Report".encode("latin-1", "replace").decode("latin-1"),
-                ln=True,
-                align="C",
+    def _new_pdf(self) -> "PDF":
+        """Create the PDF with the title page of the report."""
+        from stockaxion.pdf import PDF
+
+        pdf = PDF()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        pdf.set_font("Arial", style="B", size=16)
+        pdf.cell(200, 10, "Stock Portfolio Report", ln=True, align="C")
+        pdf.set_font("Arial", size=12)
+        pdf.ln(10)
+        pdf.cell(200, 10, "Stock Prices", ln=True)
+        return pdf
+
+    def _add_stock_pages(
+        self,
+        pdf: "PDF",
+        stock: Stock,
+        reason_to_buy: str = None,
+        charts: Dict[str, bytes] = None,
+    ):
+        """Add the chapter of a stock to the PDF: the reason to buy and the plots."""
+        if charts is None:
+            charts = stock.render_charts(
+                combined=self.extra_params.get("combined_charts", False)
             )
-            pdf.set_font("Arial", size=12)
-            pdf.ln(10)
-            pdf.cell(
-                200,
-                10,
-                "Stock Prices".encode("latin-1", "replace").decode("latin-1"),
-                ln=True,
+        if reason_to_buy is None:
+            reason_to_buy = self._get_reason_to_buy(stock)
+        import markdown2
+
+        reason_to_buy_html = markdown2.markdown(reason_to_buy)
+        reason_to_buy_text = self._html_to_text(reason_to_buy_html)
+        content = f"Reason to buy {stock.ticker_symbol}:\n{reason_to_buy_text}"
+        pdf.add_chapter(stock.ticker_symbol, content)
+        for chart, png in charts.items():
+            pdf.cell(200, 10, CHART_TITLES[chart], ln=True)
+            pdf.add_png(png, x=10, w=190)
+
+    def _write_pdf(self, pdf: "PDF", output: str | BinaryIO = None):
+        """Write the PDF to the output file, a path or a binary file object."""
+        output = output if output is not None else self.output_file
+        if isinstance(output, str):
+            with open(output, "wb") as f:
+                f.write(pdf.output())
+        else:
+            output.write(pdf.output())
+
+    def save_pdf_report(self, output: str | BinaryIO = None):
+        """Save the report to a PDF file.
+
+        Args:
+            output (str | BinaryIO): The path or binary file object to write the
+                report to, `output_file` by default.
+        """
+        self._load_stocks()
+        with timed("report.reasons"):
+            reasons_to_buy = self._get_reasons_to_buy()
+        with timed("report.charts"):
+            charts = render_charts(
+                [stock.data for stock in self.stocks],
+                combined=self.extra_params.get("combined_charts", False),
+                max_workers=self.extra_params.get("render_workers"),
             )
 
-            for stock in self.stocks:
-                close_price_plot_path = stock.plot_close_price(temp_dir=temp_dir)
-                rsi_plot_path = stock.plot_rsi(temp_dir=temp_dir)
-                volume_plot_path = stock.plot_volume(temp_dir=temp_dir)
-                # plot_path = self._get_price_plot(stock, temp_dir)
-                reason_to_buy = self._get_reason_to_buy(stock)
-                reason_to_buy_html = markdown2.markdown(reason_to_buy)
-                reason_to_buy_text = self._html_to_text(reason_to_buy_html)
-                content = f"Reason to buy {stock.ticker_symbol}:\n{reason_to_buy_text}"
-                pdf.add_chapter(stock.ticker_symbol, content)
-                pdf.cell(
-                    200,
-                    10,
-                    "Stock Prices (close)".encode("latin-1", "replace").decode(
-                        "latin-1"
-                    ),
-                    ln=True,
-                )
-                pdf.image(close_price_plot_path, x=10, w=190)
-                pdf.cell(
-                    200,
-                    10,
-                    "RSI".encode("latin-1", "replace").decode("latin-1"),
-                    ln=True,
+        with timed("report.pdf"):
+            pdf = self._new_pdf()
+            for stock, stock_charts in zip(self.stocks, charts):
+                self._add_stock_pages(
+                    pdf, stock, reasons_to_buy[stock.ticker_symbol], stock_charts
                 )
-                pdf.image(rsi_plot_path, x=10, w=190)
-                pdf.cell(
-                    200,
-                    10,
-                    "Volume".encode("latin-1", "replace").decode("latin-1"),
-                    ln=True,
-                )
-                pdf.image(volume_plot_path, x=10, w=190)
-                # pdf.image(plot_path, x=10, w=190)
-
-            pdf.output(self.output_file)
+            self._write_pdf(pdf, output)
 
     def _html_to_text(self, html):
         """Convert HTML content to plain text with basic formatting."""
@@ -0,0 +1,88 @@
+"""Derive coarser bars from a finer base series of a stock.
+
+With a `base_interval` (e.g., 1d), a stock downloads and caches a single base
+series, whatever the interval it is analyzed at. The weekly, monthly... bars
+are aggregated locally from it (first open, highest high, lowest low, last
+close, total volume) with the bin boundaries of Yahoo Finance: weeks start on
+Monday and months on their first day. The resampled frames are memoized per
+base DataFrame like the other indicators, so a run mixing intervals costs one
+download and one aggregation per ticker and interval.
+"""
+
+import pandas as pd
+from stockaxion.indicators.features import indicator
+
+# The pandas resampling rule of each Yahoo Finance interval
+INTERVAL_RULES = {
+    "1m": "1min",
+    "2m": "2min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "60m": "60min",
+    "90m": "90min",
+    "1h": "60min",
+    "1d": "D",
+    "1wk": "W-MON",
+    "1mo": "MS",
+    "3mo": "QS",
+}
+# The intervals each calendar interval can be derived from, besides intraday ones
+_CALENDAR_BASES = {"1d": (), "1wk": ("1d",), "1mo": ("1d",), "3mo": ("1d", "1mo")}
+
+AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Adj Close": "last",
+    "Volume": "sum",
+    "Dividends": "sum",
+    "Stock Splits": "prod",
+}
+
+
+def _minutes(interval: str) -> int | None:
+    if interval in _CALENDAR_BASES:
+        return None
+    return pd.Timedelta(INTERVAL_RULES[interval]).seconds // 60
+
+
+def can_resample(base_interval: str, interval: str) -> bool:
+    """Tell whether the bars of `interval` can be derived from `base_interval`."""
+    if base_interval == interval:
+        return True
+    if base_interval not in INTERVAL_RULES or interval not in INTERVAL_RULES:
+        return False
+    base_minutes = _minutes(base_interval)
+    if interval in _CALENDAR_BASES:
+        return base_minutes is not None or base_interval in _CALENDAR_BASES[interval]
+    minutes = _minutes(interval)
+    return base_minutes is not None and minutes % base_minutes == 0
+
+
+@indicator("resample")
+def resample_ohlcv(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """Aggregate the bars of a stock into bars of a coarser interval.
+
+    Each bar is labeled with the start of its period, e.g. the Monday of its
+    week, as in Yahoo Finance downloads. The last bar aggregates the base bars
+    of the current period so far. The result is memoized and must not be
+    modified.
+
+    Args:
+        df (pd.DataFrame): The stock data at the base interval.
+        interval (str): The interval of the bars to derive (e.g., 1wk).
+
+    Returns:
+        pd.DataFrame: The stock data at `interval`.
+    """
+    rule = INTERVAL_RULES[interval]
+    # Intraday bars are aligned on the first base bar, e.g. on the market open
+    origin = "start_day" if interval in _CALENDAR_BASES else "start"
+    resampler = df.resample(rule, closed="left", label="left", origin=origin)
+    data = resampler.agg(
+        {column: AGGREGATIONS.get(column, "last") for column in df.columns}
+    )
+    # Drop the periods without any base bar, e.g. the week-ends
+    return data.dropna(subset=["Close"] if "Close" in data else None, how="all")
@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Callable, Dict, List
+from stockaxion.utils.generic import get_cache_dir
+from stockaxion.logger import logger
+
+COMMON_SUFFIXES = [
+    "",
+    ".PA",
+    ".L",
+    ".N",
+    ".O",
+    ".AX",
+    ".TO",
+    ".HK",
+]  # Add more suffixes as needed
+DEFAULT_TTL = timedelta(days=7)
+DEFAULT_NEGATIVE_TTL = timedelta(days=1)
+DEFAULT_MAX_WORKERS = 8
+
+
+def yf_probe(symbol: str) -> bool:
+    """Tell whether Yahoo Finance has recent data for the symbol."""
+    import yfinance as yf
+
+    return not yf.Ticker(symbol).history(period="1d").empty
+
+
+class TickerResolver:
+    """Resolve ticker symbols to their Yahoo Finance symbol with an exchange suffix.
+
+    The candidate suffixes are probed concurrently, on a pool of `max_workers`
+    threads shared by all the tickers. The first candidate in suffix order
+    which has data wins as soon as all the candidates before it have failed,
+    and the remaining probes are cancelled. Results, including tickers which
+    could not be resolved, are cached on disk: positive results for `ttl` and
+    negative ones for `negative_ttl`. A ticker whose probes fail, e.g. on a
+    network outage, is left unresolved without caching it.
+    """
+
+    def __init__(
+        self,
+        cache_path: str = None,
+        ttl: timedelta = DEFAULT_TTL,
+        negative_ttl: timedelta = DEFAULT_NEGATIVE_TTL,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        probe: Callable[[str], bool] = None,
+        suffixes: List[str] = None,
+    ):
+        self.cache_path = cache_path or os.path.join(get_cache_dir(), "tickers.json")
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self.probe = probe or yf_probe
+        self.suffixes = suffixes if suffixes is not None else COMMON_SUFFIXES
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ticker-probe"
+        )
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info(f"Ignoring unreadable ticker cache {self.cache_path}: {e}")
+            return {}
+
+    def save(self):
+        """Write the resolved tickers to the cache file."""
+        with self._lock:
+            entries = dict(self._entries)
+        tmp_path = f"{self.cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _cached(self, ticker: str) -> str | None:
+        entry = self._entries.get(ticker)
+        if entry is None:
+            return None
+        ttl = self.ttl if entry["symbol"] else self.negative_ttl
+        if time.time() - entry["time"] > ttl.total_seconds():
+            return None
+        return entry["symbol"]
+
+    def _safe_probe(self, symbol: str) -> bool | None:
+        """Probe a symbol, or return None if the probe failed."""
+        try:
+            return bool(self.probe(symbol))
+        except Exception as e:
+            logger.warning(f"Error checking ticker {symbol}: {e}")
+            return None
+
+    def _probe_candidates(self, ticker: str) -> str | None:
+        """The first candidate with data, an empty string if none has, or None
+        if a probe failed before a candidate was found."""
+        candidates = [ticker + suffix for suffix in self.suffixes]
+        results = {}
+        futures = {
+            self._executor.submit(self._safe_probe, candidate): i
+            for i, candidate in enumerate(candidates)
+        }
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                for i, candidate in enumerate(candidates):
+                    if i not in results:
+                        break
+                    if results[i] is None:
+                        return None
+                    if results[i]:
+                        return candidate
+            return ""
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _resolve(self, ticker: str) -> str:
+        symbol = self._cached(ticker)
+        if symbol is None:
+            symbol = self._probe_candidates(ticker)
+            if symbol is None:
+                # Not cached, so that the ticker is probed again next time
+                return ""
+            with self._lock:
+                self._entries[ticker] = {"symbol": symbol, "time": time.time()}
+        return symbol
+
+    def resolve(self, ticker: str) -> str:
+        """Resolve one ticker.
+
+        Args:
+            ticker (str): The stock ticker symbol to resolve.
+
+        Returns:
+            str: The valid ticker symbol with the correct suffix, or an empty
+                string if not found.
+        """
+        if not ticker:
+            return ""
+        cached = self._cached(ticker)
+        if cached is not None:
+            return cached
+        symbol = self._resolve(ticker)
+        self.save()
+        return symbol
+
+    def resolve_many(self, tickers: List[str]) -> Dict[str, str]:
+        """Resolve several tickers concurrently.
+
+        Args:
+            tickers (List[str]): The stock ticker symbols to resolve.
+
+        Returns:
+            Dict[str, str]: The resolved symbol of each ticker, an empty string
+                for the tickers which could not be resolved.
+        """
+        to_resolve = [
+            ticker for ticker in set(tickers) if ticker and self._cached(ticker) is None
+        ]
+        if to_resolve:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(self._resolve, to_resolve))
+            self.save()
+        return {ticker: self._cached(ticker) or "" for ticker in tickers}
+
+
+_default_resolver = None
+
+
+def get_default_resolver() -> TickerResolver:
+    """Return the resolver shared by all the stocks."""
+    global _default_resolver
+    if _default_resolver is None:
+        _default_resolver = TickerResolver()
+    return _default_resolver
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from stockaxion.indicators.features import indicator
+from stockaxion.indicators.panel import cup_and_handle_stats
+from stockaxion.indicators.price import (
+    calculate_rolling_price_change,
+    calculate_rsi,
+    get_close,
+)
+from stockaxion.utils.generic import get_cache_dir
+
+
+def _rise_then_fall_metrics(df: pd.DataFrame, params: dict) -> dict:
+    rolling_sum = calculate_rolling_price_change(df, window=params["window_size"])
+    return {"rise_peak": rolling_sum.max(), "fall_peak": rolling_sum.min()}
+
+
+def _rsi_metrics(df: pd.DataFrame, params: dict) -> dict:
+    return {"last_rsi": calculate_rsi(df, window=params["window_size"]).iloc[-1]}
+
+
+def _cup_and_handle_metrics(df: pd.DataFrame, params: dict) -> dict:
+    close = get_close(df).dropna().to_numpy(dtype=float)
+    stats = cup_and_handle_stats(
+        close[:, None],
+        np.array([len(close)]),
+        params["min_cup_bars"],
+        params["max_cup_bars"],
+        params["max_handle_bars"],
+        params["rim_tolerance"],
+    )
+    return {
+        "cup_depth": stats["depth"][0],
+        "handle_retracement": stats["retracement"][0],
+    }
+
+
+# Key metrics recorded with the verdicts of each pattern
+PATTERN_METRICS = {
+    "check_rise_then_fall": _rise_then_fall_metrics,
+    "check_weekly_rsi_low": _rsi_metrics,
+    "check_cup_and_handle": _cup_and_handle_metrics,
+}
+
+
+def last_bar(df: pd.DataFrame) -> str:
+    """The timestamp of the last bar of the stock data, as stored in the results."""
+    return pd.Timestamp(df.index[-1]).isoformat()
+
+
+@indicator("data_hash")
+def data_hash(df: pd.DataFrame) -> str:
+    """A hash of the bars of the stock data, values included: the last bar of
+    Yahoo Finance is updated in place until it is complete."""
+    rows = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.sha1(rows.tobytes()).hexdigest()
+
+
+def params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+class ResultsStore:
+    """SQLite store of the pattern verdicts of each scanned stock.
+
+    For each (ticker, pattern, params, period, interval), the store records
+    the verdict, the last bar and the hash of the data it was computed on and
+    key metrics of the pattern (e.g. rise_peak, fall_peak or the last RSI), so
+    that a rerun only has to re-evaluate the stocks whose data or parameters
+    changed.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(get_cache_dir(), "results.sqlite")
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "ticker TEXT, pattern TEXT, params TEXT, period TEXT, "
+                "interval TEXT, verdict INTEGER, last_bar TEXT, data_hash TEXT, "
+                "metrics TEXT, updated REAL, "
+                "PRIMARY KEY (ticker, pattern, params, period, interval))"
+            )
+
+    def get_many(
+        self, patterns: List[str]
+    ) -> Dict[Tuple[str, str, str, str, str], Tuple[bool, str]]:
+        """Get the recorded verdicts of the given patterns.
+
+        Returns:
+            Dict[Tuple[str, str, str, str, str], Tuple[bool, str]]: The verdict
+                and data hash by (ticker, pattern, params, period, interval).
+        """
+        placeholders = ", ".join("?" * len(patterns))
+        with sqlite3.connect(self.path) as conn:
+            rows = conn.execute(
+                "SELECT ticker, pattern, params, period, interval, verdict, "
+                f"data_hash FROM results WHERE pattern IN ({placeholders})",
+                patterns,
+            ).fetchall()
+        return {
+            tuple(key): (bool(verdict), hash_)
+            for *key, verdict, hash_ in rows
+        }
+
+    def put_many(self, records: List[dict]):
+        """Record verdicts, each given as a dict with the ticker, pattern,
+        params, period, interval, verdict, last_bar, data_hash and metrics."""
+        now = time.time()
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        record["ticker"],
+                        record["pattern"],
+                        record["params"],
+                        record["period"],
+                        record["interval"],
+                        int(record["verdict"]),
+                        record["last_bar"],
+                        record["data_hash"],
+                        json.dumps(record["metrics"], default=float),
+                        now,
+                    )
+                    for record in records
+                ],
+            )
+
+    def to_frame(self) -> pd.DataFrame:
+        """All the recorded results, with one column per metric."""
+        with sqlite3.connect(self.path) as conn:
+            results = pd.read_sql("SELECT * FROM results", conn)
+        metrics = pd.DataFrame([json.loads(m) for m in results.pop("metrics")])
+        return pd.concat([results, metrics], axis=1)
+
+
+def make_record(
+    ticker: str,
+    pattern,
+    df: pd.DataFrame,
+    verdict: bool,
+    period: str,
+    interval: str,
+) -> dict:
+    """Build the record of the verdict of a pattern on a stock."""
+    params = pattern.resolved_params()
+    metrics_function = PATTERN_METRICS.get(pattern.name)
+    return {
+        "ticker": ticker,
+        "pattern": pattern.name,
+        "params": params_key(params),
+        "period": period,
+        "interval": interval,
+        "verdict": verdict,
+        "last_bar": last_bar(df),
+        "data_hash": data_hash(df),
+        "metrics": metrics_function(df, params) if metrics_function else {},
+    }
+
+
+def get_results_store(extra_params: dict) -> ResultsStore | None:
+    """Create the results store configured by the `extra_params` of a filter: a
+    ResultsStore, the path of its database, True for the default path, or None."""
+    store = extra_params.get("results_store")
+    if store is None or store is False or isinstance(store, ResultsStore):
+        return store or None
+    return ResultsStore(None if store is True else store)
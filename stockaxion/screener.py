@@ -0,0 +1,168 @@
+"""Local screener index of a universe of stocks.
+
+The index holds one row of summary features per ticker (rise to the peak,
+drawdown from the peak, max rolling rise, last RSI...), computed from the
+price cache. Screening the universe is then a vectorized filter of the index,
+without downloads or LLM calls. `refresh` only recomputes the rows of the
+tickers whose cached prices changed since the last refresh.
+"""
+
+import os
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from stockaxion.cache import PriceCache, slice_period
+from stockaxion.data_loader import BulkLoader
+from stockaxion.indicators.price import (
+    calculate_rolling_price_change,
+    calculate_rsi,
+    get_close,
+)
+from stockaxion.stock import Stock
+from stockaxion.utils.generic import get_cache_dir
+from stockaxion.logger import logger
+
+FEATURES = [
+    "last_bar",
+    "n_bars",
+    "peak_date",
+    "rise",
+    "drawdown",
+    "max_rolling_rise",
+    "last_rsi",
+]
+
+
+def summarize(df: pd.DataFrame) -> Dict:
+    """Compute the summary features of the data of a stock.
+
+    - rise: The rise in % from the lowest close before the peak to the peak.
+    - drawdown: The fall in % from the peak to the last close.
+    - max_rolling_rise: The highest 20-bar rolling price change in %.
+    - last_rsi: The last 14-bar RSI.
+    """
+    close = get_close(df).dropna()
+    values = close.to_numpy(dtype=float)
+    peak = int(np.argmax(values))
+    trough = int(np.argmin(values[: peak + 1]))
+    return {
+        "last_bar": close.index[-1],
+        "n_bars": len(values),
+        "peak_date": close.index[peak],
+        "rise": (values[peak] / values[trough] - 1) * 100,
+        "drawdown": (1 - values[-1] / values[peak]) * 100,
+        "max_rolling_rise": calculate_rolling_price_change(df).max(),
+        "last_rsi": calculate_rsi(df).iloc[-1],
+    }
+
+
+class ScreenerIndex:
+    """Summary features of a universe of stocks, persisted as Parquet.
+
+    Args:
+        path (str): The index file, in the stockaxion cache by default.
+        interval (str): The interval of the bars (e.g., 1wk).
+        period (str): The period the features are computed on (e.g., 5y).
+        cache (PriceCache): The price cache the index is computed from.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        interval: str = "1wk",
+        period: str = "5y",
+        cache: PriceCache = None,
+    ):
+        self.path = path or os.path.join(
+            get_cache_dir("screener"), f"{interval}-{period}.parquet"
+        )
+        self.interval = interval
+        self.period = period
+        self.cache = cache or PriceCache()
+        self.index = self._load()
+
+    def _load(self) -> pd.DataFrame:
+        if os.path.exists(self.path):
+            try:
+                return pd.read_parquet(self.path)
+            except Exception as e:
+                logger.info(f"Ignoring unreadable screener index {self.path}: {e}")
+        return pd.DataFrame(
+            columns=FEATURES + ["mtime"], index=pd.Index([], name="ticker")
+        )
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        self.index.to_parquet(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, universe: List[str] = None) -> int:
+        """Update the rows of the tickers whose cached prices changed.
+
+        Args:
+            universe (List[str]): Restrict the index to these tickers, loading
+                their prices in the cache first. All the cached tickers by
+                default.
+
+        Returns:
+            int: The number of updated rows.
+        """
+        if universe is not None:
+            BulkLoader(cache=self.cache).load(
+                [
+                    Stock(ticker, self.period, self.interval, cache=self.cache)
+                    for ticker in universe
+                ]
+            )
+        entries = self.cache.entries(self.interval)
+        if universe is not None:
+            entries = {t: entries[t] for t in universe if t in entries}
+        known = self.index["mtime"].to_dict()
+        changed = [t for t, mtime in entries.items() if known.get(t) != mtime]
+        rows = {}
+        for ticker in changed:
+            data, _ = self.cache.read(ticker, self.interval)
+            if data is not None:
+                data = slice_period(data, self.period)
+            if data is None or get_close(data).dropna().empty:
+                continue
+            rows[ticker] = {**summarize(data), "mtime": entries[ticker]}
+        removed = self.index.index.difference(list(entries))
+        if not rows and removed.empty:
+            return 0
+        index = self.index.drop(index=removed.union(list(rows)))
+        if rows:
+            new_rows = pd.DataFrame.from_dict(rows, orient="index")
+            index = pd.concat([index, new_rows]) if len(index) else new_rows
+        index.index.name = "ticker"
+        self.index = index
+        self.save()
+        logger.info(f"Updated {len(rows)} stocks of the screener index")
+        return len(rows)
+
+    def rise_and_fall(
+        self, rise: float = 100, fall: float = 50, months: int = 4
+    ) -> List[str]:
+        """The stocks which have risen `rise` % to their peak and fallen `fall` %
+        since, the peak being in the last `months` months."""
+        index = self.index
+        cutoff = pd.Timestamp.now() - pd.DateOffset(months=months)
+        peak_dates = pd.to_datetime(index["peak_date"], utc=True).dt.tz_localize(None)
+        mask = (
+            (index["rise"].to_numpy(dtype=float) >= rise)
+            & (index["drawdown"].to_numpy(dtype=float) >= fall)
+            & (peak_dates >= cutoff).to_numpy()
+        )
+        return index.index[mask].tolist()
+
+    def screen(self, **bounds) -> List[str]:
+        """The stocks whose features are within bounds, e.g.
+        `screen(last_rsi=(None, 30), drawdown=(50, None))`."""
+        mask = np.ones(len(self.index), dtype=bool)
+        for feature, (low, high) in bounds.items():
+            values = self.index[feature].to_numpy(dtype=float)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return self.index.index[mask].tolist()
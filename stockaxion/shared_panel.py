@@ -0,0 +1,157 @@
+"""Price panel of many stocks in shared memory, for multi-process screening.
+
+The OHLCV bars of all the stocks are copied once into a single
+`multiprocessing.shared_memory` block: the int64 timestamps of all the bars,
+followed by one contiguous float32 (5, n_bars) array per stock. A
+`SharedPanel` is pickled as the name of the block and the offsets of the
+stocks, so worker processes attach to the block instead of unpickling the
+data, and get zero-copy `CompactSeries` slices of it.
+
+Only the parent process, which created the block, tracks and frees it. The
+workers attach without registering the block with the resource tracker, as
+`track=False` does from Python 3.13, since the tracker could otherwise unlink
+it or warn about a leak when a worker exits, and detach when they exit.
+"""
+
+import sys
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.util import Finalize
+from typing import List
+import numpy as np
+import pandas as pd
+from stockaxion.compact import FIELDS, CompactSeries
+
+_attach_lock = threading.Lock()
+
+
+def _attach_untracked(name: str) -> SharedMemory:
+    """Attach to an existing block without registering it with the resource
+    tracker of this process."""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedPanel:
+    """The bars of several stocks in a shared memory block.
+
+    Create it with `SharedPanel.create` in the parent process and use it as a
+    context manager, which frees the block on exit.
+    """
+
+    def __init__(
+        self,
+        shm: SharedMemory,
+        tickers: List[str],
+        offsets: List[int],
+        tzs: List[str],
+        owner: bool = False,
+    ):
+        self.shm = shm
+        self.tickers = tickers
+        # The bars of the i-th stock are the bars offsets[i] to offsets[i + 1]
+        self.offsets = offsets
+        self.tzs = tzs
+        self.owner = owner
+        n_bars = offsets[-1]
+        self._timestamps = np.ndarray(n_bars, dtype=np.int64, buffer=shm.buf)
+        self._values = np.ndarray(
+            len(FIELDS) * n_bars,
+            dtype=np.float32,
+            buffer=shm.buf,
+            offset=self._timestamps.nbytes,
+        )
+        if not owner:
+            self._timestamps.flags.writeable = False
+            self._values.flags.writeable = False
+
+    @classmethod
+    def create(cls, tickers: List[str], frames: List[pd.DataFrame]) -> "SharedPanel":
+        """Copy the OHLCV bars of the stocks into a new shared memory block.
+
+        Args:
+            tickers (List[str]): The stock ticker symbols.
+            frames (List[pd.DataFrame]): The data of each stock, not empty.
+        """
+        offsets = np.concatenate([[0], np.cumsum([len(df) for df in frames])])
+        n_bars = int(offsets[-1])
+        size = n_bars * (np.dtype(np.int64).itemsize + len(FIELDS) * 4)
+        shm = SharedMemory(create=True, size=max(size, 1))
+        tzs = []
+        panel = cls(shm, list(tickers), offsets.tolist(), tzs, owner=True)
+        try:
+            for i, df in enumerate(frames):
+                start, end = offsets[i], offsets[i + 1]
+                index = pd.DatetimeIndex(df.index)
+                tzs.append(str(index.tz) if index.tz is not None else None)
+                panel._timestamps[start:end] = index.as_unit("ns").asi8
+                panel._values[len(FIELDS) * start : len(FIELDS) * end] = (
+                    df[list(FIELDS)].to_numpy(np.float32).T.ravel()
+                )
+        except BaseException:
+            panel.close()
+            raise
+        return panel
+
+    @classmethod
+    def attach(
+        cls, name: str, tickers: List[str], offsets: List[int], tzs: List[str]
+    ) -> "SharedPanel":
+        """Attach to the block of a panel created by another process, read-only.
+
+        The block is not tracked by this process, see the module docstring.
+        """
+        return cls(_attach_untracked(name), tickers, offsets, tzs)
+
+    def __reduce__(self):
+        return SharedPanel.attach, (self.shm.name, self.tickers, self.offsets, self.tzs)
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def series(self, i: int) -> CompactSeries:
+        """A zero-copy view of the bars of the i-th stock."""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return CompactSeries(
+            self.tickers[i],
+            self._timestamps[start:end],
+            self._values[len(FIELDS) * start : len(FIELDS) * end].reshape(
+                len(FIELDS), end - start
+            ),
+            tz=self.tzs[i],
+        )
+
+    def close(self):
+        """Detach from the block, and free it if this process created it.
+
+        The views returned by `series` must not be used afterwards.
+        """
+        self._detach()
+        if self.owner:
+            self.shm.unlink()
+
+    def _detach(self):
+        if self._timestamps is None:
+            return
+        self._timestamps = self._values = None
+        self.shm.close()
+
+    def detach_at_exit(self):
+        """Detach from the block without freeing it when this process exits,
+        e.g. in a worker, which may hold a copy of the owner's panel if it was
+        forked."""
+        Finalize(self, self._detach, exitpriority=0)
+
+    def __enter__(self) -> "SharedPanel":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
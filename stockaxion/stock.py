@@ -1,9 +1,21 @@
 import os
-import yfinance as yf
-from matplotlib import pyplot as plt
-from stockaxion.indicators.price import calculate_rsi
+from typing import TYPE_CHECKING, Dict, List
+import pandas as pd
+from stockaxion.cache import period_start, slice_period
+from stockaxion.compact import CompactSeries
+from stockaxion.indicators.features import compute_indicator, invalidate_features
+from stockaxion.indicators.pattern import Pattern
+from stockaxion.indicators.streaming import STREAMING_PATTERNS, seed_pattern
+from stockaxion.resolver import get_default_resolver
+from stockaxion.rendering import DRAW_FUNCTIONS, get_renderer
+from stockaxion.profiling import profiled, timed
+from stockaxion.resample import can_resample, resample_ohlcv
 
+if TYPE_CHECKING:
+    from stockaxion.cache import PriceCache
 
+
+@profiled("resolve")
 def is_ticker_valid(ticker: str) -> str:
     """Check if a stock ticker is valid on Yahoo Finance, including common exchange suffixes.
 
@@ -16,6 +28,9 @@ def is_ticker_valid(ticker: str) -> str:
     - Toronto (.TO)
     - Hong Kong (.HK)
 
+    The suffixes are probed concurrently and the result is cached on disk,
+    see `stockaxion.resolver.TickerResolver`.
+
     Args:
         ticker (str): The stock ticker symbol to check.
 
@@ -23,40 +38,48 @@ def is_ticker_valid(ticker: str) -> str:
         str: The valid ticker symbol with the correct suffix, or an empty string if not found.
 
     """
-    common_suffixes = [
-        "",
-        ".PA",
-        ".L",
-        ".N",
-        ".O",
-        ".AX",
-        ".TO",
-        ".HK",
-    ]  # Add more suffixes as needed
-    for suffix in common_suffixes:
-        full_ticker = ticker + suffix
-        try:
-            stock = yf.Ticker(full_ticker)
-            data = stock.history(period="1d")
-            if not data.empty:
-                return full_ticker
-        except Exception as e:
-            print(f"Error checking ticker {full_ticker}: {e}")
-    return ""
+    return get_default_resolver().resolve(ticker)
 
 
 class Stock:
-    """A class to represent a stock."""
+    """A class to represent a stock.
 
-    def __init__(self, ticker_symbol: str, period: str = None, interval: str = None):
+    With a `base_interval` (e.g., 1d), the data is fetched at this interval
+    only, and the bars of the coarser intervals are derived from it locally,
+    see `stockaxion.resample`.
+    """
+
+    def __init__(
+        self,
+        ticker_symbol: str,
+        period: str = None,
+        interval: str = None,
+        cache: "PriceCache" = None,
+        base_interval: str = None,
+    ):
         self.ticker_symbol = ticker_symbol
         self._data = None
         self.period = period or "5y"
         self.interval = interval or "1wk"
+        self.cache = cache
+        self.base_interval = base_interval
+        # The data at the base interval and the period it covers
+        self._base = None
+        self._base_period = None
+        # Bars appended with `append_bar` and not yet added to the data
+        self._pending_bars = []
+        self._streaming_patterns = {}
+        # Compact representation of the data, see `compact`
+        self._compact = None
 
+    @profiled("fetch")
     def fetch_data(self, period: str, interval: str):
         """Fetch stock data using Yahoo Finance API.
 
+        If the stock has a price cache, only the bars missing from the cache
+        are downloaded. If `interval` can be derived from the base interval,
+        the base series is fetched instead and resampled.
+
         Args:
             period (str): The period for which to fetch the data (e.g., 1y).
             interval (str): The interval at which to fetch the data (e.g., 1wk).
@@ -67,52 +90,283 @@ class Stock:
         self.ticker_symbol = is_ticker_valid(self.ticker_symbol)
         if not self.ticker_symbol:
             return None
-        self._data = yf.download(self.ticker_symbol, period=period, interval=interval)
-        return self._data
+        for data in (self._data, self._base):
+            if data is not None:
+                invalidate_features(data)
+        self._compact = None
+        fetch_interval = self.fetch_interval(interval)
+        if self.cache is not None:
+            data = self.cache.get(self.ticker_symbol, period, fetch_interval)
+        else:
+            import yfinance as yf
+
+            data = yf.download(
+                self.ticker_symbol,
+                period=period,
+                interval=fetch_interval,
+                multi_level_index=False,
+            )
+        return self._set_data(data, period, interval)
+
+    def fetch_interval(self, interval: str = None) -> str:
+        """The interval at which the data of `interval` is downloaded: the base
+        interval if the bars can be derived from it."""
+        interval = interval or self.interval
+        if self.base_interval and can_resample(self.base_interval, interval):
+            return self.base_interval
+        return interval
+
+    def _set_data(
+        self, data: pd.DataFrame | None, period: str, interval: str = None
+    ) -> pd.DataFrame | None:
+        """Set the data fetched at `fetch_interval(interval)`, resampling it to
+        `interval` if it is the base series."""
+        interval = interval or self.interval
+        fetch_interval = self.fetch_interval(interval)
+        if data is not None and fetch_interval == self.base_interval:
+            self._base, self._base_period = data, period
+            if fetch_interval != interval:
+                data = resample_ohlcv(data, interval)
+        else:
+            self._base = self._base_period = None
+        if data is not None and not data.empty and self._pending_bars:
+            # The appended bars which the new data covers are dropped
+            last_timestamp = data.index[-1]
+            self._pending_bars = [
+                (timestamp, bar)
+                for timestamp, bar in self._pending_bars
+                if timestamp > last_timestamp
+            ]
+        self._data = data
+        return data
+
+    def set_resolution(self, period: str, interval: str):
+        """Change the period and interval of the data.
+
+        The data is derived from the base series when it covers the new period,
+        otherwise it is fetched again on next access. The bars appended with
+        `append_bar` at the base interval are added to the base series first,
+        so that they are part of the derived data. The bars appended at another
+        interval are kept if the interval does not change.
+
+        Args:
+            period (str): The period of the data (e.g., 1y).
+            interval (str): The interval of the bars (e.g., 1wk).
+        """
+        if (period, interval) == (self.period, self.interval):
+            return
+        if self._pending_bars:
+            if self._appended_to_base():
+                self._add_pending_bars()
+            elif interval != self.interval:
+                raise ValueError(
+                    f"The bars appended at {self.interval} cannot be converted to "
+                    f"{interval}"
+                )
+        self.period, self.interval = period, interval
+        self._compact = None
+        base = self._base
+        if base is None or self.fetch_interval(interval) != self.base_interval:
+            self._data = self._base = self._base_period = None
+            return
+        base_start = period_start(self._base_period)
+        start = period_start(period)
+        if base_start is not None and (start is None or start < base_start):
+            self._data = self._base = self._base_period = None
+            return
+        if period != self._base_period:
+            base = slice_period(base, period)
+        if interval != self.base_interval:
+            base = resample_ohlcv(base, interval)
+        self._data = base
 
     @property
     def data(self):
         if self._data is None:
             self._data = self.fetch_data(self.period, self.interval)
+        self._add_pending_bars()
         return self._data
 
-    def plot_close_price(self, temp_dir: str = None):
-        """Plot the stock data and save it to a file if temp_dir is provided."""
-        plt.figure()
-        self.data["Close"].plot()
+    def _appended_to_base(self) -> bool:
+        """Tell whether the bars appended with `append_bar` are bars of the base
+        series, to which they are then added."""
+        return (
+            self._data is not None
+            and self._base is not None
+            and self.interval == self.base_interval
+        )
+
+    def _add_pending_bars(self):
+        """Add the bars appended with `append_bar` to the data, and to the base
+        series if they are base bars. They are kept until there is data."""
+        if not self._pending_bars or self._data is None:
+            return
+        timestamps, bars = zip(*self._pending_bars)
+        new_bars = pd.DataFrame(list(bars), index=pd.DatetimeIndex(timestamps))
+        new_bars.index.name = self._data.index.name
+        if self._appended_to_base():
+            self._base = pd.concat([self._base, new_bars])
+        self._data = pd.concat([self._data, new_bars])
+        self._pending_bars = []
+        self._compact = None
+
+    def compact(self, directory: str = None) -> CompactSeries | None:
+        """Replace the data by a view of its compact float32 representation.
+
+        Only the OHLCV columns are kept. The pattern functions get the same
+        DataFrame interface, with a fraction of the memory.
+
+        Args:
+            directory (str): Back the data by memory-mapped files in this
+                directory, which worker processes map instead of unpickling
+                the data.
+
+        Returns:
+            CompactSeries | None: The compact data, or None if there is no data.
+        """
+        if self._compact is None:
+            data = self.data
+            if data is None or data.empty:
+                return None
+            self._compact = CompactSeries.from_frame(
+                self.ticker_symbol, data, directory
+            )
+            invalidate_features(data)
+            self._data = self._compact.to_frame()
+        return self._compact
+
+    def watch(
+        self, patterns: List[str] | List[Pattern], pattern_params: dict = None
+    ) -> Dict[str, bool]:
+        """Start evaluating patterns incrementally as bars are appended.
+
+        The streaming version of each pattern (see
+        `stockaxion.indicators.streaming`) is seeded with the current data.
+
+        Args:
+            patterns (List[str] | List[Pattern]): The names of the pattern
+                functions to watch, or the patterns with their parameters.
+            pattern_params (dict): The parameters of the patterns given by
+                name, like `extra_params["pattern_params"]` of `StockFilter`.
+
+        Returns:
+            Dict[str, bool]: Whether the stock matches each pattern.
+        """
+        pattern_params = pattern_params or {}
+        verdicts = {}
+        for pattern in patterns:
+            if isinstance(pattern, Pattern):
+                name, params = pattern.name, pattern.params
+            else:
+                name, params = pattern, pattern_params.get(pattern) or {}
+            if name not in STREAMING_PATTERNS:
+                raise ValueError(
+                    f"No streaming version of {name}. "
+                    f"Valid patterns are: {list(STREAMING_PATTERNS.keys())}"
+                )
+            evaluator = STREAMING_PATTERNS[name](**params)
+            verdicts[name] = seed_pattern(evaluator, self.data)
+            self._streaming_patterns[name] = evaluator
+        return verdicts
+
+    def append_bar(self, timestamp: pd.Timestamp, bar: dict) -> Dict[str, bool]:
+        """Append a new bar to the data and update the watched patterns.
+
+        The watched patterns are updated in O(1); the bar is added to the
+        DataFrame the next time `data` is accessed, unless the data is fetched
+        again in between and already has it. A timestamp without time zone is
+        taken in the time zone of the data.
+
+        Args:
+            timestamp (pd.Timestamp): The time of the bar, after the last one.
+            bar (dict): The bar values (Open, High, Low, Close, Volume).
+
+        Returns:
+            Dict[str, bool]: Whether the stock matches each watched pattern.
+        """
+        timestamp = pd.Timestamp(timestamp)
+        if self._data is not None:
+            tz = getattr(self._data.index, "tz", None)
+            if tz is not None:
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.tz_localize(tz)
+                else:
+                    timestamp = timestamp.tz_convert(tz)
+            elif timestamp.tzinfo is not None:
+                timestamp = timestamp.tz_localize(None)
+        if self._pending_bars:
+            last_timestamp = self._pending_bars[-1][0]
+        elif self._data is not None and not self._data.empty:
+            last_timestamp = self._data.index[-1]
+        else:
+            last_timestamp = None
+        if last_timestamp is not None and timestamp <= last_timestamp:
+            raise ValueError("The new bar must be after the last one")
+        self._pending_bars.append((timestamp, bar))
+        if pd.isna(bar["Close"]):
+            # The patterns skip the missing closes
+            return {
+                name: evaluator.matches
+                for name, evaluator in self._streaming_patterns.items()
+            }
+        return {
+            name: evaluator.update(timestamp, bar["Close"])
+            for name, evaluator in self._streaming_patterns.items()
+        }
+
+    def indicator(self, name: str, **params):
+        """Get an indicator of the stock data, memoized on its DataFrame.
+
+        The memo is keyed by the DataFrame, so new data (e.g. after
+        `fetch_data` or once appended bars are added) gets a new memo, and
+        `invalidate_features` drops it when the data is modified in place.
+
+        Args:
+            name (str): The name of an indicator of `stockaxion.indicators.price`
+                (e.g., rsi).
+            **params: The parameters of the indicator (e.g., window=14).
+        """
+        return compute_indicator(self.data, name, **params)
+
+    def render_charts(self, combined: bool = False) -> Dict[str, bytes]:
+        """Render the close price, RSI and volume charts as PNG bytes.
+
+        Args:
+            combined (bool): Render the three charts in a single "panel" image.
+
+        Returns:
+            Dict[str, bytes]: The PNG bytes of each chart.
+        """
+        if combined:
+            return {"panel": get_renderer().render_panel(self.data)}
+        return get_renderer().render_all(self.data)
+
+    def _plot(self, chart: str, file_name: str, temp_dir: str = None):
+        with timed(f"plot.{chart}"):
+            return self._plot_chart(chart, file_name, temp_dir)
+
+    def _plot_chart(self, chart: str, file_name: str, temp_dir: str = None):
         if temp_dir:
-            file_path = os.path.join(temp_dir, f"{self.ticker_symbol}.png")
-            plt.savefig(file_path)
-            plt.close()
+            file_path = os.path.join(temp_dir, file_name)
+            with open(file_path, "wb") as f:
+                f.write(get_renderer().render(self.data, chart))
             return file_path
         else:
+            from matplotlib import pyplot as plt
+
+            plt.figure()
+            DRAW_FUNCTIONS[chart](plt.gca(), self.data)
             plt.show()
             plt.close()
 
+    def plot_close_price(self, temp_dir: str = None):
+        """Plot the stock data and save it to a file if temp_dir is provided."""
+        return self._plot("close", f"{self.ticker_symbol}.png", temp_dir)
+
     def plot_rsi(self, temp_dir: str = None):
         """Plot the RSI of the stock data and save it to a file if temp_dir is provided."""
-        plt.figure()
-        calculate_rsi(self.data).plot()
-        plt.axhline(30, color="red", linestyle="--", label="30%")
-        plt.axhline(70, color="green", linestyle="--", label="70%")
-        if temp_dir:
-            file_path = os.path.join(temp_dir, f"{self.ticker_symbol}_rsi.png")
-            plt.savefig(file_path)
-            plt.close()
-            return file_path
-        else:
-            plt.show()
-            plt.close()
+        return self._plot("rsi", f"{self.ticker_symbol}_rsi.png", temp_dir)
 
     def plot_volume(self, temp_dir: str = None):
         """Plot the volume of the stock data and save it to a file if temp_dir is provided."""
-        plt.figure()
-        self.data["Volume"].plot()
-        if temp_dir:
-            file_path = os.path.join(temp_dir, f"{self.ticker_symbol}_volume.png")
-            plt.savefig(file_path)
-            plt.close()
-            return file_path
-        else:
-            plt.show()
-            plt.close()
+        return self._plot("volume", f"{self.ticker_symbol}_volume.png", temp_dir)
@@ -1,14 +1,174 @@
-from typing import List, Callable
+import time
+import threading
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Dict, Iterator, List, Callable, Tuple
+import numpy as np
 import stockaxion.indicators.pattern as pattern_module
 from stockaxion.indicators.pattern import Pattern
 from stockaxion.stock import Stock
+from stockaxion.data_loader import BulkLoader
+from stockaxion.cache import get_price_cache
+from stockaxion.compact import CompactSeries
+from stockaxion.shared_panel import SharedPanel
+from stockaxion.indicators.panel import build_panel
+from stockaxion.pattern_stats import get_pattern_stats, order_patterns, tail_bars
+from stockaxion.results_store import (
+    data_hash,
+    get_results_store,
+    make_record,
+    params_key,
+)
 from stockaxion.logger import logger
 
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_SHARED_CHUNK_SIZE = 64
+
+
+def pattern_verdicts(
+    patterns: List[Pattern],
+    ticker_symbol: str,
+    data,
+    prefilter_bars: int = None,
+    seconds: List[float] = None,
+) -> List[bool]:
+    """Check the data of a stock against the patterns in order, stopping at the
+    first pattern which does not match.
+
+    Args:
+        patterns (List[Pattern]): The patterns to check.
+        ticker_symbol (str): The stock ticker symbol, for logging.
+        data (pd.DataFrame): The stock data.
+        prefilter_bars (int): Check the patterns which only depend on the last
+            bars on the last `prefilter_bars` bars when they are enough, see
+            `stockaxion.pattern_stats`.
+        seconds (List[float]): Add the time spent in each pattern to it.
+
+    Returns:
+        List[bool]: The verdicts of the checked patterns, empty if there is no data.
+    """
+    if isinstance(data, CompactSeries):
+        data = data.to_frame()
+    verdicts = []
+    for i, pattern in enumerate(patterns):
+        if data is None:
+            logger.info(f"No data available for stock {ticker_symbol}")
+            return verdicts
+        start = time.perf_counter()
+        frame = data
+        if prefilter_bars and len(data) > prefilter_bars:
+            bars = tail_bars(pattern, data)
+            if bars is not None and bars <= prefilter_bars:
+                frame = data.iloc[-prefilter_bars:]
+        verdicts.append(bool(pattern.check(frame)))
+        if seconds is not None:
+            seconds[i] += time.perf_counter() - start
+        if not verdicts[-1]:
+            logger.info(f"{ticker_symbol} does not match {pattern.name}")
+            return verdicts
+    logger.info(f"{ticker_symbol} matches all patterns")
+    return verdicts
+
+
+def match_patterns(
+    patterns: List[Pattern], ticker_symbol: str, data, prefilter_bars: int = None
+) -> bool:
+    """Check the data of a stock against all the patterns, stopping at the
+    first pattern which does not match.
+
+    Args:
+        patterns (List[Pattern]): The patterns to check.
+        ticker_symbol (str): The stock ticker symbol, for logging.
+        data (pd.DataFrame): The stock data.
+        prefilter_bars (int): See `pattern_verdicts`.
+
+    Returns:
+        bool: Whether the stock matches all the patterns.
+    """
+    verdicts = pattern_verdicts(patterns, ticker_symbol, data, prefilter_bars)
+    return len(verdicts) == len(patterns) and all(verdicts)
+
+
+def _timed_pattern_verdicts(
+    patterns: List[Pattern], ticker_symbol: str, data, prefilter_bars: int = None
+) -> Tuple[List[bool], List[float]]:
+    """The verdicts of `pattern_verdicts` and the time spent in each pattern."""
+    seconds = [0.0] * len(patterns)
+    verdicts = pattern_verdicts(patterns, ticker_symbol, data, prefilter_bars, seconds)
+    return verdicts, seconds
+
+
+# The shared panel and the patterns of a worker process, see `_panel_worker_init`
+_worker_panel = None
+_worker_patterns = None
+_worker_prefilter_bars = None
+
+
+def _panel_worker_init(
+    panel: SharedPanel, patterns: List[Pattern], prefilter_bars: int = None
+):
+    global _worker_panel, _worker_patterns, _worker_prefilter_bars
+    panel.detach_at_exit()
+    _worker_panel = panel
+    _worker_patterns = patterns
+    _worker_prefilter_bars = prefilter_bars
+
+
+def _check_shared_chunk(indices: range) -> Tuple[List[List[bool]], List[float]]:
+    """Check the patterns on stocks of the shared panel of the worker process.
+
+    Returns:
+        Tuple[List[List[bool]], List[float]]: The verdicts of each stock and
+            the time spent in each pattern.
+    """
+    seconds = [0.0] * len(_worker_patterns)
+    verdicts = [
+        pattern_verdicts(
+            _worker_patterns,
+            _worker_panel.tickers[i],
+            _worker_panel.series(i),
+            _worker_prefilter_bars,
+            seconds,
+        )
+        for i in indices
+    ]
+    return verdicts, seconds
+
 
 class StockFilter:
     """Filter stocks based on various criteria
 
     From the list of stocks, keep only those which follow the given patterns.
+
+    With `extra_params["parallel"]`, stocks are fetched on a thread pool of
+    `fetch_workers` threads and, if `process_workers` is set, their patterns
+    are checked on a process pool. At most `max_in_flight` stocks are fetched
+    or checked at the same time.
+
+    With `extra_params["compact"]`, the data of the stocks is converted to
+    compact float32 arrays once loaded, optionally memory-mapped from
+    `compact_dir`, see `stockaxion.compact`.
+
+    Otherwise, if the patterns are not all checked on a panel and
+    `process_workers` is set, the data of all the stocks is placed once in
+    shared memory and the patterns are checked on `process_workers` processes,
+    which only send back the verdicts, see `stockaxion.shared_panel`.
+
+    With `extra_params["results_store"]`, the verdicts of each pattern are
+    recorded in a `ResultsStore` and a sequential rerun only re-evaluates the
+    stocks with new bars or whose pattern parameters changed.
+
+    With `extra_params["pattern_stats"]`, the cost and the rejection rate of
+    each pattern are recorded in a `PatternStats`, by execution mode (see
+    `execution_mode`), and the patterns are checked cheapest and most selective
+    first. With `extra_params["prefilter_bars"]`,
+    the patterns which only depend on the last bars are checked first, on these
+    bars only, see `stockaxion.pattern_stats`.
     """
 
     def __init__(
@@ -18,6 +178,9 @@ class StockFilter:
         extra_params: dict = {},
     ):
         self.extra_params = extra_params
+        self.cache = get_price_cache(extra_params)
+        self.results_store = get_results_store(extra_params)
+        self.pattern_stats = get_pattern_stats(extra_params)
         self.stocks = self._get_stocks(stocks)
         self.patterns = self._get_patterns(patterns)
 
@@ -36,7 +199,13 @@ class StockFilter:
                 period = self.extra_params.get("period")
                 interval = self.extra_params.get("interval")
                 stock_objects.append(
-                    Stock(ticker_symbol=stock, period=period, interval=interval)
+                    Stock(
+                        ticker_symbol=stock,
+                        period=period,
+                        interval=interval,
+                        cache=self.cache,
+                        base_interval=self.extra_params.get("base_interval"),
+                    )
                 )
             elif isinstance(stock, Stock):
                 stock_objects.append(stock)
@@ -55,15 +224,28 @@ class StockFilter:
         Returns:
             List[Pattern]: A list of pattern objects.
         """
+        pattern_params = self.extra_params.get("pattern_params", {})
         pattern_objects = []
         for pattern in patterns:
             if isinstance(pattern, str):
                 pattern_function = getattr(pattern_module, pattern)
-                pattern_objects.append(Pattern(name=pattern, function=pattern_function))
+                pattern_objects.append(
+                    Pattern(
+                        name=pattern,
+                        function=pattern_function,
+                        params=pattern_params.get(pattern),
+                    )
+                )
             elif isinstance(pattern, Pattern):
                 pattern_objects.append(pattern)
             elif isinstance(pattern, Callable):
-                pattern_objects.append(Pattern(name=pattern.__name__, function=pattern))
+                pattern_objects.append(
+                    Pattern(
+                        name=pattern.__name__,
+                        function=pattern,
+                        params=pattern_params.get(pattern.__name__),
+                    )
+                )
             else:
                 raise ValueError("Invalid pattern")
         return pattern_objects
@@ -74,19 +256,331 @@ class StockFilter:
         Returns:
             List[str]: A list of stock ticker symbols that match all the patterns.
         """
-        filtered_stocks = []
+        if self.extra_params.get("parallel", False):
+            return list(self.filter_iter(ordered=True))
+        mode = self.execution_mode()
+        patterns = self._ordered_patterns(mode)
+        prefilter_bars = self.extra_params.get("prefilter_bars")
+        # Each chunk is compacted as soon as it is loaded, so that the full
+        # DataFrames of all the stocks are never held at once
+        BulkLoader.from_params(self.extra_params, cache=self.cache).load(
+            self.stocks, on_load=self._compact_stock
+        )
+        # The stocks loaded before the filter
+        for stock in self.stocks:
+            self._compact_stock(stock)
+        matched = {}
+        stocks = self.stocks
+        if self.results_store is not None:
+            matched = self._recorded_matches(patterns)
+            stocks = [stock for stock in stocks if stock.ticker_symbol not in matched]
+        seconds = [0.0] * len(patterns)
+        if mode == "panel":
+            verdicts = self._panel_verdicts(patterns, stocks, seconds)
+        elif mode == "shared_panel":
+            verdicts = self._shared_panel_verdicts(patterns, stocks, seconds)
+        else:
+            verdicts = {
+                stock.ticker_symbol: pattern_verdicts(
+                    patterns,
+                    stock.ticker_symbol,
+                    stock.data,
+                    prefilter_bars,
+                    seconds,
+                )
+                for stock in stocks
+            }
+        if self.results_store is not None:
+            self._record_verdicts(patterns, stocks, verdicts)
+        if self.pattern_stats is not None:
+            self._record_pattern_stats(patterns, mode, verdicts, seconds)
+        n_patterns = len(patterns)
+        for ticker_symbol, stock_verdicts in verdicts.items():
+            matched[ticker_symbol] = len(stock_verdicts) == n_patterns and all(
+                stock_verdicts
+            )
+        return [
+            stock.ticker_symbol for stock in self.stocks if matched[stock.ticker_symbol]
+        ]
+
+    def execution_mode(self) -> str:
+        """How `filter` checks the patterns: "parallel" with `filter_iter`,
+        "panel" with their panel implementations, "shared_panel" on worker
+        processes attached to a shared panel, or "stock" stock by stock."""
+        if self.extra_params.get("parallel", False):
+            return "parallel"
+        use_panel = self.extra_params.get("use_panel", True) and self.patterns
+        if use_panel and all(pattern.panel_function for pattern in self.patterns):
+            return "panel"
+        if self.extra_params.get("process_workers", 0):
+            return "shared_panel"
+        return "stock"
+
+    def _ordered_patterns(self, mode: str) -> List[Pattern]:
+        """The patterns in the order to check them in the execution `mode`, see
+        `stockaxion.pattern_stats`."""
+        prefilter_bars = self.extra_params.get("prefilter_bars")
+        if self.pattern_stats is not None:
+            return self.pattern_stats.order(self.patterns, mode, prefilter_bars)
+        if prefilter_bars:
+            return order_patterns(self.patterns, prefilter_bars=prefilter_bars)
+        return self.patterns
+
+    def _compact_stock(self, stock: Stock) -> CompactSeries | None:
+        """Convert the data of the stock to its compact representation if the
+        `compact` extra parameter is set, see `Stock.compact`."""
+        if not self.extra_params.get("compact", False):
+            return None
+        return stock.compact(self.extra_params.get("compact_dir"))
+
+    def _recorded_matches(self, patterns: List[Pattern]) -> Dict[str, bool]:
+        """Get from the results store whether the stocks match the patterns.
+
+        A stock is decided when the recorded verdicts of the patterns, checked
+        in order up to the first which does not match, were computed with the
+        same parameters, period and interval on the same data.
+
+        Returns:
+            Dict[str, bool]: Whether each decided stock matches all the patterns.
+        """
+        records = self.results_store.get_many([p.name for p in patterns])
+        keys = [
+            (pattern.name, params_key(pattern.resolved_params()))
+            for pattern in patterns
+        ]
+        matched = {}
         for stock in self.stocks:
-            all_patterns_matched = True
-            for pattern in self.patterns:
-                if stock.data is None:
-                    logger.info(f"No data available for stock {stock.ticker_symbol}")
-                    all_patterns_matched = False
+            data = stock.data
+            if data is None or data.empty:
+                continue
+            hash_ = data_hash(data)
+            for name, params in keys:
+                record = records.get(
+                    (stock.ticker_symbol, name, params, stock.period, stock.interval)
+                )
+                if record is None or record[1] != hash_:
                     break
-                if not pattern.check(stock.data):
-                    logger.info(f"{stock.ticker_symbol} does not match {pattern.name}")
-                    all_patterns_matched = False
+                if not record[0]:
+                    matched[stock.ticker_symbol] = False
+                    break
+            else:
+                matched[stock.ticker_symbol] = True
+        logger.info(f"Reusing the recorded results of {len(matched)} stocks")
+        return matched
+
+    def _record_verdicts(
+        self,
+        patterns: List[Pattern],
+        stocks: List[Stock],
+        verdicts: Dict[str, List[bool]],
+    ):
+        """Record the verdicts of the evaluated patterns in the results store."""
+        records = []
+        for stock in stocks:
+            for pattern, verdict in zip(patterns, verdicts[stock.ticker_symbol]):
+                records.append(
+                    make_record(
+                        stock.ticker_symbol,
+                        pattern,
+                        stock.data,
+                        verdict,
+                        stock.period,
+                        stock.interval,
+                    )
+                )
+        self.results_store.put_many(records)
+
+    def _record_pattern_stats(
+        self,
+        patterns: List[Pattern],
+        mode: str,
+        verdicts: Dict[str, List[bool]],
+        seconds: List[float],
+    ):
+        """Record the number of stocks checked and rejected by each pattern and
+        the time spent checking them in the execution `mode`."""
+        stats = {}
+        for i, pattern in enumerate(patterns):
+            checked = [v[i] for v in verdicts.values() if len(v) > i]
+            stats[pattern] = (len(checked), checked.count(False), seconds[i])
+        self.pattern_stats.record(stats, mode)
+
+    def filter_iter(self, ordered: bool = False) -> Iterator[str]:
+        """Filter the stocks on thread and process pools.
+
+        The pattern statistics of the checked stocks are recorded in the
+        "parallel" execution mode once the iteration ends.
+
+        Args:
+            ordered (bool): Yield the matching stocks in input order rather
+                than as soon as they are checked.
+
+        Yields:
+            str: The ticker symbols of the stocks that match all the patterns.
+        """
+        fetch_workers = self.extra_params.get("fetch_workers", DEFAULT_FETCH_WORKERS)
+        process_workers = self.extra_params.get("process_workers", 0)
+        max_in_flight = self.extra_params.get(
+            "max_in_flight", 2 * max(fetch_workers, process_workers)
+        )
+        prefilter_bars = self.extra_params.get("prefilter_bars")
+        patterns = self._ordered_patterns("parallel")
+        threads = ThreadPoolExecutor(max_workers=fetch_workers)
+        processes = (
+            ProcessPoolExecutor(max_workers=process_workers) if process_workers else None
+        )
+        # The verdicts and the time spent in each pattern of the checked stocks
+        lock = threading.Lock()
+        all_verdicts = {}
+        seconds = [0.0] * len(patterns)
+
+        def check(stock: Stock) -> bool:
+            data = stock.data
+            series = self._compact_stock(stock)
+            if processes is None:
+                verdicts, stock_seconds = _timed_pattern_verdicts(
+                    patterns, stock.ticker_symbol, stock.data, prefilter_bars
+                )
+            else:
+                # A compact series is sent instead of the DataFrame, as a path
+                # if it is memory-mapped
+                verdicts, stock_seconds = processes.submit(
+                    _timed_pattern_verdicts,
+                    patterns,
+                    stock.ticker_symbol,
+                    series if series is not None else data,
+                    prefilter_bars,
+                ).result()
+            with lock:
+                all_verdicts[stock.ticker_symbol] = verdicts
+                for p, pattern_seconds in enumerate(stock_seconds):
+                    seconds[p] += pattern_seconds
+            return len(verdicts) == len(patterns) and all(verdicts)
+
+        stocks = iter(self.stocks)
+        in_flight = deque()
+        try:
+            for stock in stocks:
+                in_flight.append((stock, threads.submit(check, stock)))
+                if len(in_flight) >= max_in_flight:
                     break
-            if all_patterns_matched:
+            while in_flight:
+                if ordered:
+                    stock, future = in_flight.popleft()
+                    matched = future.result()
+                else:
+                    futures = [f for _, f in in_flight]
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    stock, future = next((s, f) for s, f in in_flight if f in done)
+                    in_flight.remove((stock, future))
+                    matched = future.result()
+                next_stock = next(stocks, None)
+                if next_stock is not None:
+                    in_flight.append((next_stock, threads.submit(check, next_stock)))
+                if matched:
+                    yield stock.ticker_symbol
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+            threads.shutdown(wait=True, cancel_futures=True)
+            if processes is not None:
+                processes.shutdown(wait=True, cancel_futures=True)
+            if self.pattern_stats is not None:
+                self._record_pattern_stats(patterns, "parallel", all_verdicts, seconds)
+
+    def _shared_panel_verdicts(
+        self, patterns: List[Pattern], stocks: List[Stock], seconds: List[float]
+    ) -> Dict[str, List[bool]]:
+        """Check the stocks on a process pool attached to a shared panel of
+        their data, adding the time spent in each pattern to `seconds`.
+
+        Returns:
+            Dict[str, List[bool]]: The verdicts of the patterns for each stock,
+                up to the first pattern which does not match.
+        """
+        verdicts = {}
+        with_data = []
+        for stock in stocks:
+            verdicts[stock.ticker_symbol] = []
+            if stock.data is None or stock.data.empty:
+                logger.info(f"No data available for stock {stock.ticker_symbol}")
+            else:
+                with_data.append(stock)
+        if not with_data:
+            return verdicts
+
+        process_workers = self.extra_params["process_workers"]
+        chunk_size = self.extra_params.get(
+            "shared_chunk_size", DEFAULT_SHARED_CHUNK_SIZE
+        )
+        chunks = [
+            range(start, min(start + chunk_size, len(with_data)))
+            for start in range(0, len(with_data), chunk_size)
+        ]
+        with SharedPanel.create(
+            [stock.ticker_symbol for stock in with_data],
+            [stock.data for stock in with_data],
+        ) as panel, ProcessPoolExecutor(
+            max_workers=process_workers,
+            initializer=_panel_worker_init,
+            initargs=(panel, patterns, self.extra_params.get("prefilter_bars")),
+        ) as executor:
+            results = executor.map(_check_shared_chunk, chunks)
+            for chunk, (chunk_verdicts, chunk_seconds) in zip(chunks, results):
+                for i, stock_verdicts in zip(chunk, chunk_verdicts):
+                    verdicts[with_data[i].ticker_symbol] = stock_verdicts
+                for p, pattern_seconds in enumerate(chunk_seconds):
+                    seconds[p] += pattern_seconds
+        return verdicts
+
+    def _panel_verdicts(
+        self, patterns: List[Pattern], stocks: List[Stock], seconds: List[float]
+    ) -> Dict[str, List[bool]]:
+        """Check the stocks with the panel implementations of the patterns,
+        which evaluate each pattern at once on all the stocks which matched
+        the previous patterns, adding the time spent in each pattern to
+        `seconds`.
+
+        Returns:
+            Dict[str, List[bool]]: The verdicts of the patterns for each stock,
+                up to the first pattern which does not match.
+        """
+        verdicts = {}
+        with_data = []
+        for stock in stocks:
+            verdicts[stock.ticker_symbol] = []
+            if stock.data is None or stock.data.empty:
+                logger.info(f"No data available for stock {stock.ticker_symbol}")
+            else:
+                with_data.append(stock)
+        if not with_data:
+            return verdicts
+
+        panel = build_panel(
+            [stock.data for stock in with_data],
+            [stock.ticker_symbol for stock in with_data],
+        )
+        matched = np.ones(len(with_data), dtype=bool)
+        # The stocks of the panel columns, which are dropped once rejected
+        columns = np.arange(len(with_data))
+        for p, pattern in enumerate(patterns):
+            remaining = matched[columns]
+            if not remaining.any():
+                break
+            if not remaining.all():
+                panel = panel.iloc[:, np.flatnonzero(remaining)]
+                columns = columns[remaining]
+            start = time.perf_counter()
+            mask = pattern.check_panel(panel).to_numpy()
+            seconds[p] += time.perf_counter() - start
+            for i, verdict in zip(columns, mask):
+                stock = with_data[i]
+                verdicts[stock.ticker_symbol].append(bool(verdict))
+                if not verdict:
+                    logger.info(f"{stock.ticker_symbol} does not match {pattern.name}")
+                    matched[i] = False
+
+        for stock, stock_matched in zip(with_data, matched):
+            if stock_matched:
                 logger.info(f"{stock.ticker_symbol} matches all patterns")
-                filtered_stocks.append(stock.ticker_symbol)
-        return filtered_stocks
+        return verdicts
@@ -1,6 +1,9 @@
 from typing import List, Dict, Callable
 import ast
-from stockaxion.utils.llm import llm_client
+import json
+import re
+from stockaxion.logger import logger
+from stockaxion.utils.llm import chat
 
 
 class StockSearch(object):
@@ -20,15 +23,20 @@ class StockSearch(object):
         pass
 
     def search(
-        self, search_criteria: List[str] | None = ["rise_and_fall"]
+        self,
+        search_criteria: List[str] | None = ["rise_and_fall"],
+        search_params: Dict[str, dict] = None,
     ) -> List[str]:
         """Search for stocks based on the given search criteria.
 
         Args:
             search_criteria (str): The search criteria to use.
+            search_params (Dict[str, dict]): The keyword arguments of the search
+                method of each criterion (e.g., {"local_rise_and_fall": {"rise": 80}}).
 
         Returns:
-            List[str]: A list of stock ticker symbols that match the search criteria.
+            List[str]: The ticker symbols that match any of the search criteria,
+                without duplicates.
         """
         if search_criteria is None:
             search_criteria = ["rise_and_fall"]
@@ -39,11 +47,94 @@ class StockSearch(object):
                     f"Invalid search criteria. Valid criteria are: {list(self._search_methods.keys())}"
                 )
 
+        search_params = search_params or {}
         results = []
         for criterion in search_criteria:
-            results.extend(self._search_methods[criterion](self))
+            results.extend(
+                self._search_methods[criterion](
+                    self, **search_params.get(criterion, {})
+                )
+            )
+
+        # The same stock may match several criteria
+        return list(dict.fromkeys(results))
+
+
+# A ticker symbol, e.g. AAPL, BRK.B, BF-B, ^GSPC or EURUSD=X
+TICKER_PATTERN = re.compile(r"^\^?[A-Z0-9][A-Z0-9.\-=]{0,14}$")
+
+SYSTEM_PROMPT = "You are an expert in stock markets."
+JSON_INSTRUCTIONS = (
+    "Answer with a JSON object whose only key is \"tickers\", the list of the "
+    'ticker symbols, for instance {"tickers": ["AAPL", "GOOGL", "AMZN"]}, '
+    "no extra text. If you can provide 10 stocks, that would be great."
+)
+
+
+def _literal(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def parse_tickers(text: str) -> List[str]:
+    """Extract the ticker symbols from the response of the LLM.
 
-        return results
+    The response should be a JSON object {"tickers": [...]} or a list of
+    tickers, but may be wrapped in a code block or surrounded by prose, in
+    which case the first object or list in the text is used. Invalid tickers
+    are dropped and duplicates removed, keeping the order.
+
+    Args:
+        text (str): The content of the response.
+
+    Returns:
+        List[str]: The valid ticker symbols, uppercased.
+    """
+    value = _literal(text.strip())
+    if value is None:
+        for match in re.finditer(r"\{.*\}|\[.*?\]", text, re.DOTALL):
+            value = _literal(match.group())
+            if value is not None:
+                break
+    if isinstance(value, dict):
+        value = value.get("tickers", [])
+    if not isinstance(value, (list, tuple)):
+        logger.info(f"No tickers found in the LLM response: {text[:200]!r}")
+        return []
+    tickers = []
+    for item in value:
+        if isinstance(item, dict):
+            item = item.get("ticker") or item.get("symbol")
+        if not isinstance(item, str):
+            continue
+        ticker = item.strip().upper()
+        if TICKER_PATTERN.match(ticker):
+            tickers.append(ticker)
+        else:
+            logger.info(f"Ignoring invalid ticker {item!r} of the LLM response")
+    return list(dict.fromkeys(tickers))
+
+
+def ask_tickers(prompt: str) -> List[str]:
+    """Ask the LLM for a list of tickers, as structured JSON output.
+
+    The response is cached and identical concurrent prompts are coalesced into
+    a single call, see `stockaxion.utils.llm.chat`.
+    """
+    response = chat(
+        [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"{prompt} {JSON_INSTRUCTIONS}"},
+        ],
+        response_format={"type": "json_object"},
+    )
+    return parse_tickers(response)
 
 
 @StockSearch.register_search_method("cup_and_handle")
@@ -56,59 +147,62 @@ def _search_for_cup_and_handle(
     Returns:
         List[str]: A list of stock ticker symbols that match the search criteria.
     """
-    prompt = (
-        "Find stocks that have a cup and handle pattern. "
-        "For each stock, provide the ticker symbol "
-        "such that the response should for instance be ['AAPL', 'GOOGL', 'AMZN'], no extra text. "
-        "If you can provide 10 stocks, that would be great."
-    )
-    completion = llm_client.chat.completions.create(
-        model="grok-beta",
-        messages=[
-            {"role": "system", "content": "You are an expert in stock markets."},
-            {"role": "user", "content": prompt},
-        ],
-    )
-    return ast.literal_eval(completion.choices[0].message.content)
+    return ask_tickers("Find stocks that have a cup and handle pattern.")
 
 
 @StockSearch.register_search_method("rise_and_fall")
 def _search_for_rise_and_fall(
-    rise: int = 100,
-    fall: int = 50,
-    months=4,
-    # self, rise: int = 100, fall: int = 50, months=4
+    self, rise: int = 100, fall: int = 50, months=4
 ) -> List[str]:
     """Search for stocks that have risen a lot then fallen 50-75% of the rise.
     This call the LLM Grok model to get the stocks that match the search criteria.
 
-
     Args:
         rise (int): The percentage rise in the stock price.
-        fall (int): Thesearch_methods = {
-        "rise_and_fall": self._search_for_rise_and_fall,
-        # Add other criteria and corresponding methods here
-    } percentage fall in the stock price.
+        fall (int): The percentage fall in the stock price.
         months (int): The number of months in which the fall should occur.
 
     Returns:
         List[str]: A list of stock ticker symbols that match the search criteria.
     """
-    prompt = (
+    return ask_tickers(
         f"Find stocks that have risen {rise}% then fallen {fall}%. "
-        f"The fall should occur in the last {months} months. "
-        "For each stock, provide the ticker symbol "
-        "such that the response should for instance be ['AAPL', 'GOOGL', 'AMZN'], no extra text. "
-        "If you can provide 10 stocks, that would be great."
-    )
-    completion = llm_client.chat.completions.create(
-        model="grok-beta",
-        messages=[
-            {"role": "system", "content": "You are an expert in stock markets."},
-            {"role": "user", "content": prompt},
-        ],
+        f"The fall should occur in the last {months} months."
     )
-    return ast.literal_eval(completion.choices[0].message.content)
+
+
+@StockSearch.register_search_method("local_rise_and_fall")
+def _search_local_rise_and_fall(
+    self,
+    rise: int = 100,
+    fall: int = 50,
+    months: int = 4,
+    interval: str = "1wk",
+    period: str = "5y",
+    universe: List[str] = None,
+) -> List[str]:
+    """Search for stocks that have risen a lot then fallen, in the local
+    screener index instead of asking the LLM, see `stockaxion.screener`.
+
+    The index is first refreshed from the price cache.
+
+    Args:
+        rise (int): The percentage rise of the stock price to its peak.
+        fall (int): The percentage fall of the stock price since its peak.
+        months (int): The number of months in which the peak should be.
+        interval (str): The interval of the bars (e.g., 1wk).
+        period (str): The period the rise is measured on (e.g., 5y).
+        universe (List[str]): The stocks to screen, all the cached stocks by
+            default.
+
+    Returns:
+        List[str]: A list of stock ticker symbols that match the search criteria.
+    """
+    from stockaxion.screener import ScreenerIndex
+
+    index = ScreenerIndex(interval=interval, period=period)
+    index.refresh(universe)
+    return index.rise_and_fall(rise, fall, months)
 
 
 VALID_SEARCH_CRITERIA = (
@@ -0,0 +1,245 @@
+"""Sweep the parameters of the patterns over a universe of stocks.
+
+Tuning a pattern means checking it with many combinations of parameters. The
+sweep builds the right-aligned panel of the close prices once, then, for each
+pattern, computes every intermediate series once per distinct value of the
+parameters it depends on: one rolling sum per `window_size` for
+`check_rise_then_fall`, one RSI per `window_size` for `check_weekly_rsi_low`,
+one cup search per rim and width parameters for `check_cup_and_handle`. The
+threshold comparisons are broadcast over all the combinations sharing these
+intermediates, as (combinations x tickers) arrays.
+"""
+
+import itertools
+from typing import Callable, Dict, List
+import numpy as np
+import pandas as pd
+from stockaxion.data_loader import BulkLoader
+from stockaxion.indicators.panel import (
+    align_right,
+    build_panel,
+    cup_and_handle_mask,
+    cup_and_handle_stats,
+    last_month_mask,
+    rise_fall_stats,
+    rise_then_fall_mask,
+    rsi,
+)
+from stockaxion.indicators.pattern import Pattern
+from stockaxion.stock import Stock
+from stockaxion.stock_filter import StockFilter
+from stockaxion.logger import logger
+
+SWEEP_PATTERNS: Dict[str, Callable] = {}
+
+
+def register_sweep_pattern(name: str):
+    """Register the sweep implementation of the pattern function `name`.
+
+    It takes the right-aligned values, dates and lengths of the panel (see
+    `align_right`) and a DataFrame of parameter combinations, and returns the
+    (combinations x tickers) boolean array of the verdicts.
+    """
+
+    def decorator(func: Callable):
+        SWEEP_PATTERNS[name] = func
+        return func
+
+    return decorator
+
+
+def _groups(combos: pd.DataFrame, columns: List[str]) -> Dict[tuple, np.ndarray]:
+    """The rows of the combinations by distinct values of `columns`."""
+    return {
+        key if isinstance(key, tuple) else (key,): rows
+        for key, rows in combos.groupby(columns, sort=False).indices.items()
+    }
+
+
+def _column(combos: pd.DataFrame, name: str, rows: np.ndarray) -> np.ndarray:
+    """A parameter of the combinations `rows`, as a column to broadcast."""
+    return combos[name].to_numpy()[rows][:, None]
+
+
+@register_sweep_pattern("check_rise_then_fall")
+def sweep_rise_then_fall(
+    values: np.ndarray, dates: np.ndarray, lengths: np.ndarray, combos: pd.DataFrame
+) -> np.ndarray:
+    """Sweep of `check_rise_then_fall`, with one rolling sum per window size."""
+    verdicts = np.zeros((len(combos), values.shape[1]), dtype=bool)
+    for (window_size,), rows in _groups(combos, ["window_size"]).items():
+        stats = rise_fall_stats(values, lengths, int(window_size))
+        verdicts[rows] = rise_then_fall_mask(
+            stats,
+            values.shape[0],
+            lengths,
+            _column(combos, "rise_threshold", rows),
+        )
+    return verdicts
+
+
+@register_sweep_pattern("check_weekly_rsi_low")
+def sweep_weekly_rsi_low(
+    values: np.ndarray, dates: np.ndarray, lengths: np.ndarray, combos: pd.DataFrame
+) -> np.ndarray:
+    """Sweep of `check_weekly_rsi_low`, with one RSI per window size: a stock
+    matches when its lowest RSI of the last month is below the threshold."""
+    verdicts = np.zeros((len(combos), values.shape[1]), dtype=bool)
+    if values.shape[0] == 0:
+        return verdicts
+    last_month = last_month_mask(dates, lengths)
+    for (window_size,), rows in _groups(combos, ["window_size"]).items():
+        window_rsi = rsi(values, lengths, int(window_size))
+        lowest = np.where(last_month & ~np.isnan(window_rsi), window_rsi, np.inf)
+        lowest = lowest.min(axis=0)
+        verdicts[rows] = (lowest < _column(combos, "rsi_threshold", rows)) & (
+            lengths > 0
+        )
+    return verdicts
+
+
+@register_sweep_pattern("check_cup_and_handle")
+def sweep_cup_and_handle(
+    values: np.ndarray, dates: np.ndarray, lengths: np.ndarray, combos: pd.DataFrame
+) -> np.ndarray:
+    """Sweep of `check_cup_and_handle`, with one cup search per width and rim
+    parameters and the depth and handle thresholds broadcast."""
+    verdicts = np.zeros((len(combos), values.shape[1]), dtype=bool)
+    shared = ["min_cup_bars", "max_cup_bars", "max_handle_bars", "rim_tolerance"]
+    for key, rows in _groups(combos, shared).items():
+        min_cup_bars, max_cup_bars, max_handle_bars, rim_tolerance = key
+        stats = cup_and_handle_stats(
+            values,
+            lengths,
+            int(min_cup_bars),
+            int(max_cup_bars),
+            int(max_handle_bars),
+            rim_tolerance,
+        )
+        verdicts[rows] = cup_and_handle_mask(
+            stats,
+            _column(combos, "min_depth", rows),
+            _column(combos, "max_depth", rows),
+            _column(combos, "max_retracement", rows),
+            rim_tolerance,
+        )
+    return verdicts
+
+
+def expand_grid(pattern: Pattern, grid: Dict[str, list]) -> pd.DataFrame:
+    """All the combinations of the parameters of a pattern.
+
+    Args:
+        pattern (Pattern): The pattern, whose parameters not in the grid keep
+            their configured or default value.
+        grid (Dict[str, list]): The values of each swept parameter.
+
+    Returns:
+        pd.DataFrame: One row per combination, one column per parameter.
+    """
+    params = pattern.resolved_params()
+    unknown = set(grid) - set(params)
+    if unknown:
+        raise ValueError(
+            f"Invalid parameters {sorted(unknown)} for {pattern.name}. "
+            f"Valid parameters are: {list(params)}"
+        )
+    names = list(params)
+    values = [list(grid.get(name, [params[name]])) for name in names]
+    return pd.DataFrame(list(itertools.product(*values)), columns=names)
+
+
+class Sweep:
+    """Check the patterns on several stocks for every combination of their
+    parameters.
+
+    The stocks are loaded like in `StockFilter`, from the price cache when
+    available.
+
+    Args:
+        stocks (List[str] | List[Stock]): The ticker symbols or the stocks.
+        grids (Dict[str, Dict[str, list]]): The values of the swept parameters
+            of each pattern by name, e.g. `{"check_rise_then_fall":
+            {"window_size": [10, 20], "rise_threshold": [50, 100]}}`.
+        extra_params (dict): The parameters of the run, see `StockFilter`.
+    """
+
+    def __init__(
+        self,
+        stocks: List[str] | List[Stock],
+        grids: Dict[str, Dict[str, list]],
+        extra_params: dict = {},
+    ):
+        self.extra_params = extra_params
+        stock_filter = StockFilter(stocks, list(grids), extra_params)
+        self.cache = stock_filter.cache
+        self.stocks = stock_filter.stocks
+        self.patterns = stock_filter.patterns
+        self.grids = grids
+
+    def _pattern_verdicts(
+        self,
+        pattern: Pattern,
+        combos: pd.DataFrame,
+        panel: pd.DataFrame,
+        aligned: tuple,
+        frames: List[pd.DataFrame],
+    ) -> np.ndarray:
+        sweep_function = SWEEP_PATTERNS.get(pattern.name)
+        if sweep_function is not None:
+            return sweep_function(*aligned, combos)
+        logger.info(f"No sweep version of {pattern.name}, checking each combination")
+        verdicts = np.zeros((len(combos), len(frames)), dtype=bool)
+        for i, params in enumerate(combos.to_dict("records")):
+            if pattern.panel_function is not None:
+                verdicts[i] = pattern.check_panel(panel, **params).to_numpy()
+            else:
+                verdicts[i] = [bool(pattern.check(df, **params)) for df in frames]
+        return verdicts
+
+    def run(self) -> pd.DataFrame:
+        """Run the sweep.
+
+        Returns:
+            pd.DataFrame: One row per pattern, combination of parameters and
+                ticker, with the parameters as columns and the verdict in
+                `match`. The parameters of the other patterns are NaN.
+        """
+        BulkLoader.from_params(self.extra_params, cache=self.cache).load(self.stocks)
+        stocks = [
+            stock
+            for stock in self.stocks
+            if stock.data is not None and not stock.data.empty
+        ]
+        tickers = np.array([stock.ticker_symbol for stock in stocks], dtype=object)
+        frames = [stock.data for stock in stocks]
+        panel = build_panel(frames, list(tickers))
+        aligned = align_right(panel)
+        tables = []
+        for pattern in self.patterns:
+            combos = expand_grid(pattern, self.grids[pattern.name])
+            verdicts = self._pattern_verdicts(pattern, combos, panel, aligned, frames)
+            table = {
+                "pattern": pattern.name,
+                "combination": np.repeat(np.arange(len(combos)), len(tickers)),
+                "ticker": np.tile(tickers, len(combos)),
+            }
+            for name in combos:
+                table[name] = np.repeat(combos[name].to_numpy(), len(tickers))
+            table["match"] = verdicts.ravel()
+            tables.append(pd.DataFrame(table))
+        return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+    @staticmethod
+    def match_rates(results: pd.DataFrame, pattern: str) -> pd.DataFrame:
+        """The share of the stocks matching a pattern for each combination of its
+        parameters, from the results of `run`."""
+        results = results[results["pattern"] == pattern].dropna(axis=1, how="all")
+        params = [
+            column
+            for column in results.columns
+            if column not in ("pattern", "combination", "ticker", "match")
+        ]
+        return results.groupby(params)["match"].agg(["sum", "mean"]).rename(
+            columns={"sum": "matches", "mean": "match_rate"}
+        )
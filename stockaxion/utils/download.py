@@ -0,0 +1,70 @@
+from typing import List
+import pandas as pd
+
+
+def yf_download(
+    tickers: List[str] | str,
+    period: str = None,
+    interval: str = "1wk",
+    start: pd.Timestamp = None,
+) -> pd.DataFrame:
+    """Download one or several tickers at once with Yahoo Finance.
+
+    Args:
+        tickers (List[str] | str): The stock ticker symbols to download.
+        period (str): The period for which to fetch the data (e.g., 1y).
+        interval (str): The interval at which to fetch the data (e.g., 1wk).
+        start (pd.Timestamp): Fetch the data from this date instead of a period.
+
+    Returns:
+        pd.DataFrame: The data with (ticker, field) MultiIndex columns.
+    """
+    import yfinance as yf
+
+    if start is not None:
+        period = None
+    return yf.download(
+        tickers,
+        period=period,
+        start=start,
+        interval=interval,
+        group_by="ticker",
+        progress=False,
+    )
+
+
+def split_download(
+    frame: pd.DataFrame, ticker: str, n_tickers: int = 1
+) -> pd.DataFrame | None:
+    """Extract the data of one ticker from a multi-ticker download.
+
+    A download with flat columns is only attributed to the ticker when it was
+    the only one requested, since the ticker of the data is unknown otherwise.
+
+    Args:
+        frame (pd.DataFrame): The result of a multi-ticker download.
+        ticker (str): The ticker symbol to extract.
+        n_tickers (int): The number of tickers requested in the download.
+
+    Returns:
+        pd.DataFrame | None: The ticker data with flat columns, or None if the
+            download has no data for this ticker.
+    """
+    if frame is None or frame.empty:
+        return None
+    if isinstance(frame.columns, pd.MultiIndex):
+        if ticker in frame.columns.get_level_values(0):
+            data = frame[ticker]
+        elif ticker in frame.columns.get_level_values(-1):
+            data = frame.xs(ticker, axis=1, level=-1)
+        else:
+            return None
+    elif n_tickers == 1:
+        data = frame
+    else:
+        return None
+    data = data.dropna(how="all")
+    if data.empty:
+        return None
+    data.columns.name = None
+    return data
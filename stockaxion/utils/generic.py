@@ -1,5 +1,19 @@
+import os
 from datetime import datetime
 
 
 def get_date():
     return datetime.now().strftime("%Y%m%d")
+
+
+def get_cache_dir(*parts: str) -> str:
+    """Return a directory of the local stockaxion cache, creating it if needed.
+
+    The cache root is `~/.cache/stockaxion` unless the `STOCKAXION_CACHE_DIR`
+    environment variable is set.
+    """
+    default_root = os.path.join(os.path.expanduser("~"), ".cache", "stockaxion")
+    root = os.getenv("STOCKAXION_CACHE_DIR", default_root)
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -1,13 +1,333 @@
+import asyncio
+import hashlib
+import json
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+from stockaxion.utils.generic import get_cache_dir
+from stockaxion.logger import logger
+from stockaxion.profiling import count, timed
 
-load_dotenv()
+DEFAULT_MODEL = "grok-beta"
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+DEFAULT_CACHE_TTL = timedelta(hours=24)
 
+# The OpenAI clients are created on first use, see `__getattr__`
+_clients = {}
+# The asynchronous clients by event loop, since their connections are bound
+# to the loop they were created in
+_async_clients = weakref.WeakKeyDictionary()
 
-XAI_API_KEY = os.getenv("XAI_API_KEY")
-llm_client = OpenAI(
-    api_key=XAI_API_KEY,
-    base_url="https://api.x.ai/v1",
-)
 
+def _client_settings() -> dict:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return {
+        "api_key": os.getenv("XAI_API_KEY"),
+        # Can point to any OpenAI-compatible server, e.g. a local stub
+        "base_url": os.getenv("XAI_BASE_URL", "https://api.x.ai/v1"),
+    }
+
+
+def get_llm_client():
+    """Return the OpenAI client of the xAI API, created on first use."""
+    if "sync" not in _clients:
+        from openai import OpenAI
+
+        _clients["sync"] = OpenAI(**_client_settings())
+    return _clients["sync"]
+
+
+def get_async_llm_client():
+    """Return the asynchronous OpenAI client of the xAI API for the running
+    event loop, created on first use."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    clients = _async_clients if loop is not None else _clients
+    key = loop if loop is not None else "async"
+    if key not in clients:
+        from openai import AsyncOpenAI
+
+        # Retries are handled by `achat`
+        clients[key] = AsyncOpenAI(**_client_settings(), max_retries=0)
+    return clients[key]
+
+
+async def close_async_llm_client():
+    """Close the asynchronous client of the running event loop, if any."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def retryable_errors() -> tuple:
+    """The transient errors of the OpenAI client."""
+    import openai
+
+    return (
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    )
+
+
+def __getattr__(name: str):
+    if name == "llm_client":
+        return get_llm_client()
+    if name == "async_llm_client":
+        return get_async_llm_client()
+    if name == "RETRYABLE_ERRORS":
+        return retryable_errors()
+    if name in ("XAI_API_KEY", "XAI_BASE_URL"):
+        return _client_settings()[name[4:].lower()]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LLMCache:
+    """Persistent cache of LLM responses keyed by a hash of the prompt.
+
+    Responses are stored in a SQLite database and expire after `ttl`.
+    """
+
+    def __init__(self, path: str = None, ttl: timedelta = DEFAULT_CACHE_TTL):
+        self.path = path or os.path.join(get_cache_dir(), "llm.sqlite")
+        self.ttl = ttl
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT, created REAL)"
+            )
+
+    @staticmethod
+    def key(model: str, messages: List[dict], **options) -> str:
+        prompt = json.dumps(
+            {"model": model, "messages": messages, **options}, sort_keys=True
+        )
+        return hashlib.sha256(prompt.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with sqlite3.connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl.total_seconds():
+            return None
+        return row[0]
+
+    def set(self, key: str, response: str):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, response, time.time()),
+            )
+
+
+_default_cache = None
+# The calls in progress by cache key, so that identical requests are coalesced
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+_async_in_flight: Dict[tuple, asyncio.Future] = {}
+
+
+def get_llm_cache() -> LLMCache:
+    """Return the LLM response cache shared by the whole package."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache()
+    return _default_cache
+
+
+def chat(
+    messages: List[dict], model: str = DEFAULT_MODEL, use_cache=True, **options
+) -> str:
+    """Get the response of the LLM to the messages, from the cache if possible.
+
+    Identical requests made concurrently from several threads are coalesced
+    into a single call, whose response is shared.
+
+    Args:
+        messages (List[dict]): The chat messages.
+        model (str): The LLM model.
+        use_cache (bool): Whether to use the response cache.
+        **options: The other arguments of the completion request (e.g.,
+            response_format).
+
+    Returns:
+        str: The content of the response.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = LLMCache.key(model, messages, **options)
+    if cache is not None and (response := cache.get(key)) is not None:
+        count("llm.cache_hit")
+        return response
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+    if not owner:
+        count("llm.coalesced")
+        return future.result()
+    try:
+        with timed("llm"):
+            completion = get_llm_client().chat.completions.create(
+                model=model, messages=messages, **options
+            )
+        response = completion.choices[0].message.content
+        if cache is not None:
+            cache.set(key, response)
+        future.set_result(response)
+        return response
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+
+
+async def achat(
+    messages: List[dict],
+    model: str = DEFAULT_MODEL,
+    semaphore: asyncio.Semaphore = None,
+    use_cache: bool = True,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    **options,
+) -> str:
+    """Asynchronous `chat`, retrying transient errors with exponential backoff.
+
+    Identical requests made concurrently in the event loop are coalesced into
+    a single call.
+
+    Args:
+        messages (List[dict]): The chat messages.
+        model (str): The LLM model.
+        semaphore (asyncio.Semaphore): Limits the number of concurrent calls.
+        use_cache (bool): Whether to use the response cache.
+        retries (int): The number of retries after a transient error.
+        backoff (float): The delay before the first retry, in seconds.
+        **options: The other arguments of the completion request.
+
+    Returns:
+        str: The content of the response.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = LLMCache.key(model, messages, **options)
+    if cache is not None:
+        response = await asyncio.to_thread(cache.get, key)
+        if response is not None:
+            count("llm.cache_hit")
+            return response
+    task_key = (id(asyncio.get_running_loop()), key)
+    task = _async_in_flight.get(task_key)
+    if task is not None:
+        count("llm.coalesced")
+        return await asyncio.shield(task)
+    task = asyncio.ensure_future(
+        _acomplete(
+            messages,
+            model,
+            semaphore or asyncio.Semaphore(1),
+            retries,
+            backoff,
+            options,
+            cache,
+            key,
+        )
+    )
+    _async_in_flight[task_key] = task
+    task.add_done_callback(lambda _: _async_in_flight.pop(task_key, None))
+    return await asyncio.shield(task)
+
+
+async def _acomplete(
+    messages: List[dict],
+    model: str,
+    semaphore: asyncio.Semaphore,
+    retries: int,
+    backoff: float,
+    options: dict,
+    cache: LLMCache | None,
+    key: str,
+) -> str:
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                with timed("llm"):
+                    completion = await get_async_llm_client().chat.completions.create(
+                        model=model, messages=messages, **options
+                    )
+            break
+        except retryable_errors() as e:
+            count("llm.retry")
+            if attempt == retries:
+                raise
+            delay = backoff * 2**attempt * (1 + random.random())
+            logger.info(f"LLM call failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    response = completion.choices[0].message.content
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, response)
+    return response
+
+
+async def achat_many(
+    messages_list: List[List[dict]],
+    model: str = DEFAULT_MODEL,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    **kwargs,
+) -> List[str]:
+    """Get the responses to several conversations concurrently.
+
+    Args:
+        messages_list (List[List[dict]]): The chat messages of each conversation.
+        model (str): The LLM model.
+        max_concurrency (int): The maximum number of concurrent calls.
+        **kwargs: The other arguments of `achat`.
+
+    Returns:
+        List[str]: The content of the responses, in the same order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(
+        *(
+            achat(messages, model=model, semaphore=semaphore, **kwargs)
+            for messages in messages_list
+        )
+    )
+
+
+async def _achat_many_and_close(messages_list: List[List[dict]], **kwargs):
+    try:
+        return await achat_many(messages_list, **kwargs)
+    finally:
+        await close_async_llm_client()
+
+
+def chat_many(messages_list: List[List[dict]], **kwargs) -> List[str]:
+    """Synchronous version of `achat_many`.
+
+    The calls run in a new event loop, on a separate thread if an event loop
+    is already running in this one (e.g. in Jupyter).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_achat_many_and_close(messages_list, **kwargs))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(
+            asyncio.run, _achat_many_and_close(messages_list, **kwargs)
+        ).result()
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from benchmarks.synthetic import synthetic_ohlcv
+
+
+def with_missing_closes(df, n_missing, seed):
+    """Copy of the data with `n_missing` random closes set to NaN."""
+    df = df.copy()
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(df), size=min(n_missing, len(df)), replace=False)
+    df.iloc[rows, df.columns.get_loc("Close")] = np.nan
+    return df
+
+
+def rise_then_fall_ohlcv(seed):
+    """Weekly data which rises by 5% a bar, then falls by 2% a bar at the end."""
+    df = synthetic_ohlcv(100, "1wk", seed=seed)
+    rng = np.random.default_rng(seed)
+    changes = np.concatenate(
+        [
+            rng.normal(0, 0.01, 40),
+            np.full(20, 0.05),
+            rng.normal(0, 0.01, 20),
+            np.full(20, -0.02),
+        ]
+    )
+    df["Close"] = 100 * np.cumprod(1 + changes)
+    return df
+
+
+@pytest.fixture(scope="session")
+def frames():
+    """Weekly stock data of various lengths, short histories and missing
+    closes included."""
+    frames = []
+    for seed, n_bars in enumerate([1, 2, 15, 21, 40, 80, 120, 200, 260, 260] * 3):
+        df = synthetic_ohlcv(n_bars, "1wk", seed=seed)
+        if seed % 3 == 1:
+            df = with_missing_closes(df, max(1, n_bars // 20), seed)
+        elif seed % 3 == 2 and n_bars > 10:
+            # A gap of missing closes at the end
+            df.iloc[-3:, df.columns.get_loc("Close")] = np.nan
+        frames.append(df)
+    frames.append(rise_then_fall_ohlcv(0))
+    frames.append(with_missing_closes(rise_then_fall_ohlcv(1), 5, 1))
+    return frames
@@ -0,0 +1,123 @@
+"""The panel, streaming, expanding and sweep engines against the per-frame
+pattern functions."""
+
+import numpy as np
+import pytest
+from stockaxion.backtest import EXPANDING_PATTERNS, pattern_signals
+from stockaxion.indicators.panel import build_panel
+from stockaxion.indicators.pattern import (
+    Pattern,
+    check_cup_and_handle,
+    check_rise_then_fall,
+    check_weekly_rsi_low,
+)
+from stockaxion.indicators.price import calculate_rsi, get_close
+from stockaxion.indicators.streaming import STREAMING_PATTERNS, RollingSum, StreamingRSI
+from stockaxion.stock import Stock
+from stockaxion.sweep import Sweep
+
+PATTERNS = [
+    Pattern(
+        "check_rise_then_fall", check_rise_then_fall, params={"rise_threshold": 30}
+    ),
+    Pattern(
+        "check_weekly_rsi_low", check_weekly_rsi_low, params={"rsi_threshold": 45}
+    ),
+    Pattern("check_cup_and_handle", check_cup_and_handle),
+]
+
+
+def by_name(names):
+    return [pattern for pattern in PATTERNS if pattern.name in names]
+
+
+def make_stock(i, df):
+    stock = Stock(f"SYN{i}", period="5y", interval="1wk")
+    stock._data = df
+    return stock
+
+
+@pytest.mark.parametrize("pattern", PATTERNS, ids=lambda pattern: pattern.name)
+def test_panel(pattern, frames):
+    verdicts = [bool(pattern.check(df)) for df in frames]
+    assert any(verdicts)
+    panel = build_panel(frames, [f"T{i}" for i in range(len(frames))])
+    assert pattern.check_panel(panel).tolist() == verdicts
+
+
+@pytest.mark.parametrize("window", [1, 5, 20])
+def test_streaming_rolling_sum(window, frames):
+    for df in frames:
+        values = get_close(df).pct_change(fill_method=None).to_numpy() * 100
+        rolling_sum = RollingSum(window)
+        streaming = [rolling_sum.update(value) for value in values]
+        expected = get_close(df).pct_change(fill_method=None).mul(100)
+        expected = expected.rolling(window).sum().to_numpy()
+        np.testing.assert_allclose(streaming, expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+def test_streaming_rsi(smoothing, frames):
+    for df in frames:
+        close = get_close(df).dropna().to_frame("Close")
+        rsi = StreamingRSI(14, smoothing)
+        streaming = [rsi.update(value) for value in close["Close"]]
+        expected = calculate_rsi(close, window=14, smoothing=smoothing).to_numpy()
+        np.testing.assert_allclose(streaming, expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize(
+    "pattern", by_name(STREAMING_PATTERNS), ids=lambda pattern: pattern.name
+)
+def test_streaming(pattern, frames):
+    for i, df in enumerate(frames[::3]):
+        n_seed = len(df) // 2
+        stock = make_stock(i, df.iloc[:n_seed])
+        streaming = stock.watch([pattern])[pattern.name]
+        assert streaming == bool(pattern.check(df.iloc[:n_seed]))
+        for end in range(n_seed, len(df)):
+            timestamp = df.index[end]
+            streaming = stock.append_bar(timestamp, df.iloc[end].to_dict())
+            assert streaming[pattern.name] == bool(pattern.check(df.iloc[: end + 1]))
+
+
+@pytest.mark.parametrize(
+    "pattern", by_name(EXPANDING_PATTERNS), ids=lambda pattern: pattern.name
+)
+def test_expanding(pattern, frames):
+    for df in frames[::2]:
+        close = get_close(df).dropna()
+        signals = pattern_signals([pattern], close, min_bars=1)[pattern.name]
+        expected = [
+            bool(pattern.check(close.iloc[: end + 1].to_frame("Close")))
+            for end in range(len(close))
+        ]
+        assert signals.tolist() == expected
+
+
+GRIDS = {
+    "check_rise_then_fall": {"window_size": [10, 20], "rise_threshold": [20, 50]},
+    "check_weekly_rsi_low": {"window_size": [7, 14], "rsi_threshold": [35, 45]},
+    "check_cup_and_handle": {"max_cup_bars": [30, 65], "min_depth": [8, 12]},
+}
+
+
+def test_sweep(frames):
+    stocks = [make_stock(i, df) for i, df in enumerate(frames)]
+    results = Sweep(stocks, GRIDS, {"use_cache": False}).run()
+    frames_by_ticker = {stock.ticker_symbol: stock.data for stock in stocks}
+    checked = 0
+    for pattern in PATTERNS:
+        rows = results[results["pattern"] == pattern.name]
+        for row in rows.to_dict("records"):
+            params = {name: row[name] for name in GRIDS[pattern.name]}
+            params = {
+                name: int(value) if float(value).is_integer() else value
+                for name, value in params.items()
+            }
+            df = frames_by_ticker[row["ticker"]]
+            assert row["match"] == bool(pattern.function(df, **params)), row
+            checked += 1
+    # The stocks without data are not swept
+    assert checked == 12 * sum(not df.empty for df in frames)
+    assert results["match"].any()
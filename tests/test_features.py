@@ -0,0 +1,41 @@
+import gc
+import weakref
+import numpy as np
+from benchmarks.synthetic import synthetic_ohlcv
+from stockaxion.indicators import features
+from stockaxion.indicators.pattern import check_rise_then_fall, check_weekly_rsi_low
+from stockaxion.indicators.price import calculate_rsi, drop_missing_closes
+
+
+def test_checked_frames_are_collected():
+    refs = []
+    for seed in range(20):
+        df = synthetic_ohlcv(120, "1wk", seed=seed)
+        if seed % 2:
+            df.iloc[[3, 50], df.columns.get_loc("Close")] = np.nan
+        check_rise_then_fall(df)
+        check_weekly_rsi_low(df)
+        refs.append(weakref.ref(df))
+    del df
+    gc.collect()
+    assert all(ref() is None for ref in refs)
+
+
+def test_feature_cache_dropped_with_frame():
+    df = synthetic_ohlcv(60, "1wk")
+    key = id(df)
+    calculate_rsi(df)
+    assert key in features._feature_caches
+    del df
+    gc.collect()
+    assert key not in features._feature_caches
+
+
+def test_drop_missing_closes():
+    df = synthetic_ohlcv(30, "1wk")
+    assert drop_missing_closes(df) is df
+    df.iloc[[0, 10], df.columns.get_loc("Close")] = np.nan
+    features.invalidate_features(df)
+    valid = drop_missing_closes(df)
+    assert len(valid) == 28
+    assert valid["Close"].notna().all()
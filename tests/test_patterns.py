@@ -0,0 +1,28 @@
+import pytest
+from benchmarks.synthetic import synthetic_ohlcv
+from stockaxion.indicators.panel import build_panel
+from stockaxion.indicators.pattern import (
+    Pattern,
+    check_cup_and_handle,
+    check_rise_then_fall,
+    check_weekly_rsi_low,
+)
+
+PATTERNS = [
+    Pattern(
+        "check_rise_then_fall", check_rise_then_fall, params={"rise_threshold": 30}
+    ),
+    Pattern(
+        "check_weekly_rsi_low", check_weekly_rsi_low, params={"rsi_threshold": 45}
+    ),
+    Pattern("check_cup_and_handle", check_cup_and_handle),
+]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS, ids=lambda pattern: pattern.name)
+@pytest.mark.parametrize("n_bars", [1, 2, 14, 20, 21, 22])
+def test_short_histories(pattern, n_bars):
+    frames = [synthetic_ohlcv(n_bars, "1wk", seed=seed) for seed in range(5)]
+    verdicts = [bool(pattern.check(df)) for df in frames]
+    panel = build_panel(frames, [f"T{i}" for i in range(len(frames))])
+    assert pattern.check_panel(panel).tolist() == verdicts
@@ -0,0 +1,60 @@
+from benchmarks.synthetic import synthetic_ohlcv
+from stockaxion.stock import Stock
+from stockaxion.stock_filter import StockFilter
+
+PATTERNS = ["check_rise_then_fall", "check_weekly_rsi_low"]
+
+
+def make_stocks(n_stocks=20):
+    stocks = []
+    for seed in range(n_stocks):
+        stock = Stock(f"SYN{seed}", period="5y", interval="1wk")
+        stock._data = synthetic_ohlcv(260, "1wk", seed=seed)
+        stocks.append(stock)
+    return stocks
+
+
+def run(stocks, tmp_path, monkeypatch, **extra_params):
+    checked = []
+    original = StockFilter._record_verdicts
+
+    def record_verdicts(self, patterns, stocks, verdicts):
+        checked.extend(stock.ticker_symbol for stock in stocks)
+        return original(self, patterns, stocks, verdicts)
+
+    monkeypatch.setattr(StockFilter, "_record_verdicts", record_verdicts)
+    params = {
+        "use_cache": False,
+        "use_panel": False,
+        "results_store": str(tmp_path / "results.sqlite"),
+        "pattern_params": {"check_weekly_rsi_low": {"rsi_threshold": 45}},
+        **extra_params,
+    }
+    matched = StockFilter(stocks, PATTERNS, params).filter()
+    fresh = StockFilter(stocks, PATTERNS, {**params, "results_store": None}).filter()
+    assert matched == fresh
+    return checked
+
+
+def test_rerun_reuses_verdicts(tmp_path, monkeypatch):
+    stocks = make_stocks()
+    assert len(run(stocks, tmp_path, monkeypatch)) == len(stocks)
+    assert run(stocks, tmp_path, monkeypatch) == []
+
+
+def test_last_close_change_reevaluates(tmp_path, monkeypatch):
+    stocks = make_stocks()
+    run(stocks, tmp_path, monkeypatch)
+    # The last bar is still in progress: same timestamp, new close
+    data = stocks[0]._data.copy()
+    data.iloc[-1, data.columns.get_loc("Close")] *= 0.5
+    stocks[0]._data = data
+    assert run(stocks, tmp_path, monkeypatch) == [stocks[0].ticker_symbol]
+
+
+def test_period_change_reevaluates(tmp_path, monkeypatch):
+    stocks = make_stocks()
+    run(stocks, tmp_path, monkeypatch)
+    for stock in stocks:
+        stock.period = "1y"
+    assert len(run(stocks, tmp_path, monkeypatch)) == len(stocks)
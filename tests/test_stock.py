@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_ohlcv
+from stockaxion.stock import Stock
+
+
+def bar(close):
+    return {"Open": close, "High": close, "Low": close, "Close": close, "Volume": 10.0}
+
+
+def based_stock(interval):
+    stock = Stock("SYN", period="2y", interval="1d", base_interval="1d")
+    stock._set_data(synthetic_ohlcv(400, "1d"), "2y", "1d")
+    stock.set_resolution("2y", interval)
+    return stock
+
+
+def test_base_bars_kept_across_resolutions():
+    stock = based_stock("1d")
+    base = stock._base
+    last = stock.data.index[-1]
+    for i in range(1, 4):
+        stock.append_bar(last + pd.Timedelta(days=i), bar(1000.0 + i))
+    stock.set_resolution("2y", "1wk")
+    assert stock.data["Close"].iloc[-1] == 1003.0
+    stock.set_resolution("2y", "1d")
+    assert len(stock.data) == len(base) + 3
+
+
+def test_derived_bars_not_added_to_base():
+    stock = based_stock("1wk")
+    base = stock._base
+    stock.append_bar(stock.data.index[-1] + pd.Timedelta(weeks=1), bar(5.0))
+    with pytest.raises(ValueError):
+        stock.set_resolution("2y", "1d")
+    stock.set_resolution("1y", "1wk")
+    assert stock.data["Close"].iloc[-1] == 5.0
+    assert stock._base is base
+
+
+def test_pending_bars_kept_without_data():
+    stock = Stock("SYN", period="2y", interval="1d")
+    stock._data = synthetic_ohlcv(50, "1d")
+    last = stock._data.index[-1]
+    stock.append_bar(last + pd.Timedelta(days=1), bar(1.0))
+    stock.append_bar(last + pd.Timedelta(days=2), bar(2.0))
+    stock.fetch_data = lambda period, interval: None
+    stock._data = None
+    assert stock.data is None
+    assert len(stock._pending_bars) == 2
+
+
+def test_refetch_reconciles_pending_bars():
+    data = synthetic_ohlcv(50, "1d")
+    stock = Stock("SYN", period="2y", interval="1d")
+    stock._set_data(data.iloc[:-2], "2y", "1d")
+    timestamps = [*data.index[-2:], data.index[-1] + pd.Timedelta(days=1)]
+    for i, timestamp in enumerate(timestamps):
+        stock.append_bar(timestamp, bar(float(i)))
+    # The refetched data has the first two appended bars
+    stock._set_data(data, "2y", "1d")
+    assert len(stock.data) == len(data) + 1
+    assert stock.data["Close"].iloc[-2] == data["Close"].iloc[-1]
+    assert stock.data["Close"].iloc[-1] == 2.0